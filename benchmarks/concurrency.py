@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+Measures redirects under concurrent load.
+
+Compares counting views in the request (the default) with counting them in a
+background thread (``TINYLINK_VIEW_BUFFER = 'background'``), where responses
+don't wait for the database write. Uses a temporary SQLite file, so that all
+threads share the database. Run it from the repository root::
+
+    python benchmarks/concurrency.py [threads] [requests per thread]
+
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE',
+                      'tinylinks.tests.test_settings')
+
+from django.conf import settings  # NOQA
+
+DATABASE = tempfile.NamedTemporaryFile(suffix='.sqlite')
+settings.DATABASES['default'].update({
+    'NAME': DATABASE.name,
+    'OPTIONS': {'timeout': 60},
+})
+
+import django  # NOQA
+django.setup()
+
+from django.contrib.auth.models import User  # NOQA
+from django.core.management import call_command  # NOQA
+from django.db import connection  # NOQA
+from django.test import Client  # NOQA
+from django.test.utils import override_settings  # NOQA
+
+from tinylinks.counters import get_view_buffer  # NOQA
+from tinylinks.models import Tinylink  # NOQA
+
+
+SCENARIOS = (
+    ('in request', {}),
+    ('background', {'TINYLINK_VIEW_BUFFER': 'background'}),
+)
+
+
+def run_client(amount, latencies):
+    client = Client()
+    for index in range(amount):
+        start = time.time()
+        response = client.get('/bench/')
+        latencies.append(time.time() - start)
+        assert response.status_code == 302, response.status_code
+    connection.close()
+
+
+def measure(threads, amount, **overrides):
+    Tinylink.objects.filter(short_url='bench').update(amount_of_views=0)
+    latencies = []
+    with override_settings(DEBUG=False, ALLOWED_HOSTS=['*'], **overrides):
+        clients = [threading.Thread(target=run_client,
+                                    args=(amount, latencies))
+                   for index in range(threads)]
+        start = time.time()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        duration = time.time() - start
+        view_buffer = get_view_buffer()
+        if view_buffer:
+            view_buffer.flush()
+    views = Tinylink.objects.get(short_url='bench').amount_of_views
+    assert views == threads * amount, views
+    latencies.sort()
+    return (len(latencies) / duration,
+            latencies[len(latencies) // 2] * 1e3,
+            latencies[int(len(latencies) * 0.99)] * 1e3)
+
+
+def main(threads, amount):
+    call_command('migrate', verbosity=0)
+    user = User.objects.create(username='benchmark')
+    Tinylink.objects.create(
+        user=user, short_url='bench', long_url='http://www.example.com/')
+    print('{0} threads with {1} redirects each'.format(threads, amount))
+    print('{0:<12} {1:>10} {2:>10} {3:>10}'.format(
+        'counting', 'req/s', 'p50 (ms)', 'p99 (ms)'))
+    for name, overrides in SCENARIOS:
+        print('{0:<12} {1:>10.0f} {2:>10.2f} {3:>10.2f}'.format(
+            name, *measure(threads, amount, **overrides)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 16,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Measures the per-request overhead of the redirect fast path.
+
+Compares ``TinylinkRedirectView`` with the ``TinylinkRedirectMiddleware``,
+once with the database and once with the resolution cache and a view buffer,
+which leaves only the framework overhead. Run it from the repository root::
+
+    python benchmarks/redirects.py [requests]
+
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE',
+                      'tinylinks.tests.test_settings')
+
+import django  # NOQA
+django.setup()
+
+from django.conf import settings  # NOQA
+from django.contrib.auth.models import User  # NOQA
+from django.core.management import call_command  # NOQA
+from django.test import Client  # NOQA
+from django.test.utils import override_settings  # NOQA
+
+from tinylinks.models import Tinylink  # NOQA
+
+
+SCENARIOS = (
+    ('database', {}),
+    ('cached', {
+        'TINYLINK_RESOLUTION_CACHE': True,
+        'TINYLINK_VIEW_BUFFER': 'memory',
+    }),
+)
+
+PATHS = {
+    'view': {},
+    'middleware': {
+        'MIDDLEWARE_CLASSES': (
+            ['tinylinks.middleware.TinylinkRedirectMiddleware'] +
+            list(settings.MIDDLEWARE_CLASSES)),
+        'TINYLINK_REDIRECT_PREFIX': '/',
+    },
+}
+
+
+def measure(amount, **overrides):
+    with override_settings(DEBUG=False, ALLOWED_HOSTS=['*'], **overrides):
+        client = Client()
+        response = client.get('/bench/')
+        assert response.status_code == 302, response.status_code
+        return min(timeit.repeat(
+            lambda: client.get('/bench/'), repeat=3, number=amount)) / amount
+
+
+def main(amount):
+    call_command('migrate', verbosity=0)
+    user = User.objects.create(username='benchmark')
+    Tinylink.objects.create(
+        user=user, short_url='bench', long_url='http://www.example.com/')
+    print('{0:<10} {1:>16} {2:>16} {3:>9}'.format(
+        'scenario', 'view (us)', 'middleware (us)', 'speedup'))
+    for name, overrides in SCENARIOS:
+        results = {}
+        for path, path_overrides in PATHS.items():
+            options = dict(overrides, **path_overrides)
+            results[path] = measure(amount, **options) * 1e6
+        print('{0:<10} {1:>16.1f} {2:>16.1f} {3:>8.2f}x'.format(
+            name, results['view'], results['middleware'],
+            results['view'] / results['middleware']))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -4,24 +4,43 @@ from django.template.defaultfilters import truncatechars
 from django.utils.translation import ugettext_lazy as _
 
 from tinylinks.forms import TinylinkAdminForm
-from tinylinks.models import Tinylink
+from tinylinks.models import Tinylink, get_long_url_hash
 
 
 class TinylinkAdmin(admin.ModelAdmin):
     list_display = ('short_url', 'url_truncated', 'amount_of_views', 'user',
                     'last_checked', 'status', 'validation_error')
+    list_select_related = ('user', 'target')
     search_fields = ['short_url', 'long_url']
     form = TinylinkAdminForm
 
+    def get_search_results(self, request, queryset, search_term):
+        queryset, use_distinct = super(TinylinkAdmin, self).get_search_results(
+            request, queryset, search_term)
+        # Full URLs are also found through the index of their hash.
+        if '://' in search_term:
+            queryset |= self.model.objects.filter(
+                long_url_hash=get_long_url_hash(search_term.strip()))
+        return queryset, use_distinct
+
     def url_truncated(self, obj):
         return truncatechars(obj.long_url, 60)
     url_truncated.short_description = _('Long URL')
 
+    def last_checked(self, obj):
+        return obj.target.last_checked
+    last_checked.short_description = _('Last validation')
+    last_checked.admin_order_field = 'target__last_checked'
+
     def status(self, obj):
-        if not obj.is_broken:
+        if not obj.target.is_broken:
             return _('OK')
         return _('Link broken')
     status.short_description = _('Status')
 
+    def validation_error(self, obj):
+        return obj.target.validation_error
+    validation_error.short_description = _('Validation Error')
+
 
 admin.site.register(Tinylink, TinylinkAdmin)
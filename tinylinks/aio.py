@@ -0,0 +1,229 @@
+"""
+asyncio backend to check the long URLs of the ``tinylinks`` app.
+
+This module needs Python 3.5 or newer and is only imported when the
+``asyncio`` backend of ``check_tinylink_targets`` is used.
+
+"""
+import asyncio
+import logging
+import ssl
+import time
+from socket import gaierror
+from urllib.parse import urljoin, urlsplit
+
+from django.conf import settings
+from django.utils.encoding import iri_to_uri
+from django.utils.timezone import now
+from django.utils.translation import ugettext_lazy as _
+
+from requests import TooManyRedirects
+
+from .utils import (
+    REDIRECT_STATUS_CODES,
+    RETRY_STATUS_CODES,
+    DeadlineExceeded,
+    RedirectLoop,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncChecker(object):
+    """
+    Checks many long URLs concurrently in one event loop.
+
+    At most ``concurrency`` checks are in flight at the same time and at most
+    ``per_host`` of them go to the same host. Each request has to complete
+    within ``timeout`` seconds. The defaults are
+    ``TINYLINK_CHECK_CONCURRENCY``, ``TINYLINK_CHECK_PER_HOST`` and
+    ``TINYLINK_CHECK_TIMEOUT``.
+
+    Only the status line and the headers of the responses are read. Like
+    ``tinylinks.utils.check_long_url``, redirects are followed up to
+    ``TINYLINK_CHECK_MAX_REDIRECTS`` hops, and temporary failures are
+    retried with the ``TINYLINK_CHECK_RETRIES`` and
+    ``TINYLINK_CHECK_RETRY_BACKOFF`` settings. The long URL is valid if the
+    end of its redirect chain returns 200.
+
+    If a ``deadline`` timestamp is given, no requests are started that could
+    not complete before it. Links whose checks were stopped this way are left
+    out of the results.
+
+    """
+    def __init__(self, concurrency=None, per_host=None, timeout=None,
+                 deadline=None):
+        self.concurrency = concurrency or getattr(
+            settings, 'TINYLINK_CHECK_CONCURRENCY', 1000)
+        self.per_host = per_host or getattr(
+            settings, 'TINYLINK_CHECK_PER_HOST', 4)
+        self.timeout = timeout or getattr(
+            settings, 'TINYLINK_CHECK_TIMEOUT', 10)
+        self.max_redirects = getattr(
+            settings, 'TINYLINK_CHECK_MAX_REDIRECTS', 10)
+        self.retries = getattr(settings, 'TINYLINK_CHECK_RETRIES', 2)
+        self.backoff = getattr(settings, 'TINYLINK_CHECK_RETRY_BACKOFF', 0.5)
+        self.deadline = deadline
+
+    async def request(self, url):
+        """Returns the status code and the location header of a GET."""
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError('Unsupported URL scheme.')
+        host = parts.hostname.encode('idna').decode('ascii')
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        context = ssl.create_default_context() if (
+            parts.scheme == 'https') else None
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=context)
+        try:
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+            writer.write((
+                'GET {0} HTTP/1.1\r\nHost: {1}\r\nConnection: close\r\n'
+                'User-Agent: django-tinylinks\r\n\r\n').format(
+                    path, parts.netloc.rsplit('@', 1)[-1]).encode('ascii'))
+            status = int((await reader.readline()).split()[1])
+            location = ''
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _sep, value = line.decode('latin-1').partition(':')
+                if name.strip().lower() == 'location':
+                    location = value.strip()
+            return status, location
+        finally:
+            writer.close()
+
+    async def request_with_retries(self, url):
+        """
+        Requests a URL and retries temporary failures.
+
+        Raises ``DeadlineExceeded`` instead of starting an attempt that could
+        not complete before the deadline.
+
+        """
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * 2 ** (attempt - 1) if attempt else 0
+            if self.deadline is not None and (
+                    time.time() + delay + self.timeout > self.deadline):
+                raise DeadlineExceeded(url)
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                async with self.get_host_semaphore(url):
+                    # Waiting for the host may have used up the time.
+                    if self.deadline is not None and (
+                            time.time() + self.timeout > self.deadline):
+                        raise DeadlineExceeded(url)
+                    status, location = await asyncio.wait_for(
+                        self.request(url), self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+                continue
+            if status not in RETRY_STATUS_CODES:
+                break
+        return status, location
+
+    async def resolve_redirects(self, url):
+        """
+        Follows the redirects of a URL.
+
+        Returns the last status code, its URL and the number of hops.
+
+        """
+        seen = set([url])
+        hops = 0
+        while True:
+            status, location = await self.request_with_retries(url)
+            if status not in REDIRECT_STATUS_CODES or not location:
+                return status, url, hops
+            url = urljoin(url, location)
+            hops += 1
+            if url in seen:
+                raise RedirectLoop(url)
+            if hops > self.max_redirects:
+                raise TooManyRedirects(url)
+            seen.add(url)
+
+    def get_host_semaphore(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.host_semaphores:
+            self.host_semaphores[host] = asyncio.Semaphore(self.per_host)
+        return self.host_semaphores[host]
+
+    async def check(self, link):
+        """
+        Checks the long URL of a ``TargetURL``.
+
+        Returns ``None`` if the check would not complete before the deadline.
+
+        """
+        async with self.semaphore:
+            link.is_broken = True
+            link.validation_error = ''
+            link.redirect_location = ''
+            link.redirect_hops = 0
+            try:
+                status, url, hops = await self.resolve_redirects(
+                    iri_to_uri(link.long_url))
+            except DeadlineExceeded:
+                return None
+            except UnicodeError:
+                link.validation_error = _(
+                    'Unicode error. Check URL characters.')
+            except RedirectLoop:
+                link.validation_error = _('Redirect loop.')
+            except TooManyRedirects:
+                link.validation_error = _('Too many redirects.')
+            except asyncio.TimeoutError:
+                link.validation_error = _('Timed out.')
+            except gaierror:
+                link.validation_error = _('Not found.')
+            except (OSError, ValueError, IndexError):
+                link.validation_error = _('Failed after retrying.')
+            except Exception:
+                logger.exception('Could not check %s.', link.long_url)
+                link.validation_error = _('Check failed.')
+            else:
+                if hops:
+                    link.redirect_location = url
+                    link.redirect_hops = hops
+                if status == 200:
+                    link.is_broken = False
+                else:
+                    link.validation_error = _('URL not accessible.')
+        link.last_checked = now()
+        return link
+
+    async def check_all(self, links):
+        """Checks the given links and returns them."""
+        # Semaphores are bound to the event loop in which they are created.
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.host_semaphores = {}
+        links = await asyncio.gather(*[self.check(link) for link in links])
+        return [link for link in links if link is not None]
+
+
+def check_long_urls_async(links, **kwargs):
+    """
+    Checks the long URLs of the given targets with asyncio.
+
+    The keyword arguments are passed to ``AsyncChecker``. Returns the checked
+    links, which can be saved with ``tinylinks.utils.save_checks``. Links
+    that were skipped because of the ``deadline`` are left out.
+
+    """
+    links = list(links)
+    coroutine = AsyncChecker(**kwargs).check_all(links)
+    if hasattr(asyncio, 'run'):
+        return asyncio.run(coroutine)
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
@@ -0,0 +1,11 @@
+"""App configuration for the ``django-tinylinks`` app."""
+from django.apps import AppConfig
+from django.utils.translation import ugettext_lazy as _
+
+
+class TinylinksConfig(AppConfig):
+    name = 'tinylinks'
+    verbose_name = _('Tinylinks')
+
+    def ready(self):
+        from . import signals  # NOQA
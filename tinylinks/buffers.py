@@ -0,0 +1,167 @@
+"""Write-behind buffers for the ``tinylinks`` app."""
+import logging
+import threading
+import time
+
+from django.db import close_old_connections
+from django.utils.six.moves import queue
+
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundQueue(object):
+    """
+    Writes queued items in a daemon thread of the current process.
+
+    The thread takes up to ``batch_size`` items at once from the queue and
+    passes them to ``writer``, a callable that takes a list of items.
+
+    The queue holds at most ``maxsize`` items, so a database that can't keep
+    up doesn't fill the memory of the process. Items that don't fit are
+    dropped and counted in ``dropped``, so that requests never wait for the
+    database.
+
+    """
+    batch_size = 1000
+
+    def __init__(self, writer, maxsize=0):
+        self.writer = writer
+        self.queue = queue.Queue(maxsize)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.dropped = 0
+
+    def add(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+                dropped = self.dropped
+            if (dropped - 1) % self.batch_size == 0:
+                logger.warning('Dropped %s items of %s, the queue is full.',
+                               dropped, self.__class__.__name__)
+            return
+        if self.thread is None or not self.thread.is_alive():
+            with self.lock:
+                if self.thread is None or not self.thread.is_alive():
+                    self.thread = threading.Thread(target=self.run)
+                    self.thread.daemon = True
+                    self.thread.start()
+
+    def run(self):
+        while True:
+            items = [self.queue.get()]
+            try:
+                while len(items) < self.batch_size:
+                    items.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            try:
+                close_old_connections()
+                self.write(items)
+            finally:
+                for item in items:
+                    self.queue.task_done()
+
+    def write(self, items):
+        """Passes the items to ``writer`` and logs its errors."""
+        try:
+            self.writer(items)
+        except Exception:
+            logger.exception('Could not write %s items of %s.',
+                             len(items), self.__class__.__name__)
+
+    def flush(self):
+        """Waits until all queued items are written."""
+        pending = self.queue.qsize()
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.join()
+        return pending
+
+
+class CacheBuckets(object):
+    """
+    Base class for buffers that collect items in the Django cache.
+
+    Items are collected in time buckets of ``interval`` seconds, so that all
+    processes share them. ``flush`` passes every finished bucket that was not
+    flushed yet to ``flush_bucket``, which hands the values in the index of
+    the bucket to ``writer`` in batches of ``batch_size``.
+
+    """
+    prefix = None
+    interval = 60
+    timeout = 86400
+    batch_size = 1000
+
+    def __init__(self, cache, writer=None):
+        self.cache = cache
+        self.writer = writer
+
+    def get_bucket(self):
+        return int(time.time() // self.interval)
+
+    def get_key(self, *parts):
+        return ':'.join([self.prefix] + [str(part) for part in parts])
+
+    def append(self, bucket, value):
+        """
+        Appends a value to the index of a bucket.
+
+        The value is dropped if the size of the index expires twice between
+        creating and incrementing it.
+
+        """
+        key = self.get_key(bucket)
+        for attempt in range(2):
+            self.cache.add(key, 0, self.timeout)
+            try:
+                index = self.cache.incr(key)
+            except ValueError:
+                continue
+            self.cache.set(self.get_key(bucket, '#', index), value,
+                           self.timeout)
+            return
+
+    def get_index_keys(self, bucket):
+        """Returns the keys of all values in the index of a bucket."""
+        size = self.cache.get(self.get_key(bucket)) or 0
+        return [self.get_key(bucket, '#', index)
+                for index in range(1, size + 1)]
+
+    def flush(self):
+        lock = self.get_key('lock')
+        if not self.cache.add(lock, 1, self.interval * 10):
+            return 0
+        try:
+            # The previous bucket is skipped to allow for clock drift between
+            # the processes that are still writing to it.
+            current = self.get_bucket() - 1
+            last = self.cache.get(self.get_key('flushed'))
+            if last is None:
+                last = current - self.timeout // self.interval - 1
+            total = 0
+            for bucket in range(last + 1, current):
+                total += self.flush_bucket(bucket)
+                self.cache.set(self.get_key('flushed'), bucket, None)
+            return total
+        finally:
+            self.cache.delete(lock)
+
+    def flush_bucket(self, bucket):
+        """
+        Passes the values in the index of a finished bucket to ``writer``,
+        which returns the number of written values, and removes them from the
+        cache.
+
+        """
+        index_keys = self.get_index_keys(bucket)
+        total = 0
+        for index in range(0, len(index_keys), self.batch_size):
+            keys = index_keys[index:index + self.batch_size]
+            total += self.writer(self.cache.get_many(keys).values())
+            self.cache.delete_many(keys)
+        self.cache.delete(self.get_key(bucket))
+        return total
@@ -0,0 +1,328 @@
+"""Resolution cache for the ``tinylinks`` app."""
+import hashlib
+import math
+import struct
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.utils.timezone import now, timedelta
+
+from .generators import get_code_generator
+from .models import Tinylink
+
+
+class BloomFilter(object):
+    """
+    Set of strings that may report false positives but no false negatives.
+
+    ``since`` is the time from which on added strings may be missing.
+
+    """
+    def __init__(self, capacity, error_rate, since=None):
+        self.since = since
+        self.capacity = capacity
+        self.size = max(8, int(math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(
+            float(self.size) / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def get_positions(self, value):
+        digest = hashlib.sha1(value.encode('utf-8')).digest()
+        first, second = struct.unpack('<QQ', digest[:16])
+        return [(first + index * second) % self.size
+                for index in range(self.hashes)]
+
+    def add(self, value):
+        for position in self.get_positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self.get_positions(value))
+
+
+class LRUCache(object):
+    """
+    Thread-safe in-process cache with a size limit and a time to live.
+
+    """
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.data = OrderedDict()
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                expires, value = self.data.pop(key)
+            except KeyError:
+                return default
+            if expires < time.time():
+                return default
+            # Re-insert the entry to mark it as the most recently used one.
+            self.data[key] = (expires, value)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data.pop(key, None)
+            self.data[key] = (time.time() + self.ttl, value)
+            while len(self.data) > self.size:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class ResolutionCache(object):
+    """
+    Resolves short URLs to the ``redirect_fields`` of their tinylinks through
+    two cache tiers.
+
+    The first tier is an ``LRUCache`` in the current process, the second one
+    the Django cache configured by ``TINYLINK_RESOLUTION_CACHE_ALIAS``. Only
+    database misses of both tiers hit the database.
+
+    Short URLs that don't exist are cached in the Django cache for
+    ``TINYLINK_NEGATIVE_CACHE_TIMEOUT`` seconds. If ``TINYLINK_BLOOM_FILTER``
+    is set, a ``BloomFilter`` of all short URLs narrows down the remaining
+    misses. It is built in a background thread and rebuilt every
+    ``TINYLINK_BLOOM_FILTER_REBUILD_INTERVAL`` seconds. Short URLs that are
+    not in the filter are only looked up among the tinylinks that were
+    modified since it was built, so the short URLs that other processes
+    created in the meantime are still found. The database can answer these
+    lookups from the recent end of the ``modified`` index.
+
+    Changes to tinylinks refresh the Django cache right away. The local tiers
+    of all processes are cleared as soon as they see that the generation
+    counter in the Django cache was bumped, which they check every
+    ``TINYLINK_RESOLUTION_CACHE_SYNC_INTERVAL`` seconds. At the same time the
+    hit and miss counters of the process are added to the shared counters
+    returned by ``get_stats``.
+
+    """
+    # Processes of an older release may share the Django cache, so the
+    # version has to be bumped whenever the cached values change.
+    prefix = 'tinylinks:resolve:v2'
+    stat_names = (
+        'local_hits', 'shared_hits', 'negative_hits', 'rejected', 'misses')
+
+    def __init__(self):
+        self.cache = caches[getattr(
+            settings, 'TINYLINK_RESOLUTION_CACHE_ALIAS', 'default')]
+        self.local = LRUCache(
+            getattr(settings, 'TINYLINK_RESOLUTION_CACHE_SIZE', 10000),
+            getattr(settings, 'TINYLINK_RESOLUTION_CACHE_TTL', 300))
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.generation = None
+        self.next_sync = 0
+        self.bloom_filter = None
+        self.bloom_filter_expires = 0
+        self.bloom_filter_lock = threading.Lock()
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'TINYLINK_RESOLUTION_CACHE_TIMEOUT', 3600)
+
+    def get_key(self, *parts):
+        return ':'.join([self.prefix] + [str(part) for part in parts])
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def sync(self):
+        """
+        Clears the local tier if another process changed a tinylink and
+        publishes the local hit and miss counters.
+
+        """
+        now = time.time()
+        if now < self.next_sync:
+            return
+        with self.lock:
+            self.next_sync = now + getattr(
+                settings, 'TINYLINK_RESOLUTION_CACHE_SYNC_INTERVAL', 1)
+            stats, self.stats = self.stats, Counter()
+        generation = self.cache.get(self.get_key('generation'))
+        if generation != self.generation:
+            self.local.clear()
+            self.generation = generation
+        for name, value in stats.items():
+            key = self.get_key('stats', name)
+            if not self.cache.add(key, value, None):
+                self.cache.incr(key, value)
+
+    def resolve(self, short_url):
+        """
+        Returns the ``redirect_fields`` of the tinylink with the given short
+        URL or ``None`` if it does not exist.
+
+        """
+        self.sync()
+        link = self.local.get(short_url)
+        if link is not None:
+            self.count('local_hits')
+            return link
+        link = self.cache.get(self.get_key(short_url))
+        if link:
+            self.count('shared_hits')
+            link = tuple(link)
+        elif link is not None:
+            # An empty tuple marks a short URL that does not exist.
+            self.count('negative_hits')
+            return None
+        else:
+            bloom_filter = self.get_bloom_filter()
+            if bloom_filter is not None and short_url not in bloom_filter:
+                self.count('rejected')
+                modified_since = bloom_filter.since
+            else:
+                self.count('misses')
+                modified_since = None
+            link = Tinylink.objects.resolve(
+                short_url, get_code_generator().decode(short_url),
+                modified_since)
+            if link is None:
+                negative_timeout = getattr(
+                    settings, 'TINYLINK_NEGATIVE_CACHE_TIMEOUT', 60)
+                if negative_timeout:
+                    self.cache.set(
+                        self.get_key(short_url), (), negative_timeout)
+                return None
+            self.cache.set(self.get_key(short_url), link, self.timeout)
+        self.local.set(short_url, link)
+        return link
+
+    def refresh(self, link, old_values=None):
+        """
+        Puts a saved tinylink into the cache.
+
+        ``old_values`` are the short URL and the ``redirect_fields`` that the
+        tinylink had before it was saved. They are ``None`` for new
+        tinylinks, which can't be cached in any process yet. If neither the
+        short URL nor the redirect fields changed, nothing is done, so saves
+        of other fields don't clear the local tier of all processes.
+
+        """
+        redirect_values = link.get_redirect_values()
+        if old_values is not None:
+            old_short_url = old_values[0]
+            if (old_short_url == link.short_url and
+                    tuple(old_values[1:]) == redirect_values):
+                return
+            if old_short_url != link.short_url:
+                self.cache.delete(self.get_key(old_short_url))
+        self.cache.set(
+            self.get_key(link.short_url), redirect_values, self.timeout)
+        bloom_filter = self.bloom_filter
+        if bloom_filter is not None:
+            bloom_filter.add(link.short_url)
+            if bloom_filter.count > bloom_filter.capacity:
+                self.bloom_filter_expires = 0
+        if old_values is not None:
+            self.bump()
+
+    def invalidate(self, short_url):
+        """Removes a deleted tinylink from the cache."""
+        self.cache.delete(self.get_key(short_url))
+        self.bump()
+
+    def bump(self):
+        """Tells all processes to clear their local tier."""
+        key = self.get_key('generation')
+        if not self.cache.add(key, 1, None):
+            self.cache.incr(key)
+        self.local.clear()
+
+    def get_bloom_filter(self):
+        """
+        Returns the bloom filter of all short URLs.
+
+        Returns ``None`` if the filter is disabled or was not built yet. A
+        missing or outdated filter is built in a background thread.
+
+        """
+        if not getattr(settings, 'TINYLINK_BLOOM_FILTER', False):
+            return None
+        if (time.time() >= self.bloom_filter_expires and
+                self.bloom_filter_lock.acquire(False)):
+            thread = threading.Thread(target=self.rebuild_bloom_filter)
+            thread.daemon = True
+            thread.start()
+        return self.bloom_filter
+
+    def build_bloom_filter(self):
+        """Builds the bloom filter of all short URLs."""
+        # Tinylinks that are saved while the filter is built may be committed
+        # after the rows are read, so the filter only vouches for the
+        # tinylinks that were modified long enough before.
+        since = now() - timedelta(seconds=getattr(
+            settings, 'TINYLINK_BLOOM_FILTER_MARGIN', 60))
+        short_urls = Tinylink.objects.values_list('short_url', flat=True)
+        bloom_filter = BloomFilter(
+            max(short_urls.count() * 2, 1000), getattr(
+                settings, 'TINYLINK_BLOOM_FILTER_ERROR_RATE', 0.01), since)
+        for short_url in short_urls.iterator():
+            bloom_filter.add(short_url)
+        self.bloom_filter = bloom_filter
+        self.bloom_filter_expires = time.time() + getattr(
+            settings, 'TINYLINK_BLOOM_FILTER_REBUILD_INTERVAL', 300)
+
+    def rebuild_bloom_filter(self):
+        """
+        Builds the bloom filter in a background thread.
+
+        Has to be called with ``bloom_filter_lock`` acquired.
+
+        """
+        try:
+            self.build_bloom_filter()
+        finally:
+            self.bloom_filter_lock.release()
+            connection.close()
+
+    def get_stats(self):
+        """Returns the hit and miss counters of all processes."""
+        self.next_sync = 0
+        self.sync()
+        keys = dict((self.get_key('stats', name), name)
+                    for name in self.stat_names)
+        stats = dict((name, 0) for name in self.stat_names)
+        for key, value in self.cache.get_many(list(keys.keys())).items():
+            stats[keys[key]] = value
+        stats['local_size'] = len(self.local)
+        return stats
+
+
+_resolution_caches = {}
+
+
+def get_resolution_cache():
+    """
+    Returns the resolution cache if ``TINYLINK_RESOLUTION_CACHE`` is set.
+
+    """
+    if not getattr(settings, 'TINYLINK_RESOLUTION_CACHE', False):
+        return None
+    alias = getattr(settings, 'TINYLINK_RESOLUTION_CACHE_ALIAS', 'default')
+    if alias not in _resolution_caches:
+        _resolution_caches[alias] = ResolutionCache()
+    return _resolution_caches[alias]
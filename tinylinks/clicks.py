@@ -0,0 +1,147 @@
+"""Click events for the ``tinylinks`` app."""
+import atexit
+import re
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.six.moves.urllib.parse import urlsplit
+from django.utils.timezone import now
+
+from .buffers import BackgroundQueue, CacheBuckets
+from .models import ClickEvent, Tinylink
+
+
+USER_AGENT_CLASSES = (
+    ('bot', re.compile(r'bot|crawl|spider|slurp|curl|wget|python', re.I)),
+    ('mobile', re.compile(r'mobile|android|iphone|ipad|ipod', re.I)),
+    ('browser', re.compile(r'mozilla|opera', re.I)),
+)
+
+
+def get_user_agent_class(user_agent):
+    """Returns the ``user_agent_class`` of a ``User-Agent`` header."""
+    for user_agent_class, pattern in USER_AGENT_CLASSES:
+        if pattern.search(user_agent):
+            return user_agent_class
+    return 'other'
+
+
+def get_click_event(pk, request):
+    """
+    Returns the values of a ``ClickEvent`` for a redirect to a tinylink.
+
+    The values are a plain tuple, so that they can be queued cheaply.
+
+    """
+    referer_host = urlsplit(request.META.get('HTTP_REFERER', '')).hostname
+    return (
+        pk,
+        now(),
+        (referer_host or '')[:255],
+        get_user_agent_class(request.META.get('HTTP_USER_AGENT', '')),
+        '',
+    )
+
+
+def create_click_events(events):
+    """
+    Saves queued click events with ``bulk_create``.
+
+    Events of tinylinks that were deleted in the meantime are dropped.
+
+    """
+    batch_size = getattr(settings, 'TINYLINK_CLICK_EVENTS_BATCH_SIZE', 1000)
+    events = list(events)
+    existing = set()
+    pks = list(set(event[0] for event in events))
+    for index in range(0, len(pks), batch_size):
+        existing.update(Tinylink.objects.filter(
+            pk__in=pks[index:index + batch_size]).values_list(
+                'pk', flat=True))
+    click_events = [
+        ClickEvent(tinylink_id=pk, timestamp=timestamp,
+                   referer_host=referer_host,
+                   user_agent_class=user_agent_class, country=country)
+        for pk, timestamp, referer_host, user_agent_class, country in events
+        if pk in existing]
+    ClickEvent.objects.bulk_create(click_events, batch_size=batch_size)
+    return len(click_events)
+
+
+class BackgroundClickQueue(BackgroundQueue):
+    """
+    Saves click events in a background thread of the current process.
+
+    """
+    def __init__(self):
+        super(BackgroundClickQueue, self).__init__(
+            create_click_events, getattr(
+                settings, 'TINYLINK_CLICK_EVENTS_QUEUE_SIZE', 10000))
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'TINYLINK_CLICK_EVENTS_BATCH_SIZE', 1000)
+
+
+class CacheClickQueue(CacheBuckets):
+    """
+    Collects click events in the Django cache, so that all processes share
+    them.
+
+    Run the ``ingest_tinylink_clicks`` command at least once per
+    ``TINYLINK_CLICK_EVENTS_INTERVAL`` to save them.
+
+    """
+    prefix = 'tinylinks:clicks'
+
+    def __init__(self):
+        super(CacheClickQueue, self).__init__(caches[getattr(
+            settings, 'TINYLINK_CLICK_EVENTS_CACHE', 'default')],
+            create_click_events)
+
+    @property
+    def interval(self):
+        return getattr(settings, 'TINYLINK_CLICK_EVENTS_INTERVAL', 60)
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'TINYLINK_CLICK_EVENTS_TIMEOUT', 86400)
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'TINYLINK_CLICK_EVENTS_BATCH_SIZE', 1000)
+
+    def add(self, event):
+        self.append(self.get_bucket(), event)
+
+
+CLICK_QUEUES = {
+    'background': BackgroundClickQueue,
+    'cache': CacheClickQueue,
+}
+
+_click_queues = {}
+
+
+def get_click_queue():
+    """
+    Returns the click event queue configured by ``TINYLINK_CLICK_EVENTS``.
+
+    Returns ``None`` if click events are not recorded.
+
+    """
+    name = getattr(settings, 'TINYLINK_CLICK_EVENTS', None)
+    if not name:
+        return None
+    if name not in _click_queues:
+        _click_queues[name] = CLICK_QUEUES[name]()
+        if name == 'background':
+            atexit.register(_click_queues[name].flush)
+    return _click_queues[name]
+
+
+def record_click(pk, request):
+    """Queues a click event for a redirect to a tinylink."""
+    click_queue = get_click_queue()
+    if click_queue:
+        click_queue.add(get_click_event(pk, request))
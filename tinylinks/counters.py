@@ -0,0 +1,211 @@
+"""View counters for the ``tinylinks`` app."""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Case, F, When
+
+from .buffers import BackgroundQueue, CacheBuckets
+from .models import Tinylink
+
+
+logger = logging.getLogger(__name__)
+
+
+def apply_view_deltas(deltas):
+    """
+    Adds buffered views to the ``amount_of_views`` of the given links.
+
+    ``deltas`` is a dictionary of ``{pk: views}``. The links are updated with
+    one ``UPDATE`` statement per batch of ``TINYLINK_VIEW_FLUSH_BATCH_SIZE``
+    links in one transaction, so a failed batch doesn't leave the others
+    written. The primary keys are sorted, so that concurrent flushes lock the
+    rows in the same order.
+
+    """
+    batch_size = getattr(settings, 'TINYLINK_VIEW_FLUSH_BATCH_SIZE', 500)
+    pks = sorted(pk for pk, views in deltas.items() if views)
+    with transaction.atomic():
+        for index in range(0, len(pks), batch_size):
+            batch = pks[index:index + batch_size]
+            Tinylink.objects.filter(pk__in=batch).update(
+                amount_of_views=Case(
+                    *[When(pk=pk, then=F('amount_of_views') + deltas[pk])
+                      for pk in batch],
+                    default=F('amount_of_views')))
+    return sum(deltas[pk] for pk in pks)
+
+
+class MemoryViewBuffer(object):
+    """
+    Collects views in the current process.
+
+    The buffer is flushed to the database as soon as it holds
+    ``TINYLINK_VIEW_FLUSH_THRESHOLD`` views or its oldest view is older than
+    ``TINYLINK_VIEW_FLUSH_INTERVAL`` seconds, and when the process exits.
+    The flushes of full buffers run in a background thread, so the redirect
+    that fills the buffer doesn't wait for the database.
+
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.deltas = Counter()
+        self.hits = 0
+        self.last_flush = time.time()
+        self.thread = None
+
+    def add(self, pk):
+        threshold = getattr(settings, 'TINYLINK_VIEW_FLUSH_THRESHOLD', 1000)
+        interval = getattr(settings, 'TINYLINK_VIEW_FLUSH_INTERVAL', 60)
+        with self.lock:
+            self.deltas[pk] += 1
+            self.hits += 1
+            flush = (self.hits >= threshold or
+                     time.time() - self.last_flush >= interval)
+        if flush and self.flush_lock.acquire(False):
+            self.thread = threading.Thread(target=self.flush_in_background)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def flush_in_background(self):
+        """
+        Flushes the buffer in a background thread.
+
+        Has to be called with ``flush_lock`` acquired.
+
+        """
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Could not flush the buffered views.')
+        finally:
+            self.flush_lock.release()
+            connection.close()
+
+    def flush(self):
+        with self.lock:
+            deltas, self.deltas = self.deltas, Counter()
+            self.hits = 0
+            self.last_flush = time.time()
+        try:
+            return apply_view_deltas(deltas)
+        except Exception:
+            # Keep the views for the next attempt.
+            with self.lock:
+                self.deltas.update(deltas)
+            raise
+
+
+class BackgroundViewBuffer(BackgroundQueue):
+    """
+    Counts views in a background thread of the current process.
+
+    Redirects only put their view into a queue. A daemon thread writes all
+    queued views with ``apply_view_deltas``, so responses never wait for the
+    database while the counts stay close to real time. Under load, the views
+    of many redirects are written with a single ``UPDATE``.
+
+    """
+    def __init__(self):
+        super(BackgroundViewBuffer, self).__init__(
+            lambda pks: apply_view_deltas(Counter(pks)),
+            getattr(settings, 'TINYLINK_VIEW_QUEUE_SIZE', 10000))
+
+
+class CacheViewBuffer(CacheBuckets):
+    """
+    Collects views in the Django cache, so that all processes share them.
+
+    Views are counted with the atomic ``incr`` of the cache backend in time
+    buckets of ``TINYLINK_VIEW_FLUSH_INTERVAL`` seconds. Every bucket keeps an
+    index of the links that were viewed in it, so ``flush`` can collect the
+    counters of all finished buckets without scanning the cache. Run the
+    ``flush_tinylink_views`` command at least once per interval.
+
+    """
+    prefix = 'tinylinks:views'
+
+    def __init__(self):
+        super(CacheViewBuffer, self).__init__(caches[getattr(
+            settings, 'TINYLINK_VIEW_BUFFER_CACHE', 'default')])
+
+    @property
+    def interval(self):
+        return getattr(settings, 'TINYLINK_VIEW_FLUSH_INTERVAL', 60)
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'TINYLINK_VIEW_BUFFER_TIMEOUT', 86400)
+
+    def add(self, pk):
+        bucket = self.get_bucket()
+        if self.cache.add(self.get_key(bucket, pk), 1, self.timeout):
+            # First view of this link in the bucket. Register it in the index.
+            self.append(bucket, pk)
+            return
+        try:
+            self.cache.incr(self.get_key(bucket, pk))
+        except ValueError:
+            # The counter expired in the meantime. Counts are only eventually
+            # consistent, so we drop this view.
+            pass
+
+    def flush_bucket(self, bucket):
+        index_keys = self.get_index_keys(bucket)
+        pks = list(self.cache.get_many(index_keys).values())
+        counter_keys = dict((self.get_key(bucket, pk), pk) for pk in pks)
+        deltas = dict(
+            (counter_keys[key], views) for key, views in
+            self.cache.get_many(list(counter_keys.keys())).items())
+        total = apply_view_deltas(deltas)
+        self.cache.delete_many(
+            [self.get_key(bucket)] + index_keys + list(counter_keys.keys()))
+        return total
+
+
+VIEW_BUFFERS = {
+    'background': BackgroundViewBuffer,
+    'cache': CacheViewBuffer,
+    'memory': MemoryViewBuffer,
+}
+
+_view_buffers = {}
+
+
+def get_view_buffer():
+    """
+    Returns the view buffer configured by ``TINYLINK_VIEW_BUFFER``.
+
+    Returns ``None`` if views should be written to the database directly.
+
+    """
+    name = getattr(settings, 'TINYLINK_VIEW_BUFFER', None)
+    if not name:
+        return None
+    if name not in _view_buffers:
+        _view_buffers[name] = VIEW_BUFFERS[name]()
+        if name in ('background', 'memory'):
+            atexit.register(_view_buffers[name].flush)
+    return _view_buffers[name]
+
+
+def record_view(pk):
+    """
+    Counts a view of the tinylink with the given primary key.
+
+    The view is added to the configured view buffer or written to the
+    database with a single ``UPDATE``.
+
+    """
+    view_buffer = get_view_buffer()
+    if view_buffer:
+        view_buffer.add(pk)
+    else:
+        Tinylink.objects.filter(pk=pk).update(
+            amount_of_views=F('amount_of_views') + 1)
@@ -0,0 +1,331 @@
+"""Exports for the ``tinylinks`` app."""
+import csv
+import heapq
+import json
+import mmap
+import os
+import struct
+import tempfile
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import six
+
+from .models import Tinylink
+
+
+def iter_short_links(since=None):
+    """
+    Yields ``(short_url, long_url)`` of all tinylinks.
+
+    The tinylinks are read in chunks of ``TINYLINK_EXPORT_CHUNK_SIZE`` rows,
+    which are paginated over the unique index of ``short_url``, so memory
+    stays flat on all database backends. If ``since`` is given, only
+    tinylinks that were changed since then are returned.
+
+    """
+    chunk_size = getattr(settings, 'TINYLINK_EXPORT_CHUNK_SIZE', 10000)
+    links = Tinylink.objects.order_by('short_url')
+    if since is not None:
+        links = links.filter(modified__gte=since)
+    last = None
+    while True:
+        chunk = links if last is None else links.filter(short_url__gt=last)
+        count = 0
+        for last, long_url in chunk.values_list(
+                'short_url', 'long_url')[:chunk_size].iterator():
+            count += 1
+            yield last, long_url
+        if count < chunk_size:
+            return
+
+
+def remove_deleted_short_links(short_links):
+    """
+    Removes short URLs that don't exist any more from the given dictionary.
+
+    Returns the number of removed short URLs.
+
+    """
+    chunk_size = getattr(settings, 'TINYLINK_EXPORT_CHUNK_SIZE', 10000)
+    keys = list(short_links.keys())
+    removed = 0
+    for index in range(0, len(keys), chunk_size):
+        chunk = keys[index:index + chunk_size]
+        existing = set(Tinylink.objects.filter(short_url__in=chunk)
+                       .values_list('short_url', flat=True))
+        for short_url in chunk:
+            if short_url not in existing:
+                del short_links[short_url]
+                removed += 1
+    return removed
+
+
+class NginxMapFormat(object):
+    """
+    Entries for an nginx ``map`` block, one ``short_url "long_url";`` per line.
+
+    Long URLs that contain a ``$`` are skipped, because nginx would expand
+    them as variables. Requests for them are still handled by Django.
+
+    """
+    def write(self, fileobj, short_links):
+        count = 0
+        for short_url, long_url in short_links:
+            if '$' in long_url:
+                continue
+            fileobj.write(u'{0} "{1}";\n'.format(
+                short_url,
+                long_url.replace('\\', '\\\\').replace('"', '\\"'),
+            ).encode('utf-8'))
+            count += 1
+        return count
+
+    def read(self, fileobj):
+        short_links = {}
+        for line in fileobj:
+            short_url, long_url = line.decode('utf-8').rstrip().split(' ', 1)
+            short_links[short_url] = long_url[1:-2].replace(
+                '\\"', '"').replace('\\\\', '\\')
+        return short_links
+
+
+class JSONFormat(object):
+    """A JSON object that maps short URLs to long URLs."""
+    def write(self, fileobj, short_links):
+        count = 0
+        fileobj.write(b'{')
+        for short_url, long_url in short_links:
+            fileobj.write('{0}\n{1}: {2}'.format(
+                ',' if count else '', json.dumps(short_url),
+                json.dumps(long_url)).encode('ascii'))
+            count += 1
+        fileobj.write(b'\n}\n')
+        return count
+
+    def read(self, fileobj):
+        return json.loads(fileobj.read().decode('ascii'))
+
+
+class BinaryIndexFormat(object):
+    """
+    Binary index of all short URLs, sorted bytewise for binary search.
+
+    The file consists of the records, a table with the ``<Q`` offset of each
+    record and a footer. A record is a ``<BH`` header with the length of the
+    short URL and the long URL, followed by both as UTF-8. The ``<Q4s`` footer
+    holds the offset of the table and the magic ``TLNK``. See ``lookup``.
+
+    The short URLs are sorted in runs of ``TINYLINK_EXPORT_CHUNK_SIZE`` links
+    that are merged afterwards, so memory stays flat.
+
+    """
+    header = struct.Struct('<BH')
+    offset = struct.Struct('<Q')
+    footer = struct.Struct('<Q4s')
+    magic = b'TLNK'
+
+    def write_record(self, fileobj, key, value):
+        fileobj.write(self.header.pack(len(key), len(value)))
+        fileobj.write(key)
+        fileobj.write(value)
+
+    def read_records(self, fileobj, end=None):
+        while end is None or fileobj.tell() < end:
+            header = fileobj.read(self.header.size)
+            if not header:
+                return
+            key_length, value_length = self.header.unpack(header)
+            yield (fileobj.read(key_length), fileobj.read(value_length))
+
+    def sort(self, short_links):
+        chunk_size = getattr(settings, 'TINYLINK_EXPORT_CHUNK_SIZE', 10000)
+        runs = []
+        run = []
+        for short_url, long_url in short_links:
+            run.append((short_url.encode('utf-8'), long_url.encode('utf-8')))
+            if len(run) >= chunk_size:
+                runs.append(self.write_run(run))
+                run = []
+        if not runs:
+            return sorted(run), runs
+        if run:
+            runs.append(self.write_run(run))
+        return heapq.merge(*[self.read_records(fileobj)
+                             for fileobj in runs]), runs
+
+    def write_run(self, run):
+        fileobj = tempfile.TemporaryFile()
+        for key, value in sorted(run):
+            self.write_record(fileobj, key, value)
+        fileobj.seek(0)
+        return fileobj
+
+    def write(self, fileobj, short_links):
+        records, runs = self.sort(short_links)
+        offsets = tempfile.TemporaryFile()
+        count = 0
+        try:
+            start = fileobj.tell()
+            for key, value in records:
+                offsets.write(self.offset.pack(fileobj.tell() - start))
+                self.write_record(fileobj, key, value)
+                count += 1
+            table = fileobj.tell() - start
+            offsets.seek(0)
+            for chunk in iter(lambda: offsets.read(65536), b''):
+                fileobj.write(chunk)
+            fileobj.write(self.footer.pack(table, self.magic))
+        finally:
+            offsets.close()
+            for run in runs:
+                run.close()
+        return count
+
+    def read(self, fileobj):
+        fileobj.seek(-self.footer.size, os.SEEK_END)
+        table = self.footer.unpack(fileobj.read(self.footer.size))[0]
+        fileobj.seek(0)
+        return dict((key.decode('utf-8'), value.decode('utf-8'))
+                    for key, value in self.read_records(fileobj, table))
+
+    def lookup(self, path, short_url):
+        """
+        Returns the long URL of a short URL from an index file.
+
+        Returns ``None`` if the short URL is not in the index.
+
+        """
+        key = short_url.encode('utf-8')
+        with open(path, 'rb') as fileobj:
+            data = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                table, magic = self.footer.unpack_from(
+                    data, len(data) - self.footer.size)
+                if magic != self.magic:
+                    raise ValueError('{0} is not a tinylinks index.'.format(
+                        path))
+                low = 0
+                high = (len(data) - self.footer.size - table) // (
+                    self.offset.size)
+                while low < high:
+                    middle = (low + high) // 2
+                    offset = self.offset.unpack_from(
+                        data, table + middle * self.offset.size)[0]
+                    key_length, value_length = self.header.unpack_from(
+                        data, offset)
+                    start = offset + self.header.size
+                    current = data[start:start + key_length]
+                    if current == key:
+                        start += key_length
+                        return data[start:start + value_length].decode(
+                            'utf-8')
+                    if current < key:
+                        low = middle + 1
+                    else:
+                        high = middle
+                return None
+            finally:
+                data.close()
+
+
+STATISTICS_COLUMNS = (
+    'id', 'short_url', 'long_url', 'user', 'is_broken', 'validation_error',
+    'last_checked', 'amount_of_views')
+
+#: Statistics columns that are read from the ``TargetURL`` of a tinylink.
+TARGET_COLUMNS = ('is_broken', 'validation_error', 'last_checked')
+
+
+def filter_statistics(user=None, is_broken=None, checked_after=None,
+                      checked_before=None):
+    """Returns the tinylinks that match the given filters."""
+    links = Tinylink.objects.all()
+    if user is not None:
+        links = links.filter(user_id=user)
+    if is_broken is not None:
+        links = links.filter(target__is_broken=is_broken)
+    if checked_after is not None:
+        links = links.filter(target__last_checked__gte=checked_after)
+    if checked_before is not None:
+        links = links.filter(target__last_checked__lt=checked_before)
+    return links
+
+
+def iter_statistics(links):
+    """
+    Yields the ``STATISTICS_COLUMNS`` of the given tinylinks.
+
+    Like ``iter_short_links``, the rows are read in chunks of
+    ``TINYLINK_EXPORT_CHUNK_SIZE`` rows, which are paginated over the primary
+    key.
+
+    """
+    chunk_size = getattr(settings, 'TINYLINK_EXPORT_CHUNK_SIZE', 10000)
+    links = links.order_by('pk')
+    fields = [
+        'target__{0}'.format(name) if name in TARGET_COLUMNS else name
+        for name in STATISTICS_COLUMNS]
+    fields[fields.index('user')] = 'user__{0}'.format(
+        get_user_model().USERNAME_FIELD)
+    last = None
+    while True:
+        chunk = links if last is None else links.filter(pk__gt=last)
+        count = 0
+        for row in chunk.values_list(*fields)[:chunk_size].iterator():
+            count += 1
+            last = row[0]
+            yield row
+        if count < chunk_size:
+            return
+
+
+class LineBuffer(object):
+    """File-like object that returns what is written to it."""
+    def write(self, value):
+        return value
+
+
+class CSVStatisticsFormat(object):
+    """Comma separated values with a header row."""
+    content_type = 'text/csv'
+
+    def iter_lines(self, rows):
+        writer = csv.writer(LineBuffer())
+        yield self.write_row(writer, STATISTICS_COLUMNS)
+        for row in rows:
+            yield self.write_row(writer, row)
+
+    def write_row(self, writer, row):
+        row = [value.isoformat() if hasattr(value, 'isoformat') else
+               six.text_type(value) for value in row]
+        if six.PY2:
+            # The csv module of Python 2 does not support unicode.
+            return writer.writerow(
+                [value.encode('utf-8') for value in row]).decode('utf-8')
+        return writer.writerow(row)
+
+
+class NDJSONStatisticsFormat(object):
+    """One JSON object per line."""
+    content_type = 'application/x-ndjson'
+
+    def iter_lines(self, rows):
+        for row in rows:
+            yield json.dumps(OrderedDict(zip(STATISTICS_COLUMNS, row)),
+                             cls=DjangoJSONEncoder) + '\n'
+
+
+STATISTICS_FORMATS = {
+    'csv': CSVStatisticsFormat,
+    'ndjson': NDJSONStatisticsFormat,
+}
+
+
+EXPORT_FORMATS = {
+    'binary': BinaryIndexFormat,
+    'json': JSONFormat,
+    'nginx': NginxMapFormat,
+}
@@ -1,13 +1,16 @@
 """Forms for the ``django-tinylinks`` app."""
-import random
-
 from django import forms
-from django.conf import settings
 from django.forms.utils import ErrorList
 from django.utils.translation import ugettext_lazy as _
 
+from .exports import STATISTICS_FORMATS, filter_statistics
+from .generators import get_code_generator
 from .models import Tinylink
-from .utils import validate_long_url
+from .utils import is_reserved_short_url, validate_long_url
+
+
+RESERVED_ERROR = _(
+    'This short url is the address of another page. Please try another one.')
 
 
 class TinylinkForm(forms.ModelForm):
@@ -58,6 +61,9 @@ class TinylinkForm(forms.ModelForm):
 
     def clean(self):
         self.cleaned_data = super(TinylinkForm, self).clean()
+        if is_reserved_short_url(self.cleaned_data.get('short_url')):
+            self._errors['short_url'] = ErrorList([RESERVED_ERROR])
+            return self.cleaned_data
         # If short URL is occupied throw out an error, or fail silent.
         try:
             twin = Tinylink.objects.get(short_url=self.cleaned_data.get(
@@ -69,36 +75,32 @@ class TinylinkForm(forms.ModelForm):
         except Tinylink.DoesNotExist:
             pass
         # Brothers are entities with the same long URL
-        brothers = Tinylink.objects.filter(long_url=self.cleaned_data.get(
-            'long_url'), user=self.user)
+        long_url = self.cleaned_data.get('long_url')
+        brother = long_url and Tinylink.objects.get_brother(
+            self.user, long_url)
         input_url = self.cleaned_data.get('short_url')
 
         # Only handle with older brothers, if there's no new short URL value
-        if brothers and not input_url:
+        if brother and not input_url:
             # This can only happen, if a user tries to auto-generate a
             # short URL with an existing tinylink. She will receive the
             # prefilled form with the link's old values.
-            self.instance = brothers[0]
+            self.instance = brother
             self.cleaned_data.update(
                 {'short_url': self.instance.short_url})
         else:
-            slug = ''
+            # User can customize their URLs, others are generated on save.
             if input_url:
-                # User can customize their URLs
-                slug = input_url
-            # This keeps the unique validation of the short URLs alive.
-            if not Tinylink.objects.filter(short_url=input_url):
-                while not slug or Tinylink.objects.filter(short_url=slug):
-                    slug = ''.join(
-                        random.choice('abcdefghijkmnpqrstuvwxyz123456789')
-                        for x in range(
-                            getattr(settings, 'TINYLINK_LENGTH', 6)))
-                self.cleaned_data.update({'short_url': slug})
+                get_code_generator().discard(input_url)
         return self.cleaned_data
 
     def save(self, *args, **kwargs):
         if not self.instance.pk:
             self.instance.user = self.user
+        if not self.instance.short_url:
+            # Generators like the pool claim a short URL, so only generate it
+            # once the tinylink is actually saved.
+            self.instance.short_url = get_code_generator().generate()
         self.instance = super(TinylinkForm, self).save(*args, **kwargs)
         return validate_long_url(self.instance)
 
@@ -130,6 +132,9 @@ class TinylinkAdminForm(forms.ModelForm):
 
     def clean(self):
         self.cleaned_data = super(TinylinkAdminForm, self).clean()
+        if is_reserved_short_url(self.cleaned_data.get('short_url')):
+            self._errors['short_url'] = ErrorList([RESERVED_ERROR])
+            return self.cleaned_data
         # If short URL is occupied throw out an error, or fail silent.
         try:
             twin = Tinylink.objects.get(
@@ -137,17 +142,51 @@ class TinylinkAdminForm(forms.ModelForm):
             )
         except Tinylink.DoesNotExist:
             slug = self.cleaned_data.get('short_url')
-            while not slug or Tinylink.objects.filter(short_url=slug):
-                slug = ''.join(
-                    random.choice('abcdefghijkmnpqrstuvwxyz123456789')
-                    for x in range(getattr(settings, 'TINYLINK_LENGTH', 6)))
-            self.cleaned_data.update({'short_url': slug})
+            if slug:
+                get_code_generator().discard(slug)
         else:
             if twin != self.instance:
                 self._errors['short_url'] = ErrorList([_(
                     'This short url already exists. Please try another one.')])
         return self.cleaned_data
 
+    def save(self, *args, **kwargs):
+        if not self.instance.short_url:
+            self.instance.short_url = get_code_generator().generate()
+        return super(TinylinkAdminForm, self).save(*args, **kwargs)
+
     class Meta:
         model = Tinylink
-        fields = ('user', 'long_url', 'short_url')
+        fields = ('user', 'long_url', 'short_url', 'redirect_status',
+                  'cache_max_age')
+
+
+class StatisticsExportForm(forms.Form):
+    """
+    Validates the filters of the statistics export.
+
+    """
+    format = forms.ChoiceField(
+        choices=[(name, name) for name in sorted(STATISTICS_FORMATS)],
+        required=False,
+    )
+    user = forms.IntegerField(required=False)
+    broken = forms.TypedChoiceField(
+        choices=(('', ''), ('true', 'true'), ('false', 'false')),
+        coerce=lambda value: value == 'true',
+        empty_value=None,
+        required=False,
+    )
+    checked_after = forms.DateTimeField(required=False)
+    checked_before = forms.DateTimeField(required=False)
+
+    def get_format(self):
+        return STATISTICS_FORMATS[self.cleaned_data['format'] or 'csv']()
+
+    def get_links(self):
+        return filter_statistics(
+            user=self.cleaned_data['user'],
+            is_broken=self.cleaned_data['broken'],
+            checked_after=self.cleaned_data['checked_after'],
+            checked_before=self.cleaned_data['checked_before'],
+        )
@@ -0,0 +1,420 @@
+"""Short URL generators for the ``tinylinks`` app."""
+import binascii
+import hashlib
+import logging
+import random
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count
+from django.db.models.functions import Length
+from django.dispatch import Signal
+from django.utils.module_loading import import_string
+
+from .models import ShortCodePool, Tinylink
+
+
+logger = logging.getLogger(__name__)
+
+#: Sent after a random short URL was generated, with its ``length`` and the
+#: number of ``retries`` that were needed because of collisions. Connect your
+#: metrics to it.
+code_generated = Signal(providing_args=['length', 'retries'])
+
+
+#: Characters of generated short URLs. Similar looking characters are left out.
+ALPHABET = 'abcdefghijkmnpqrstuvwxyz123456789'
+
+#: Prefix of the placeholders that tinylinks are saved with until their short
+#: URL is assigned. It is not allowed in short URLs.
+PLACEHOLDER_PREFIX = '_'
+
+
+def is_placeholder(short_url):
+    """Returns ``True`` if the short URL is a placeholder."""
+    return short_url.startswith(PLACEHOLDER_PREFIX)
+
+
+def get_inverse(number, modulus):
+    """Returns the modular multiplicative inverse of a number."""
+    previous, current = 0, 1
+    remainder, next_remainder = modulus, number % modulus
+    while next_remainder:
+        quotient = remainder // next_remainder
+        previous, current = current, previous - quotient * current
+        remainder, next_remainder = (
+            next_remainder, remainder - quotient * next_remainder)
+    return previous % modulus
+
+
+def get_keyspace_usage(refresh=False):
+    """
+    Returns a dictionary of ``{length: count}`` of all taken short URLs.
+
+    Short URLs in the ``ShortCodePool`` count as taken. Counting them needs a
+    full scan, so only ``refresh`` counts them. Otherwise the counts of the
+    last refresh are read from the cache, or an empty dictionary if there was
+    none. Run ``./manage.py count_tinylink_keyspace`` regularly to refresh
+    them outside of requests.
+
+    """
+    if not refresh:
+        return cache.get('tinylinks:keyspace') or {}
+    usage = {}
+    for model in (Tinylink, ShortCodePool):
+        for length, count in model.objects.annotate(
+                length=Length('short_url')).values_list(
+                    'length').annotate(count=Count('pk')).order_by():
+            usage[length] = usage.get(length, 0) + count
+    cache.set('tinylinks:keyspace', usage, None)
+    return usage
+
+
+def get_occupancy(length, usage=None):
+    """Returns the estimated share of taken short URLs of a length."""
+    if usage is None:
+        usage = get_keyspace_usage()
+    return min(1.0, float(usage.get(length, 0)) / len(ALPHABET) ** length)
+
+
+def get_expected_retries(occupancy):
+    """Returns the expected collisions of a random short URL."""
+    if occupancy >= 1:
+        return float('inf')
+    return occupancy / (1 - occupancy)
+
+
+def has_room(count, length=None, usage=None):
+    """
+    Returns ``True`` if ``count`` more random short URLs of a length can be
+    generated without passing ``TINYLINK_MAX_EXPECTED_RETRIES``.
+
+    The length defaults to ``TINYLINK_LENGTH``. Use this to choose the length
+    of a batch of short URLs before importing it.
+
+    """
+    if length is None:
+        length = getattr(settings, 'TINYLINK_LENGTH', 6)
+    if usage is None:
+        usage = get_keyspace_usage()
+    occupancy = float(usage.get(length, 0) + count) / len(ALPHABET) ** length
+    return get_expected_retries(occupancy) <= getattr(
+        settings, 'TINYLINK_MAX_EXPECTED_RETRIES', 0.5)
+
+
+def get_code_length(count=1, usage=None):
+    """
+    Returns the shortest length from ``TINYLINK_LENGTH`` on that has room for
+    ``count`` more random short URLs.
+
+    """
+    if usage is None:
+        usage = get_keyspace_usage()
+    length = getattr(settings, 'TINYLINK_LENGTH', 6)
+    while length < 32 and not has_room(count, length, usage):
+        length += 1
+    return length
+
+
+def get_generation_stats():
+    """Returns the number of generated random short URLs and their retries."""
+    stats = cache.get_many(['tinylinks:codes:generated',
+                            'tinylinks:codes:retries'])
+    return (stats.get('tinylinks:codes:generated', 0),
+            stats.get('tinylinks:codes:retries', 0))
+
+
+def record_generation(length, retries):
+    """Counts a generated random short URL and notifies the metrics."""
+    for key, value in (('tinylinks:codes:generated', 1),
+                       ('tinylinks:codes:retries', retries)):
+        if not cache.add(key, value, None):
+            cache.incr(key, value)
+    code_generated.send(sender=RandomCodeGenerator, length=length,
+                        retries=retries)
+
+
+class BaseCodeGenerator(object):
+    """
+    Base class for short URL generators.
+
+    ``generate`` returns the short URL of a new tinylink before it is saved.
+    It can also return a placeholder, which is replaced by ``assign`` right
+    after the tinylink was saved.
+
+    """
+    def generate(self):
+        raise NotImplementedError
+
+    def assign(self, link):
+        """Replaces the placeholder of a saved tinylink with a short URL."""
+        link.short_url = self.generate()
+        link.save(update_fields=['short_url', 'modified'])
+
+    def discard(self, short_url):
+        """Tells the generator that a custom short URL was taken."""
+        pass
+
+    def decode(self, short_url):
+        """
+        Returns the primary key that a short URL encodes or ``None``.
+
+        The primary key is only a hint. The tinylink still has to match the
+        short URL.
+
+        """
+        return None
+
+
+class RandomCodeGenerator(BaseCodeGenerator):
+    """
+    Picks random short URLs of ``TINYLINK_LENGTH`` characters.
+
+    Every attempt needs a query to check if the short URL is taken. Once the
+    keyspace of a length is so full that the expected number of collisions
+    passes ``TINYLINK_MAX_EXPECTED_RETRIES``, longer short URLs are used. The
+    length is also increased after ``TINYLINK_MAX_RETRIES`` collisions in a
+    row, in case the cached occupancy is outdated.
+
+    """
+    def get_random_code(self, length):
+        return ''.join(random.choice(ALPHABET) for x in range(length))
+
+    def generate(self):
+        length = get_code_length()
+        max_retries = getattr(settings, 'TINYLINK_MAX_RETRIES', 10)
+        retries = 0
+        while True:
+            short_url = self.get_random_code(length)
+            if not Tinylink.objects.filter(short_url=short_url).exists():
+                record_generation(length, retries)
+                return short_url
+            retries += 1
+            if not retries % max_retries and length < 32:
+                length += 1
+
+
+class SequenceCodeGenerator(BaseCodeGenerator):
+    """
+    Encodes the primary key of a tinylink into its short URL.
+
+    New tinylinks are saved with a placeholder, which is replaced with
+    ``TINYLINK_SEQUENCE_PREFIX`` and the encoded primary key right after the
+    insert. No collision queries are needed, and redirects can look tinylinks
+    up by their primary key. Only short URLs with the prefix are decoded, so
+    random and custom short URLs are looked up with a single query.
+
+    The primary keys are numbered in tiers of ``33 ** length`` codes, starting
+    with ``TINYLINK_SEQUENCE_MIN_LENGTH`` characters. If
+    ``TINYLINK_SEQUENCE_KEY`` is set, the codes of each tier are shuffled with
+    an affine permutation, so that consecutive tinylinks don't get
+    consecutive short URLs. This obfuscates the codes but doesn't make them
+    secret. Changing the settings breaks the decoding of existing codes, so
+    redirects fall back to the slower lookup of the short URL.
+
+    If the code of a primary key was already taken as a custom short URL, a
+    random short URL is assigned instead.
+
+    """
+    def __init__(self):
+        self.permutations = {}
+
+    @property
+    def min_length(self):
+        return getattr(settings, 'TINYLINK_SEQUENCE_MIN_LENGTH', 4)
+
+    @property
+    def prefix(self):
+        return getattr(settings, 'TINYLINK_SEQUENCE_PREFIX', '0')
+
+    @property
+    def max_pk(self):
+        """Returns the largest primary key the database can store."""
+        if Tinylink._meta.pk.get_internal_type() == 'BigAutoField':
+            return 2 ** 63 - 1
+        return 2 ** 31 - 1
+
+    def get_permutation(self, length):
+        """Returns the factor, its inverse and the offset of a tier."""
+        key = getattr(settings, 'TINYLINK_SEQUENCE_KEY', None)
+        size = len(ALPHABET) ** length
+        if key is None:
+            return 1, 1, 0
+        if (key, length) not in self.permutations:
+            digest = hashlib.sha256('{0}:{1}'.format(key, length).encode(
+                'utf-8')).digest()
+            factor = int(binascii.hexlify(digest[:16]), 16) % size
+            # The factor has to be coprime to 33 ** length.
+            while not factor % 3 or not factor % 11:
+                factor = (factor + 1) % size
+            self.permutations[(key, length)] = (
+                factor, get_inverse(factor, size),
+                int(binascii.hexlify(digest[16:]), 16) % size)
+        return self.permutations[(key, length)]
+
+    def encode(self, pk):
+        """Returns the short URL of a primary key."""
+        index = pk - 1
+        length = self.min_length
+        while index >= len(ALPHABET) ** length:
+            index -= len(ALPHABET) ** length
+            length += 1
+        factor, inverse, offset = self.get_permutation(length)
+        index = (index * factor + offset) % len(ALPHABET) ** length
+        chars = []
+        for position in range(length):
+            index, remainder = divmod(index, len(ALPHABET))
+            chars.append(ALPHABET[remainder])
+        return self.prefix + ''.join(reversed(chars))
+
+    def decode(self, short_url):
+        if not self.prefix or not short_url.startswith(self.prefix):
+            return None
+        short_url = short_url[len(self.prefix):]
+        length = len(short_url)
+        if length < self.min_length or length > 32:
+            return None
+        index = 0
+        for char in short_url:
+            position = ALPHABET.find(char)
+            if position < 0:
+                return None
+            index = index * len(ALPHABET) + position
+        factor, inverse, offset = self.get_permutation(length)
+        index = (index - offset) * inverse % len(ALPHABET) ** length
+        for tier in range(self.min_length, length):
+            index += len(ALPHABET) ** tier
+        if index >= self.max_pk:
+            # Databases raise errors for numbers beyond their integers.
+            return None
+        return index + 1
+
+    def generate(self):
+        return PLACEHOLDER_PREFIX + uuid.uuid4().hex[:31]
+
+    def assign(self, link):
+        link.short_url = self.encode(link.pk)
+        try:
+            with transaction.atomic():
+                link.save(update_fields=['short_url', 'modified'])
+        except IntegrityError:
+            link.short_url = RandomCodeGenerator().generate()
+            link.save(update_fields=['short_url', 'modified'])
+
+
+class PoolCodeGenerator(BaseCodeGenerator):
+    """
+    Hands out random short URLs from the ``ShortCodePool`` table.
+
+    Every short URL is claimed by deleting it from the pool. On PostgreSQL a
+    single ``DELETE ... RETURNING`` skips the rows that concurrent requests
+    have locked, elsewhere a lost race is retried. Run the
+    ``fill_tinylink_code_pool`` command regularly to keep the pool filled. If
+    the pool is empty, a random short URL is generated.
+
+    """
+    def claim(self):
+        """Removes one short URL from the pool and returns it."""
+        connection = connections[router.db_for_write(ShortCodePool)]
+        qn = connection.ops.quote_name
+        opts = ShortCodePool._meta
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'DELETE FROM {table} WHERE {pk} = (SELECT {pk} FROM'
+                    ' {table} LIMIT 1 FOR UPDATE SKIP LOCKED)'
+                    ' RETURNING {short_url}'.format(
+                        table=qn(opts.db_table), pk=qn(opts.pk.column),
+                        short_url=qn('short_url')))
+                row = cursor.fetchone()
+            return row[0] if row else None
+        for attempt in range(10):
+            row = ShortCodePool.objects.order_by('pk').values_list(
+                'pk', 'short_url').first()
+            if row is None:
+                return None
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM {table} WHERE {pk} = %s'.format(
+                    table=qn(opts.db_table), pk=qn(opts.pk.column)),
+                    [row[0]])
+                if cursor.rowcount:
+                    return row[1]
+        return None
+
+    def generate(self):
+        short_url = self.claim()
+        if short_url is None:
+            logger.warning('The short code pool is empty.')
+            return RandomCodeGenerator().generate()
+        return short_url
+
+    def discard(self, short_url):
+        ShortCodePool.objects.filter(short_url=short_url).delete()
+
+    def fill(self, force=False):
+        """
+        Fills the pool with ``TINYLINK_CODE_POOL_SIZE`` random short URLs.
+
+        The short URLs get the shortest length from ``TINYLINK_LENGTH`` on
+        that has room for all of them, see ``get_code_length``. The keyspace
+        usage is counted again before, since this runs outside of requests.
+
+        Unless ``force`` is set, the pool is only filled once it holds less
+        than ``TINYLINK_CODE_POOL_LOW_WATER_MARK`` short URLs.
+
+        Returns the number of added short URLs.
+
+        """
+        size = getattr(settings, 'TINYLINK_CODE_POOL_SIZE', 10000)
+        count = ShortCodePool.objects.count()
+        if not force and count >= getattr(
+                settings, 'TINYLINK_CODE_POOL_LOW_WATER_MARK', 2000):
+            return 0
+        length = get_code_length(
+            size - count, get_keyspace_usage(refresh=True))
+        generator = RandomCodeGenerator()
+        added = 0
+        while count + added < size:
+            short_urls = set(
+                generator.get_random_code(length)
+                for x in range(min(size - count - added, 1000)))
+            short_urls.difference_update(Tinylink.objects.filter(
+                short_url__in=short_urls).values_list('short_url', flat=True))
+            short_urls.difference_update(ShortCodePool.objects.filter(
+                short_url__in=short_urls).values_list('short_url', flat=True))
+            if not short_urls:
+                # The keyspace of this length is exhausted.
+                break
+            ShortCodePool.objects.bulk_create(
+                [ShortCodePool(short_url=short_url)
+                 for short_url in short_urls])
+            added += len(short_urls)
+        return added
+
+
+CODE_GENERATORS = {
+    'pool': PoolCodeGenerator,
+    'random': RandomCodeGenerator,
+    'sequence': SequenceCodeGenerator,
+}
+
+_code_generators = {}
+
+
+def get_code_generator():
+    """
+    Returns the short URL generator configured by ``TINYLINK_CODE_GENERATOR``.
+
+    The setting is the name of a generator in ``CODE_GENERATORS`` or the
+    dotted path of a ``BaseCodeGenerator`` subclass.
+
+    """
+    name = getattr(settings, 'TINYLINK_CODE_GENERATOR', 'random')
+    if name not in _code_generators:
+        generator_class = CODE_GENERATORS.get(name)
+        if generator_class is None:
+            generator_class = import_string(name)
+        _code_generators[name] = generator_class()
+    return _code_generators[name]
@@ -0,0 +1,27 @@
+"""
+Custom admin command to set the long URL hash of tinylinks that lack one.
+
+The migration that adds the hash fills it for all existing tinylinks. Run
+this after loading tinylinks with raw SQL, fixtures or ``update()`` calls,
+which bypass ``Tinylink.save``.
+
+"""
+from django.core.management.base import BaseCommand
+
+from ...models import Tinylink
+
+
+class Command(BaseCommand):
+    """Class for the backfill_tinylink_hashes admin command."""
+    help = 'Sets the long URL hash of tinylinks that lack one.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of tinylinks that are updated per transaction.')
+
+    def handle(self, *args, **options):
+        """Handles the backfill_tinylink_hashes admin command."""
+        self.stdout.write('Updated {0} tinylinks.'.format(
+            Tinylink.objects.backfill_long_url_hashes(
+                options['chunk_size'])))
@@ -3,27 +3,99 @@ Custom admin command to check all tinylink target URLs.
 
 It should check in a certain interval during a certain period defined in the
 settings by TINYLINK_CHECK_INTERVAL and TINYLINK_CHECK_PERIOD.
-After one period, all URLs should be checked for their availability.
+Each run checks the URLs whose ``next_check_at`` has passed, see
+``tinylinks.schedules``, but not more than TINYLINK_CHECK_BATCH_SIZE of them.
+The URLs that are due the longest come first.
+
+Each ``TargetURL`` is checked once for all tinylinks that point to it.
+
+The URLs are checked concurrently by ``--workers`` threads, which defaults to
+TINYLINK_CHECK_WORKERS. The results are saved from the main thread with one
+UPDATE per distinct result.
+
+With ``--backend asyncio`` (or TINYLINK_CHECK_BACKEND), the URLs are checked
+in an event loop instead, see ``tinylinks.aio``. This needs Python 3.5.
+
+A run stops starting new requests when its ``--budget`` (or
+TINYLINK_CHECK_BUDGET) of seconds runs out. The remaining URLs are carried
+over to the next run. Runs that start while another run is still checking
+exit right away. The lock expires after the budget and the longest time
+that one check can take.
 
 """
+import time
+
 from django.conf import settings
-from django.core.management.base import BaseCommand
-from django.utils import timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+from django.utils import six, timezone
 
-from ...models import Tinylink
-from ...utils import validate_long_url
+from ...models import TargetURL, Tinylink
+from ...utils import (
+    check_lock,
+    check_long_urls,
+    get_max_check_duration,
+    save_checks,
+)
 
 
 class Command(BaseCommand):
     """Class for the check_tinylink_targets admin command."""
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Number of URLs that are checked at the same time.')
+        parser.add_argument(
+            '--backend', choices=('threads', 'asyncio'), default=None,
+            help='Check the URLs in a thread pool or with asyncio.')
+        parser.add_argument(
+            '--budget', type=float, default=None,
+            help='Number of seconds after which no new checks are started.')
+
     def handle(self, *args, **options):
         """Handles the check_tinylink_targets admin command."""
         interval = settings.TINYLINK_CHECK_INTERVAL
-        period = settings.TINYLINK_CHECK_PERIOD
-        url_amount = Tinylink.objects.all().count()
-        check_amount = (url_amount / (period / interval)) or 1
-        for link in Tinylink.objects.order_by('last_checked')[:check_amount]:
-            validate_long_url(link)
-        print('[' + timezone.now().strftime('%d.%m.%Y - %H:%M') +
-              '] Checked ' + str(check_amount) + ' of ' + str(url_amount) +
-              ' total URLs.')
+        batch_size = getattr(settings, 'TINYLINK_CHECK_BATCH_SIZE', 1000)
+        budget = options['budget'] or getattr(
+            settings, 'TINYLINK_CHECK_BUDGET', interval * 60 * 0.8)
+        backend = options['backend'] or getattr(
+            settings, 'TINYLINK_CHECK_BACKEND', 'threads')
+        if backend == 'asyncio' and six.PY2:
+            raise CommandError(
+                'The asyncio backend needs Python 3.5 or newer.')
+        deadline = time.time() + budget
+        with check_lock(budget + get_max_check_duration()) as acquired:
+            if not acquired:
+                print('[' + timezone.now().strftime('%d.%m.%Y - %H:%M') +
+                      '] Another run is still checking URLs.')
+                return
+            # Targets without tinylinks are left over from changed long URLs.
+            # A subquery instead of a join keeps the query on the index of
+            # next_check_at without sorting out duplicates.
+            links = list(TargetURL.objects.filter(
+                pk__in=Tinylink.objects.values('target'),
+                next_check_at__lte=timezone.now(),
+            ).order_by('next_check_at')[:batch_size])
+            views = dict(Tinylink.objects.filter(target__in=links)
+                         .values_list('target')
+                         .annotate(Sum('amount_of_views')))
+            for link in links:
+                link.amount_of_views = views.get(link.pk, 0)
+            if backend == 'asyncio':
+                from ...aio import check_long_urls_async
+
+                def check(links):
+                    return check_long_urls_async(links, deadline=deadline)
+            else:
+                def check(links):
+                    return check_long_urls(links, options['workers'],
+                                           deadline)
+            checked = list(check(links))
+            save_checks(checked)
+        message = ('[' + timezone.now().strftime('%d.%m.%Y - %H:%M') +
+                   '] Checked ' + str(len(checked)) + ' of ' +
+                   str(len(links)) + ' due URLs.')
+        if len(checked) < len(links):
+            message += ' Carried over ' + str(
+                len(links) - len(checked)) + ' URLs to the next run.'
+        print(message)
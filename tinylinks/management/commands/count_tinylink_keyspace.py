@@ -0,0 +1,23 @@
+"""
+Custom admin command to count the taken short URLs of each length.
+
+The counts are stored in the cache, where the random and the pool generator
+read them to choose the length of new short URLs. Counting needs a full scan
+of the tinylinks, so run this regularly, e.g. every few minutes, instead of
+counting during requests.
+
+"""
+from django.core.management.base import BaseCommand
+
+from ...generators import get_keyspace_usage
+
+
+class Command(BaseCommand):
+    """Class for the count_tinylink_keyspace admin command."""
+    help = 'Counts the taken short URLs of each length.'
+
+    def handle(self, *args, **options):
+        """Handles the count_tinylink_keyspace admin command."""
+        usage = get_keyspace_usage(refresh=True)
+        self.stdout.write('Counted {0} short URLs.'.format(
+            sum(usage.values())))
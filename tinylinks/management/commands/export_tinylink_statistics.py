@@ -0,0 +1,55 @@
+"""
+Custom admin command to export the statistics of all tinylinks.
+
+Writes CSV or NDJSON to the standard output or to a file. The tinylinks are
+read in chunks, so memory stays flat for any number of tinylinks.
+
+"""
+import io
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...exports import STATISTICS_FORMATS, iter_statistics
+from ...forms import StatisticsExportForm
+
+
+class Command(BaseCommand):
+    """Class for the export_tinylink_statistics admin command."""
+    help = 'Exports the statistics of all tinylinks as CSV or NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', default='csv', choices=sorted(STATISTICS_FORMATS),
+            help='Format of the export.')
+        parser.add_argument(
+            '--output', help='Path of the export file. Default: stdout.')
+        parser.add_argument(
+            '--user', help='Only export links of this user ID.')
+        parser.add_argument(
+            '--broken', choices=('true', 'false'),
+            help='Only export broken or valid links.')
+        parser.add_argument(
+            '--checked-after',
+            help='Only export links that were validated since this time.')
+        parser.add_argument(
+            '--checked-before',
+            help='Only export links that were validated before this time.')
+
+    def handle(self, *args, **options):
+        """Handles the export_tinylink_statistics admin command."""
+        form = StatisticsExportForm(dict(
+            (name, options[name]) for name in (
+                'format', 'user', 'broken', 'checked_after', 'checked_before')
+            if options.get(name) is not None))
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+        lines = form.get_format().iter_lines(iter_statistics(
+            form.get_links()))
+        if not options.get('output'):
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with io.open(options['output'], 'w', encoding='utf-8',
+                     newline='') as fileobj:
+            for line in lines:
+                fileobj.write(line)
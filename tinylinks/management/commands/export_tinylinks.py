@@ -0,0 +1,75 @@
+"""
+Custom admin command to export all short URLs for edge servers.
+
+Writes an nginx ``map`` file, a JSON object or a sorted binary index that maps
+all short URLs to their long URLs, so that a web server or a small sidecar can
+answer most redirects without Django.
+
+With ``--incremental`` only tinylinks that were changed since the last run are
+read from the database and merged into the existing export.
+
+"""
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import now
+
+from ...exports import (
+    EXPORT_FORMATS,
+    iter_short_links,
+    remove_deleted_short_links,
+)
+
+
+class Command(BaseCommand):
+    """Class for the export_tinylinks admin command."""
+    help = 'Exports all short URLs for edge servers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Path of the export file.')
+        parser.add_argument(
+            '--format', default='json', choices=sorted(EXPORT_FORMATS),
+            help='Format of the export file.')
+        parser.add_argument(
+            '--incremental', action='store_true', default=False,
+            help='Only export tinylinks that changed since the last run.')
+
+    def handle(self, *args, **options):
+        """Handles the export_tinylinks admin command."""
+        output = options['output']
+        export_format = EXPORT_FORMATS[options['format']]()
+        state = '{0}.state'.format(output)
+        started = now()
+        if (options['incremental'] and os.path.exists(output) and
+                os.path.exists(state)):
+            with open(state) as fileobj:
+                since = parse_datetime(fileobj.read().strip())
+            with open(output, 'rb') as fileobj:
+                short_links = export_format.read(fileobj)
+            changed = 0
+            for short_url, long_url in iter_short_links(since=since):
+                short_links[short_url] = long_url
+                changed += 1
+            removed = remove_deleted_short_links(short_links)
+            self.stdout.write('{0} changed and {1} removed tinylinks.'.format(
+                changed, removed))
+            short_links = sorted(short_links.items())
+        else:
+            short_links = iter_short_links()
+        # Replace the export at once, so that servers never read half a file.
+        directory = os.path.dirname(os.path.abspath(output))
+        fd, path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as fileobj:
+                count = export_format.write(fileobj, short_links)
+            os.chmod(path, 0o644)
+            os.rename(path, output)
+        except Exception:
+            os.remove(path)
+            raise
+        with open(state, 'w') as fileobj:
+            fileobj.write(started.isoformat())
+        self.stdout.write('Exported {0} tinylinks to {1}.'.format(
+            count, output))
@@ -0,0 +1,26 @@
+"""
+Custom admin command to fill the pool of unused short URLs.
+
+Only needed if ``TINYLINK_CODE_GENERATOR`` is set to ``'pool'``. The pool is
+refilled once it holds less than ``TINYLINK_CODE_POOL_LOW_WATER_MARK`` short
+URLs, so the command can run often, e.g. every minute.
+
+"""
+from django.core.management.base import BaseCommand
+
+from ...generators import PoolCodeGenerator
+
+
+class Command(BaseCommand):
+    """Class for the fill_tinylink_code_pool admin command."""
+    help = 'Fills the pool of unused short URLs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true', default=False,
+            help='Fill the pool even above the low-water mark.')
+
+    def handle(self, *args, **options):
+        """Handles the fill_tinylink_code_pool admin command."""
+        self.stdout.write('Added {0} short URLs to the pool.'.format(
+            PoolCodeGenerator().fill(force=options['force'])))
@@ -0,0 +1,21 @@
+"""
+Custom admin command to write buffered redirect views to the database.
+
+Only needed if ``TINYLINK_VIEW_BUFFER`` is set to ``'cache'``. It should run
+at least once per ``TINYLINK_VIEW_FLUSH_INTERVAL``.
+
+"""
+from django.core.management.base import BaseCommand
+
+from ...counters import get_view_buffer
+
+
+class Command(BaseCommand):
+    """Class for the flush_tinylink_views admin command."""
+    def handle(self, *args, **options):
+        """Handles the flush_tinylink_views admin command."""
+        view_buffer = get_view_buffer()
+        if not view_buffer:
+            self.stdout.write('Views are not buffered.')
+            return
+        self.stdout.write('Flushed {0} views.'.format(view_buffer.flush()))
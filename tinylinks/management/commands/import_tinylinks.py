@@ -0,0 +1,88 @@
+"""
+Custom admin command to create tinylinks for a list of long URLs.
+
+The file holds one long URL per line, optionally followed by a space and a
+custom short URL. Long URLs that the user already shortened are skipped.
+
+"""
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import URLValidator
+
+from ...generators import get_code_generator, has_room
+from ...models import Tinylink, get_long_url_hash
+
+
+class Command(BaseCommand):
+    """Class for the import_tinylinks admin command."""
+    help = 'Creates tinylinks for a list of long URLs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path of the file to import.')
+        parser.add_argument(
+            'user', help='Username of the author of the tinylinks.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of lines that are checked for duplicates at once.')
+
+    def handle(self, *args, **options):
+        """Handles the import_tinylinks admin command."""
+        try:
+            user = get_user_model()._default_manager.get_by_natural_key(
+                options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError('User {0} does not exist.'.format(
+                options['user']))
+        self.user = user
+        self.created = self.skipped = 0
+        chunk = []
+        with io.open(options['path'], encoding='utf-8') as fileobj:
+            for line in fileobj:
+                if line.strip():
+                    chunk.append(line.split())
+                if len(chunk) >= options['chunk_size']:
+                    self.import_chunk(chunk)
+                    chunk = []
+        if chunk:
+            self.import_chunk(chunk)
+        self.stdout.write('Created {0} tinylinks, skipped {1}.'.format(
+            self.created, self.skipped))
+
+    def import_chunk(self, chunk):
+        hashes = [get_long_url_hash(row[0]) for row in chunk]
+        existing = set(Tinylink.objects.filter(
+            user=self.user, long_url_hash__in=hashes).values_list(
+                'long_url_hash', flat=True))
+        if not has_room(len(chunk)):
+            self.stdout.write(
+                'TINYLINK_LENGTH has no room for {0} more short URLs. Longer'
+                ' short URLs will be generated.'.format(len(chunk)))
+        generator = get_code_generator()
+        for row, long_url_hash in zip(chunk, hashes):
+            long_url = row[0]
+            short_url = row[1] if len(row) > 1 else None
+            if long_url_hash in existing:
+                self.skipped += 1
+                continue
+            try:
+                URLValidator()(long_url)
+            except ValidationError:
+                self.stderr.write('Invalid long URL: {0}'.format(long_url))
+                self.skipped += 1
+                continue
+            if short_url:
+                if Tinylink.objects.filter(short_url=short_url).exists():
+                    self.stderr.write('Short URL is taken: {0}'.format(
+                        short_url))
+                    self.skipped += 1
+                    continue
+                generator.discard(short_url)
+            else:
+                short_url = generator.generate()
+            Tinylink.objects.create(
+                user=self.user, long_url=long_url, short_url=short_url)
+            existing.add(long_url_hash)
+            self.created += 1
@@ -0,0 +1,22 @@
+"""
+Custom admin command to save queued click events to the database.
+
+Only needed if ``TINYLINK_CLICK_EVENTS`` is set to ``'cache'``. It should run
+at least once per ``TINYLINK_CLICK_EVENTS_INTERVAL``.
+
+"""
+from django.core.management.base import BaseCommand
+
+from ...clicks import get_click_queue
+
+
+class Command(BaseCommand):
+    """Class for the ingest_tinylink_clicks admin command."""
+    def handle(self, *args, **options):
+        """Handles the ingest_tinylink_clicks admin command."""
+        click_queue = get_click_queue()
+        if not click_queue:
+            self.stdout.write('Click events are not recorded.')
+            return
+        self.stdout.write('Saved {0} click events.'.format(
+            click_queue.flush()))
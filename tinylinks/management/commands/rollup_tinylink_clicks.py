@@ -0,0 +1,20 @@
+"""
+Custom admin command to roll up click events into hourly and daily totals.
+
+Only events that were added since the last run are processed. Rolled up
+events older than ``TINYLINK_CLICK_EVENTS_RETENTION`` days are deleted.
+
+"""
+from django.core.management.base import BaseCommand
+
+from ...rollups import prune_click_events, rollup_click_events
+
+
+class Command(BaseCommand):
+    """Class for the rollup_tinylink_clicks admin command."""
+    def handle(self, *args, **options):
+        """Handles the rollup_tinylink_clicks admin command."""
+        self.stdout.write('Rolled up {0} click events.'.format(
+            rollup_click_events()))
+        self.stdout.write('Deleted {0} old click events.'.format(
+            prune_click_events()))
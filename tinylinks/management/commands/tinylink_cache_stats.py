@@ -0,0 +1,28 @@
+"""
+Custom admin command to show the hit and miss counters of the resolution
+cache.
+
+The counters are summed up over all processes that share the cache. Use them
+to size ``TINYLINK_RESOLUTION_CACHE_SIZE``.
+
+"""
+from django.core.management.base import BaseCommand
+
+from ...cache import get_resolution_cache
+
+
+class Command(BaseCommand):
+    """Class for the tinylink_cache_stats admin command."""
+    def handle(self, *args, **options):
+        """Handles the tinylink_cache_stats admin command."""
+        resolution_cache = get_resolution_cache()
+        if not resolution_cache:
+            self.stdout.write('The resolution cache is disabled.')
+            return
+        stats = resolution_cache.get_stats()
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        for name in resolution_cache.stat_names:
+            self.stdout.write('{0}: {1}'.format(name, stats[name]))
+        if lookups:
+            self.stdout.write('hit rate: {0:.1%}'.format(
+                1 - float(stats['misses']) / lookups))
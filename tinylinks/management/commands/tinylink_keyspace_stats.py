@@ -0,0 +1,37 @@
+"""
+Custom admin command to show how full the keyspace of random short URLs is.
+
+Prints the taken short URLs, the occupancy and the expected collisions per
+length, and the collisions that the random generator actually ran into.
+
+"""
+from django.core.management.base import BaseCommand
+
+from ...generators import (
+    ALPHABET,
+    get_code_length,
+    get_expected_retries,
+    get_generation_stats,
+    get_keyspace_usage,
+    get_occupancy,
+)
+
+
+class Command(BaseCommand):
+    """Class for the tinylink_keyspace_stats admin command."""
+    help = 'Shows how full the keyspace of random short URLs is.'
+
+    def handle(self, *args, **options):
+        """Handles the tinylink_keyspace_stats admin command."""
+        usage = get_keyspace_usage(refresh=True)
+        for length in sorted(usage):
+            occupancy = get_occupancy(length, usage)
+            self.stdout.write(
+                'length {0}: {1} of {2} taken ({3:.2%}), expected retries'
+                ' {4:.3f}'.format(
+                    length, usage[length], len(ALPHABET) ** length,
+                    occupancy, get_expected_retries(occupancy)))
+        self.stdout.write('current length: {0}'.format(get_code_length()))
+        generated, retries = get_generation_stats()
+        self.stdout.write('generated: {0}, retries: {1}'.format(
+            generated, retries))
@@ -0,0 +1,95 @@
+"""Middlewares for the ``tinylinks`` app."""
+from django.conf import settings
+from django.http.request import split_domain_port
+
+from .utils import follow_tinylink, get_redirect_response, is_valid_short_url
+
+try:
+    from django.urls import (
+        NoReverseMatch,
+        Resolver404,
+        get_script_prefix,
+        resolve,
+        reverse,
+    )
+except ImportError:  # Django < 1.10
+    from django.core.urlresolvers import (
+        NoReverseMatch,
+        Resolver404,
+        get_script_prefix,
+        resolve,
+        reverse,
+    )
+
+try:
+    from django.utils.deprecation import MiddlewareMixin
+except ImportError:  # Django < 1.10
+    MiddlewareMixin = object
+
+
+class TinylinkRedirectMiddleware(MiddlewareMixin):
+    """
+    Answers redirects before the URL resolver and the view stack are run.
+
+    Requests for ``TINYLINK_REDIRECT_PREFIX`` followed by a short URL are
+    redirected right away. If ``TINYLINK_REDIRECT_HOST`` is set, only requests
+    for this host are handled. Unknown short URLs are passed on, so that the
+    usual views can handle them.
+
+    If the views of this app are reachable under the prefix, or the prefix is
+    ``'/'`` without a dedicated host, the path is resolved against the
+    project's urlconf first and only handled if no other view than
+    ``tinylink_redirect`` matches it. Otherwise every page that looks like a
+    short URL, e.g. ``/s/create/``, would cost a database lookup, or be
+    taken over by a tinylink of the same name.
+
+    Put it at the top of your middlewares to skip as much work as possible.
+
+    """
+    # Path of the app's list view per urlconf.
+    app_roots = {}
+
+    def process_request(self, request):
+        prefix = getattr(settings, 'TINYLINK_REDIRECT_PREFIX', None)
+        if prefix is None or not request.path_info.startswith(prefix):
+            return None
+        host = getattr(settings, 'TINYLINK_REDIRECT_HOST', None)
+        if host and split_domain_port(request.get_host())[0] != host:
+            return None
+        short_url = request.path_info[len(prefix):]
+        if short_url.endswith('/'):
+            short_url = short_url[:-1]
+        if not is_valid_short_url(short_url):
+            return None
+        urlconf = getattr(request, 'urlconf', None)
+        if ((not host and prefix == '/' or
+                self.is_app_prefix(prefix, urlconf)) and
+                self.is_app_url(request)):
+            return None
+        link = follow_tinylink(short_url, request)
+        if link is None:
+            return None
+        return get_redirect_response(link)
+
+    def is_app_prefix(self, prefix, urlconf):
+        """Returns ``True`` if the views of this app live under the prefix."""
+        if urlconf not in self.app_roots:
+            try:
+                root = reverse('tinylink_list', urlconf=urlconf)
+            except NoReverseMatch:
+                root = None
+            else:
+                root = root[len(get_script_prefix()) - 1:]
+            self.app_roots[urlconf] = root
+        root = self.app_roots[urlconf]
+        return root is not None and (
+            root.startswith(prefix) or prefix.startswith(root))
+
+    def is_app_url(self, request):
+        """Returns ``True`` if another view than a redirect matches."""
+        try:
+            match = resolve(request.path_info,
+                            getattr(request, 'urlconf', None))
+        except Resolver404:
+            return False
+        return match.url_name != 'tinylink_redirect'
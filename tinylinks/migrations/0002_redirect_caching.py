@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 08:48
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tinylinks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tinylink',
+            name='cache_max_age',
+            field=models.PositiveIntegerField(blank=True, help_text='Seconds browsers and proxies may cache the redirect. Leave empty to use the default.', null=True, verbose_name='Cache max age'),
+        ),
+        migrations.AddField(
+            model_name='tinylink',
+            name='redirect_status',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(301, '301 Moved Permanently'), (302, '302 Found'), (307, '307 Temporary Redirect'), (308, '308 Permanent Redirect')], help_text='Leave empty to use the default status.', null=True, verbose_name='Redirect status'),
+        ),
+    ]
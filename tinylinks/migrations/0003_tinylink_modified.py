@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tinylinks', '0002_redirect_caching'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tinylink',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Last change'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 08:52
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tinylinks', '0003_tinylink_modified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClickEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(db_index=True, verbose_name='Timestamp')),
+                ('referer_host', models.CharField(blank=True, max_length=255, verbose_name='Referer host')),
+                ('user_agent_class', models.CharField(choices=[('browser', 'Browser'), ('mobile', 'Mobile'), ('bot', 'Bot'), ('other', 'Other')], default='other', max_length=16, verbose_name='User agent class')),
+                ('country', models.CharField(blank=True, max_length=2, verbose_name='Country')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='clickevent',
+            name='tinylink',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='click_events', to='tinylinks.Tinylink', verbose_name='Tinylink'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 08:54
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tinylinks', '0004_clickevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClickRollupWatermark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32, unique=True, verbose_name='Name')),
+                ('last_event_id', models.BigIntegerField(default=0, verbose_name='Last event ID')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TinylinkClickRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4, verbose_name='Period')),
+                ('start', models.DateTimeField(verbose_name='Start')),
+                ('clicks', models.PositiveIntegerField(default=0, verbose_name='Clicks')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='tinylinkclickrollup',
+            name='tinylink',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='click_rollups', to='tinylinks.Tinylink', verbose_name='Tinylink'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tinylinkclickrollup',
+            unique_together=set([('tinylink', 'period', 'start')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='tinylinkclickrollup',
+            index_together=set([('period', 'start')]),
+        ),
+    ]
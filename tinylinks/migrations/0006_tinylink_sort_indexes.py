@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 08:56
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tinylinks', '0005_click_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='tinylink',
+            index_together=set([('amount_of_views', 'id'), ('last_checked', 'id')]),
+        ),
+    ]
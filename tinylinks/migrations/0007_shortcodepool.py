@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 09:01
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tinylinks', '0006_tinylink_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShortCodePool',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('short_url', models.CharField(max_length=32, unique=True, verbose_name='Short URL')),
+            ],
+        ),
+    ]
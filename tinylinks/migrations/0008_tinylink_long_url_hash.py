@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 09:04
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.db import migrations, models, transaction
+from django.utils.six.moves.urllib.parse import urlsplit, urlunsplit
+
+
+# The hash functions are copied from ``tinylinks.models`` as they were when
+# this migration was written, so that later changes don't alter it.
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_long_url(long_url):
+    parts = urlsplit(long_url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc
+    if parts.hostname:
+        netloc = parts.hostname
+        if ':' in netloc:
+            netloc = '[{0}]'.format(netloc)
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        if port and port != DEFAULT_PORTS.get(scheme):
+            netloc = '{0}:{1}'.format(netloc, port)
+        userinfo = parts.netloc.rpartition('@')
+        if userinfo[1]:
+            netloc = '{0}@{1}'.format(userinfo[0], netloc)
+    return urlunsplit((scheme, netloc, parts.path or ('/' if netloc else ''),
+                       parts.query, parts.fragment))
+
+
+def get_long_url_hash(long_url):
+    return hashlib.sha256(normalize_long_url(long_url).encode(
+        'utf-8')).hexdigest()
+
+
+def backfill_long_url_hashes(apps, schema_editor):
+    """Sets the hashes in chunks that are committed one by one."""
+    Tinylink = apps.get_model('tinylinks', 'Tinylink')
+    alias = schema_editor.connection.alias
+    links = Tinylink.objects.using(alias).filter(
+        long_url_hash='').order_by('pk')
+    last = 0
+    while True:
+        chunk = list(links.filter(pk__gt=last).values_list(
+            'pk', 'long_url')[:1000])
+        if not chunk:
+            return
+        with transaction.atomic(using=alias):
+            for pk, long_url in chunk:
+                Tinylink.objects.using(alias).filter(pk=pk).update(
+                    long_url_hash=get_long_url_hash(long_url))
+        last = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+    # Commit the backfill in chunks instead of locking all tinylinks in one
+    # transaction. Django < 1.10 ignores this and wraps the whole migration
+    # in a transaction on databases with transactional DDL.
+    atomic = False
+
+    dependencies = [
+        ('tinylinks', '0007_shortcodepool'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tinylink',
+            name='long_url_hash',
+            field=models.CharField(default='', editable=False, max_length=64, verbose_name='Long URL hash'),
+        ),
+        migrations.AlterIndexTogether(
+            name='tinylink',
+            index_together=set([('amount_of_views', 'id'), ('last_checked', 'id'), ('long_url_hash', 'user')]),
+        ),
+        migrations.RunPython(
+            backfill_long_url_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 09:06
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tinylinks', '0008_tinylink_long_url_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TargetURL',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('long_url', models.CharField(max_length=2500, verbose_name='Long URL')),
+                ('url_hash', models.CharField(max_length=64, unique=True, verbose_name='Long URL hash')),
+                ('is_broken', models.BooleanField(default=False, verbose_name='Status')),
+                ('validation_error', models.CharField(default='', max_length=100, verbose_name='Validation Error')),
+                ('last_checked', models.DateTimeField(auto_now_add=True, verbose_name='Last validation')),
+                ('redirect_location', models.CharField(default='', max_length=2500, verbose_name='Redirect location')),
+                ('redirect_hops', models.PositiveSmallIntegerField(default=0, verbose_name='Redirect hops')),
+                ('next_check_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Next validation')),
+                ('check_failures', models.PositiveIntegerField(default=0, verbose_name='Failed validations')),
+                ('changed', models.DateTimeField(blank=True, null=True, verbose_name='Last change')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='tinylink',
+            name='target',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tinylinks', to='tinylinks.TargetURL', verbose_name='Target URL'),
+        ),
+    ]
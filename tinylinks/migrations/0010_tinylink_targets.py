@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.db import migrations, transaction
+from django.utils.six.moves.urllib.parse import urlsplit, urlunsplit
+
+
+# The hash functions are copied from ``tinylinks.models`` as they were when
+# this migration was written, so that later changes don't alter it.
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+CHECK_FIELDS = (
+    'is_broken', 'validation_error', 'last_checked', 'redirect_location')
+
+
+def normalize_long_url(long_url):
+    parts = urlsplit(long_url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc
+    if parts.hostname:
+        netloc = parts.hostname
+        if ':' in netloc:
+            netloc = '[{0}]'.format(netloc)
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        if port and port != DEFAULT_PORTS.get(scheme):
+            netloc = '{0}:{1}'.format(netloc, port)
+        userinfo = parts.netloc.rpartition('@')
+        if userinfo[1]:
+            netloc = '{0}@{1}'.format(userinfo[0], netloc)
+    return urlunsplit((scheme, netloc, parts.path or ('/' if netloc else ''),
+                       parts.query, parts.fragment))
+
+
+def get_long_url_hash(long_url):
+    return hashlib.sha256(normalize_long_url(long_url).encode(
+        'utf-8')).hexdigest()
+
+
+def create_targets(apps, schema_editor):
+    """
+    Points every tinylink to the target of its long URL.
+
+    New targets take over the validation state of the first tinylink of
+    their long URL. The tinylinks are updated in chunks that are committed
+    one by one.
+
+    """
+    Tinylink = apps.get_model('tinylinks', 'Tinylink')
+    TargetURL = apps.get_model('tinylinks', 'TargetURL')
+    alias = schema_editor.connection.alias
+    links = Tinylink.objects.using(alias).filter(
+        target__isnull=True).order_by('pk')
+    last = 0
+    while True:
+        chunk = list(links.filter(pk__gt=last).values_list(
+            'pk', 'long_url', *CHECK_FIELDS)[:1000])
+        if not chunk:
+            return
+        targets = {}
+        for row in chunk:
+            targets.setdefault(get_long_url_hash(row[1]), []).append(row)
+        with transaction.atomic(using=alias):
+            for url_hash, rows in targets.items():
+                state = dict(zip(CHECK_FIELDS, rows[0][2:]))
+                target, created = TargetURL.objects.using(
+                    alias).get_or_create(url_hash=url_hash, defaults={
+                        'long_url': normalize_long_url(rows[0][1])})
+                if created:
+                    # ``last_checked`` is set on creation, so the state is
+                    # copied with an update.
+                    TargetURL.objects.using(alias).filter(
+                        pk=target.pk).update(**state)
+                Tinylink.objects.using(alias).filter(
+                    pk__in=[row[0] for row in rows]).update(target=target)
+        last = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+    # Commit the tinylinks in chunks instead of locking all of them in one
+    # transaction. Django < 1.10 ignores this and wraps the whole migration
+    # in a transaction on databases with transactional DDL.
+    atomic = False
+
+    dependencies = [
+        ('tinylinks', '0009_targeturl'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_targets, migrations.RunPython.noop),
+    ]
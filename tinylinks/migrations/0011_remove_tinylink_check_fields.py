@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 09:40
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tinylinks', '0010_tinylink_targets'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='tinylink',
+            index_together=set([('amount_of_views', 'id'), ('long_url_hash', 'user')]),
+        ),
+        migrations.AlterField(
+            model_name='tinylink',
+            name='target',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='tinylinks', to='tinylinks.TargetURL', verbose_name='Target URL'),
+        ),
+        migrations.RemoveField(
+            model_name='tinylink',
+            name='is_broken',
+        ),
+        migrations.RemoveField(
+            model_name='tinylink',
+            name='last_checked',
+        ),
+        migrations.RemoveField(
+            model_name='tinylink',
+            name='redirect_location',
+        ),
+        migrations.RemoveField(
+            model_name='tinylink',
+            name='validation_error',
+        ),
+    ]
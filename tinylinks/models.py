@@ -1,11 +1,172 @@
 """Models for the ``django-tinylinks`` app."""
-from django.db import models
+import hashlib
+
+from django.db import connections, models, router, transaction
+from django.db.models import F
 from django.conf import settings
 from django.utils.encoding import python_2_unicode_compatible
+from django.utils.six.moves.urllib.parse import urlsplit, urlunsplit
 from django.utils.translation import ugettext_lazy as _
 from django.utils.timezone import now, timedelta
 
 
+REDIRECT_STATUS_CHOICES = (
+    (301, _('301 Moved Permanently')),
+    (302, _('302 Found')),
+    (307, _('307 Temporary Redirect')),
+    (308, _('308 Permanent Redirect')),
+)
+
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_long_url(long_url):
+    """
+    Returns a canonical form of a long URL.
+
+    The scheme and host are lowercased, default ports are removed and an
+    empty path becomes ``/``. Everything else is kept as it is.
+
+    """
+    parts = urlsplit(long_url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc
+    if parts.hostname:
+        netloc = parts.hostname
+        if ':' in netloc:
+            netloc = '[{0}]'.format(netloc)
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        if port and port != DEFAULT_PORTS.get(scheme):
+            netloc = '{0}:{1}'.format(netloc, port)
+        userinfo = parts.netloc.rpartition('@')
+        if userinfo[1]:
+            netloc = '{0}@{1}'.format(userinfo[0], netloc)
+    return urlunsplit((scheme, netloc, parts.path or ('/' if netloc else ''),
+                       parts.query, parts.fragment))
+
+
+def get_long_url_hash(long_url):
+    """Returns the hex SHA-256 of the normalized long URL."""
+    return hashlib.sha256(normalize_long_url(long_url).encode(
+        'utf-8')).hexdigest()
+
+
+class TinylinkManager(models.Manager):
+    """Custom manager for the ``Tinylink`` model."""
+    #: Fields that are needed to redirect to a tinylink.
+    redirect_fields = ('pk', 'long_url', 'redirect_status', 'cache_max_age')
+
+    def resolve(self, short_url, pk=None, modified_since=None):
+        """
+        Returns the ``redirect_fields`` of a tinylink without counting a view.
+
+        If ``pk`` is given, e.g. decoded from the short URL, the tinylink is
+        looked up by its primary key first. If ``modified_since`` is given,
+        only tinylinks that were modified since then are looked up.
+
+        Returns ``None`` if there is no tinylink with the given short URL.
+
+        """
+        links = self.all()
+        if modified_since is not None:
+            links = links.filter(modified__gte=modified_since)
+        if pk is not None:
+            link = links.filter(pk=pk, short_url=short_url).values_list(
+                *self.redirect_fields).first()
+            if link is not None:
+                return link
+        return links.filter(short_url=short_url).values_list(
+            *self.redirect_fields).first()
+
+    def count_view(self, short_url, pk=None):
+        """
+        Counts a view of a tinylink and returns its ``redirect_fields``.
+
+        The counter is incremented with a single narrow ``UPDATE``, so that
+        concurrent redirects neither lose increments nor rewrite the whole
+        row. On backends that support ``UPDATE ... RETURNING`` the fields are
+        fetched in the same statement, elsewhere a second query reads them.
+
+        If ``pk`` is given, e.g. decoded from the short URL, the tinylink is
+        looked up by its primary key first.
+
+        Returns ``None`` if there is no tinylink with the given short URL.
+
+        """
+        if pk is not None:
+            link = self._count_view(short_url, pk)
+            if link is not None:
+                return link
+        return self._count_view(short_url)
+
+    def _count_view(self, short_url, pk=None):
+        connection = connections[router.db_for_write(self.model)]
+        if connection.vendor == 'postgresql':
+            qn = connection.ops.quote_name
+            opts = self.model._meta
+            columns = [
+                opts.pk.column if name == 'pk' else
+                opts.get_field(name).column for name in self.redirect_fields]
+            where = '{0} = %s'.format(qn('short_url'))
+            params = [short_url]
+            if pk is not None:
+                where += ' AND {0} = %s'.format(qn(opts.pk.column))
+                params.append(pk)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'UPDATE {table} SET {views} = {views} + 1'
+                    ' WHERE {where} RETURNING {fields}'.format(
+                        table=qn(opts.db_table),
+                        views=qn('amount_of_views'),
+                        where=where,
+                        fields=', '.join(qn(column) for column in columns),
+                    ), params)
+                row = cursor.fetchone()
+            return tuple(row) if row else None
+        links = self.filter(short_url=short_url)
+        if pk is not None:
+            links = links.filter(pk=pk)
+        if not links.update(amount_of_views=F('amount_of_views') + 1):
+            return None
+        return links.values_list(*self.redirect_fields).first()
+
+    def get_brother(self, user, long_url):
+        """
+        Returns the newest tinylink of a user with the same normalized long
+        URL or ``None``.
+
+        """
+        return self.filter(
+            user=user, long_url_hash=get_long_url_hash(long_url)).first()
+
+    def backfill_long_url_hashes(self, chunk_size=1000):
+        """
+        Sets the ``long_url_hash`` of all tinylinks that don't have one yet.
+
+        The tinylinks are updated in chunks of ``chunk_size`` rows with one
+        transaction per chunk. Returns the number of updated tinylinks.
+
+        """
+        links = self.filter(long_url_hash='').order_by('pk')
+        last = 0
+        total = 0
+        while True:
+            chunk = list(links.filter(pk__gt=last).values_list(
+                'pk', 'long_url')[:chunk_size])
+            if not chunk:
+                return total
+            with transaction.atomic():
+                for pk, long_url in chunk:
+                    self.filter(pk=pk).update(
+                        long_url_hash=get_long_url_hash(long_url))
+            last = chunk[-1][0]
+            total += len(chunk)
+
+
 @python_2_unicode_compatible
 class Tinylink(models.Model):
     """
@@ -14,11 +175,13 @@ class Tinylink(models.Model):
     :user: The author of the tinylink.
     :long_url: Long URL version.
     :short_url: Shortened URL.
-    :is_broken: Set if the given long URL couldn't be validated.
-    :validation_error: Description of the occurred error.
-    :last_checked: Datetime of the last validation process.
     :amount_of_views: Field to count the redirect views.
-    :redirect_location: Redirect location if the long_url is redirected.
+    :redirect_status: HTTP status code of the redirect to the long URL.
+    :cache_max_age: Seconds browsers and proxies may cache the redirect.
+    :modified: Datetime of the last change.
+    :long_url_hash: SHA-256 of the normalized long URL.
+    :target: The ``TargetURL`` of the long URL, which holds its validation
+      state.
 
     """
     user = models.ForeignKey(
@@ -38,6 +201,141 @@ class Tinylink(models.Model):
         unique=True,
     )
 
+    amount_of_views = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('Amount of views'),
+    )
+
+    redirect_status = models.PositiveSmallIntegerField(
+        verbose_name=_('Redirect status'),
+        choices=REDIRECT_STATUS_CHOICES,
+        blank=True, null=True,
+        help_text=_('Leave empty to use the default status.'),
+    )
+
+    cache_max_age = models.PositiveIntegerField(
+        verbose_name=_('Cache max age'),
+        blank=True, null=True,
+        help_text=_('Seconds browsers and proxies may cache the redirect.'
+                    ' Leave empty to use the default.'),
+    )
+
+    modified = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name=_('Last change'),
+    )
+
+    long_url_hash = models.CharField(
+        max_length=64,
+        verbose_name=_('Long URL hash'),
+        editable=False,
+        default='',
+    )
+
+    target = models.ForeignKey(
+        'TargetURL',
+        verbose_name=_('Target URL'),
+        related_name='tinylinks',
+        editable=False,
+        on_delete=models.PROTECT,
+    )
+
+    objects = TinylinkManager()
+
+    def __str__(self):
+        return self.short_url
+
+    class Meta:
+        ordering = ['-pk']
+        index_together = [
+            ('amount_of_views', 'id'),
+            ('long_url_hash', 'user'),
+        ]
+
+    def save(self, *args, **kwargs):
+        long_url_hash = get_long_url_hash(self.long_url)
+        if self._state.adding or long_url_hash != self.long_url_hash:
+            self.target, created = TargetURL.objects.get_for_url(
+                self.long_url)
+            if created:
+                self.target.mark_changed()
+        self.long_url_hash = long_url_hash
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'long_url' in update_fields:
+            kwargs['update_fields'] = list(update_fields) + [
+                'long_url_hash', 'target']
+        super(Tinylink, self).save(*args, **kwargs)
+
+    def get_redirect_values(self):
+        """Returns the ``redirect_fields`` of the tinylink."""
+        return tuple(getattr(self, name)
+                     for name in Tinylink.objects.redirect_fields)
+
+    @staticmethod
+    def get_validation_cutoff():
+        """
+        Returns the datetime before which the last validation has to be, so
+        that a tinylink can be validated again.
+
+        """
+        return now() - timedelta(minutes=60)
+
+    def can_be_validated(self):
+        """
+        URL can only be validated if the last validation was at least 1
+        hour ago
+
+        """
+        if self.target.last_checked < self.get_validation_cutoff():
+            return True
+        return False
+
+
+class TargetURLManager(models.Manager):
+    """Custom manager for the ``TargetURL`` model."""
+    def get_for_url(self, long_url):
+        """
+        Returns the target of a long URL and whether it was created, like
+        ``get_or_create``.
+
+        """
+        return self.get_or_create(
+            url_hash=get_long_url_hash(long_url),
+            defaults={'long_url': normalize_long_url(long_url)})
+
+
+@python_2_unicode_compatible
+class TargetURL(models.Model):
+    """
+    A normalized long URL that any number of tinylinks point to.
+
+    The validation state is kept here once for all tinylinks of the long URL,
+    so that one check covers all of them.
+
+    :long_url: The normalized long URL.
+    :url_hash: SHA-256 of the normalized long URL.
+    :is_broken: Set if the long URL couldn't be validated.
+    :validation_error: Description of the occurred error.
+    :last_checked: Datetime of the last validation process.
+    :redirect_location: Redirect location if the long_url is redirected.
+    :redirect_hops: Number of redirects to the redirect location.
+    :next_check_at: Datetime of the next validation process.
+    :check_failures: Number of failed validations in a row.
+    :changed: Datetime when the first tinylink was pointed at the long URL.
+
+    """
+    long_url = models.CharField(
+        max_length=2500,
+        verbose_name=_('Long URL'),
+    )
+
+    url_hash = models.CharField(
+        max_length=64,
+        verbose_name=_('Long URL hash'),
+        unique=True,
+    )
+
     is_broken = models.BooleanField(
         default=False,
         verbose_name=_('Status'),
@@ -54,29 +352,196 @@ class Tinylink(models.Model):
         verbose_name=_('Last validation'),
     )
 
-    amount_of_views = models.PositiveIntegerField(
-        default=0,
-        verbose_name=_('Amount of views'),
-    )
-
     redirect_location = models.CharField(
         max_length=2500,
         verbose_name=_('Redirect location'),
         default='',
     )
 
-    def __str__(self):
-        return self.short_url
+    redirect_hops = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name=_('Redirect hops'),
+    )
 
-    class Meta:
-        ordering = ['-pk']
+    next_check_at = models.DateTimeField(
+        default=now,
+        db_index=True,
+        verbose_name=_('Next validation'),
+    )
 
-    def can_be_validated(self):
+    check_failures = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('Failed validations'),
+    )
+
+    changed = models.DateTimeField(
+        null=True, blank=True,
+        verbose_name=_('Last change'),
+    )
+
+    objects = TargetURLManager()
+
+    def __str__(self):
+        return self.long_url
+
+    def mark_changed(self):
         """
-        URL can only be validated if the last validation was at least 1
-        hour ago
+        Schedules the next check right away after a tinylink was pointed at
+        the new long URL.
 
         """
-        if self.last_checked < now() - timedelta(minutes=60):
-            return True
-        return False
+        self.changed = self.next_check_at = now()
+        self.check_failures = 0
+        TargetURL.objects.filter(pk=self.pk).update(
+            changed=self.changed, next_check_at=self.next_check_at,
+            check_failures=0)
+
+
+USER_AGENT_CLASS_CHOICES = (
+    ('browser', _('Browser')),
+    ('mobile', _('Mobile')),
+    ('bot', _('Bot')),
+    ('other', _('Other')),
+)
+
+
+@python_2_unicode_compatible
+class ClickEvent(models.Model):
+    """
+    A single redirect to a tinylink.
+
+    :tinylink: The tinylink that was followed.
+    :timestamp: Datetime of the redirect.
+    :created: Datetime the event was saved. Events are queued, so this can be
+      a while after the redirect.
+    :referer_host: Host name of the referring page.
+    :user_agent_class: Rough class of the user agent.
+    :country: Country code of the visitor. Not filled in by this app.
+
+    """
+    tinylink = models.ForeignKey(
+        Tinylink,
+        verbose_name=_('Tinylink'),
+        related_name='click_events',
+    )
+
+    timestamp = models.DateTimeField(
+        verbose_name=_('Timestamp'),
+        db_index=True,
+    )
+
+    created = models.DateTimeField(
+        verbose_name=_('Creation date'),
+        default=now,
+        editable=False,
+    )
+
+    referer_host = models.CharField(
+        max_length=255,
+        verbose_name=_('Referer host'),
+        blank=True,
+    )
+
+    user_agent_class = models.CharField(
+        max_length=16,
+        verbose_name=_('User agent class'),
+        choices=USER_AGENT_CLASS_CHOICES,
+        default='other',
+    )
+
+    country = models.CharField(
+        max_length=2,
+        verbose_name=_('Country'),
+        blank=True,
+    )
+
+    def __str__(self):
+        return '{0} {1}'.format(self.tinylink_id, self.timestamp)
+
+
+ROLLUP_PERIOD_CHOICES = (
+    ('hour', _('Hour')),
+    ('day', _('Day')),
+)
+
+
+@python_2_unicode_compatible
+class TinylinkClickRollup(models.Model):
+    """
+    Number of clicks on a tinylink within one hour or day.
+
+    :tinylink: The tinylink that was followed.
+    :period: Length of the bucket, ``hour`` or ``day``.
+    :start: Start of the bucket in UTC.
+    :clicks: Number of click events in the bucket.
+
+    """
+    tinylink = models.ForeignKey(
+        Tinylink,
+        verbose_name=_('Tinylink'),
+        related_name='click_rollups',
+    )
+
+    period = models.CharField(
+        max_length=4,
+        verbose_name=_('Period'),
+        choices=ROLLUP_PERIOD_CHOICES,
+    )
+
+    start = models.DateTimeField(
+        verbose_name=_('Start'),
+    )
+
+    clicks = models.PositiveIntegerField(
+        verbose_name=_('Clicks'),
+        default=0,
+    )
+
+    class Meta:
+        unique_together = ('tinylink', 'period', 'start')
+        index_together = [('period', 'start')]
+
+    def __str__(self):
+        return '{0} {1} {2}'.format(self.tinylink_id, self.period, self.start)
+
+
+@python_2_unicode_compatible
+class ClickRollupWatermark(models.Model):
+    """
+    Progress of the ``rollup_tinylink_clicks`` command.
+
+    :name: Name of the rollup.
+    :last_event_id: Primary key of the last ``ClickEvent`` that was rolled up.
+
+    """
+    name = models.CharField(
+        max_length=32,
+        verbose_name=_('Name'),
+        unique=True,
+    )
+
+    last_event_id = models.BigIntegerField(
+        verbose_name=_('Last event ID'),
+        default=0,
+    )
+
+    def __str__(self):
+        return '{0} {1}'.format(self.name, self.last_event_id)
+
+
+@python_2_unicode_compatible
+class ShortCodePool(models.Model):
+    """
+    An unused short URL that the ``'pool'`` generator can hand out.
+
+    :short_url: The short URL.
+
+    """
+    short_url = models.CharField(
+        max_length=32,
+        verbose_name=_('Short URL'),
+        unique=True,
+    )
+
+    def __str__(self):
+        return self.short_url
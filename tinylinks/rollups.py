@@ -0,0 +1,139 @@
+"""Click rollups for the ``tinylinks`` app."""
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils.timezone import now, timedelta, utc
+
+from .models import ClickEvent, ClickRollupWatermark, TinylinkClickRollup
+
+
+def get_bucket_start(timestamp, period):
+    """Truncates a timestamp to the start of its hour or day in UTC."""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(utc)
+    timestamp = timestamp.replace(minute=0, second=0, microsecond=0)
+    if period == 'day':
+        timestamp = timestamp.replace(hour=0)
+    return timestamp
+
+
+def apply_rollup_deltas(deltas):
+    """
+    Adds clicks to the rollups of the given buckets.
+
+    ``deltas`` is a dictionary of ``{(tinylink_id, period, start): clicks}``.
+    Existing rollups are incremented with an ``UPDATE``, missing ones are
+    created with one ``bulk_create``.
+
+    """
+    existing = set()
+    for period in set(key[1] for key in deltas):
+        keys = [key for key in deltas if key[1] == period]
+        existing.update(
+            (tinylink_id, period, start) for tinylink_id, start in
+            TinylinkClickRollup.objects.filter(
+                period=period,
+                tinylink_id__in=set(key[0] for key in keys),
+                start__in=set(key[2] for key in keys),
+            ).values_list('tinylink_id', 'start'))
+    new_rollups = []
+    for key in sorted(deltas):
+        tinylink_id, period, start = key
+        if key in existing:
+            TinylinkClickRollup.objects.filter(
+                tinylink_id=tinylink_id, period=period, start=start).update(
+                    clicks=F('clicks') + deltas[key])
+        else:
+            new_rollups.append(TinylinkClickRollup(
+                tinylink_id=tinylink_id, period=period, start=start,
+                clicks=deltas[key]))
+    TinylinkClickRollup.objects.bulk_create(new_rollups)
+
+
+def rollup_click_events(name='clicks'):
+    """
+    Adds all click events since the last run to the hourly and daily rollups.
+
+    The events are read in chunks of ``TINYLINK_CLICK_ROLLUP_CHUNK_SIZE`` in
+    the order of their primary key. Each chunk is rolled up in a transaction
+    that also moves the watermark, so an interrupted run continues where it
+    stopped and no event is counted twice. The watermark row is locked, so
+    concurrent runs wait for each other.
+
+    Primary keys are handed out when an event is inserted, not when it is
+    committed, so an event can become visible after events with a higher
+    primary key. A run therefore stops at the first event that was saved
+    less than ``TINYLINK_CLICK_ROLLUP_LAG`` seconds ago. Events of
+    transactions that take longer than this to commit are skipped.
+
+    Returns the number of events that were rolled up.
+
+    """
+    chunk_size = getattr(settings, 'TINYLINK_CLICK_ROLLUP_CHUNK_SIZE', 10000)
+    cutoff = now() - timedelta(
+        seconds=getattr(settings, 'TINYLINK_CLICK_ROLLUP_LAG', 60))
+    ClickRollupWatermark.objects.get_or_create(name=name)
+    total = 0
+    while True:
+        with transaction.atomic():
+            watermark = ClickRollupWatermark.objects.select_for_update().get(
+                name=name)
+            chunk = ClickEvent.objects.filter(
+                pk__gt=watermark.last_event_id).order_by('pk').values_list(
+                    'pk', 'tinylink_id', 'timestamp', 'created')[:chunk_size]
+            events = []
+            for event in chunk:
+                if event[3] >= cutoff:
+                    break
+                events.append(event)
+            if not events:
+                return total
+            deltas = Counter()
+            for pk, tinylink_id, timestamp, created in events:
+                for period in ('hour', 'day'):
+                    deltas[(tinylink_id, period,
+                            get_bucket_start(timestamp, period))] += 1
+            apply_rollup_deltas(deltas)
+            watermark.last_event_id = events[-1][0]
+            watermark.save(update_fields=['last_event_id'])
+        total += len(events)
+        if len(events) < chunk_size:
+            return total
+
+
+def prune_click_events(name='clicks'):
+    """
+    Deletes rolled up click events that are older than
+    ``TINYLINK_CLICK_EVENTS_RETENTION`` days.
+
+    Returns the number of deleted events.
+
+    """
+    retention = getattr(settings, 'TINYLINK_CLICK_EVENTS_RETENTION', 30)
+    if retention is None:
+        return 0
+    watermark = ClickRollupWatermark.objects.filter(name=name).first()
+    if watermark is None:
+        return 0
+    events = ClickEvent.objects.filter(
+        pk__lte=watermark.last_event_id,
+        timestamp__lt=now() - timedelta(days=retention))
+    count = events.count()
+    events.delete()
+    return count
+
+
+def get_daily_clicks(days, tinylink=None):
+    """
+    Returns ``(start, clicks)`` of the last days from the daily rollups.
+
+    """
+    rollups = TinylinkClickRollup.objects.filter(
+        period='day',
+        start__gte=get_bucket_start(now(), 'day') - timedelta(days=days - 1))
+    if tinylink is not None:
+        rollups = rollups.filter(tinylink=tinylink)
+    return list(rollups.values_list('start').annotate(
+        clicks=Sum('clicks')).order_by('start'))
@@ -0,0 +1,54 @@
+"""Scheduling of the URL checks of the ``tinylinks`` app."""
+from django.conf import settings
+from django.utils.timezone import timedelta
+
+
+def get_check_delay(is_broken, failures=0, views=0, recently_changed=False):
+    """
+    Returns the time until the next check of a URL.
+
+    Healthy URLs are checked once per ``TINYLINK_CHECK_PERIOD``. Popular URLs
+    are checked more often: the period is divided by one plus the number of
+    digits of their views after the first, e.g. by 3 for 100 to 999 views.
+    URLs that changed within the last period are checked twice as often, but
+    never more often than every ``TINYLINK_CHECK_INTERVAL``.
+
+    Broken URLs back off exponentially: after ``failures`` failed checks in a
+    row, the period is multiplied by ``2 ** (failures - 1)``, up to
+    ``TINYLINK_CHECK_MAX_DELAY``. They are never checked more often than
+    healthy URLs, even if the maximum delay is shorter than the period.
+
+    """
+    period = settings.TINYLINK_CHECK_PERIOD
+    if is_broken:
+        max_delay = getattr(settings, 'TINYLINK_CHECK_MAX_DELAY', 10080)
+        # Limits the exponent, the result is capped anyway.
+        return timedelta(minutes=min(
+            period * 2 ** min(max(failures - 1, 0), 32),
+            max(max_delay, period)))
+    delay = float(period) / len(str(max(views, 1)))
+    if recently_changed:
+        delay /= 2
+    return timedelta(minutes=max(delay, settings.TINYLINK_CHECK_INTERVAL))
+
+
+def schedule_check(link):
+    """
+    Sets ``check_failures`` and ``next_check_at`` of a checked link.
+
+    ``link`` is a ``TargetURL`` that was just checked. The views of its
+    tinylinks can be set as ``amount_of_views`` before. It counts as
+    recently changed if a tinylink was pointed at it within the last period.
+
+    """
+    if link.is_broken:
+        link.check_failures += 1
+    else:
+        link.check_failures = 0
+    recently_changed = link.changed is not None and (
+        link.last_checked - link.changed <
+        timedelta(minutes=settings.TINYLINK_CHECK_PERIOD))
+    link.next_check_at = link.last_checked + get_check_delay(
+        link.is_broken, link.check_failures,
+        getattr(link, 'amount_of_views', 0) or 0, recently_changed)
+    return link
@@ -0,0 +1,45 @@
+"""Signal handlers for the ``tinylinks`` app."""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import get_resolution_cache
+from .generators import get_code_generator, is_placeholder
+from .models import Tinylink
+
+
+@receiver(pre_save, sender=Tinylink)
+def remember_redirect_values(sender, instance, **kwargs):
+    """
+    Remembers the stored short URL and redirect values of a tinylink that is
+    about to change.
+
+    """
+    instance._old_redirect_values = None
+    if instance.pk and get_resolution_cache():
+        instance._old_redirect_values = Tinylink.objects.filter(
+            pk=instance.pk).values_list(
+                'short_url', *Tinylink.objects.redirect_fields).first()
+
+
+@receiver(post_save, sender=Tinylink)
+def assign_short_url(sender, instance, **kwargs):
+    """Replaces the placeholder of a new tinylink with its short URL."""
+    if is_placeholder(instance.short_url):
+        get_code_generator().assign(instance)
+
+
+@receiver(post_save, sender=Tinylink)
+def refresh_resolution_cache(sender, instance, **kwargs):
+    """Updates the cached long URL of a saved tinylink."""
+    resolution_cache = get_resolution_cache()
+    if resolution_cache:
+        resolution_cache.refresh(
+            instance, getattr(instance, '_old_redirect_values', None))
+
+
+@receiver(post_delete, sender=Tinylink)
+def invalidate_resolution_cache(sender, instance, **kwargs):
+    """Removes a deleted tinylink from the resolution cache."""
+    resolution_cache = get_resolution_cache()
+    if resolution_cache:
+        resolution_cache.invalidate(instance.short_url)
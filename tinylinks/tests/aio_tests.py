@@ -0,0 +1,89 @@
+"""Tests for the ``aio`` module of the ``django-tinylinks`` app."""
+import time
+from unittest import skipIf
+
+from django.core import management
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import six
+from django.utils.six import StringIO
+
+from mixer.backend.django import mixer
+
+from ..models import TargetURL, Tinylink
+from .stub_server import StubServer
+
+
+@skipIf(six.PY2, 'The asyncio backend needs Python 3.5 or newer.')
+class CheckLongUrlsAsyncTestCase(TestCase):
+    """Tests for the ``check_long_urls_async`` function."""
+    def setUp(self):
+        self.server = StubServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+
+    def get_link(self, path):
+        return mixer.blend('tinylinks.TargetURL', is_broken=True,
+                           long_url=self.server.get_url(path))
+
+    def test_function(self):
+        from ..aio import check_long_urls_async
+        links = dict((path, self.get_link(path)) for path in (
+            '/ok/', '/redirect/', '/missing/', '/bad-gateway/'))
+        slow = [self.get_link('/slow/') for i in range(4)]
+        start = time.time()
+        with self.assertNumQueries(0):
+            checked = check_long_urls_async(
+                list(links.values()) + slow, per_host=4)
+        self.assertLess(time.time() - start, 1.5, msg=(
+            'Should check the slow URLs at the same time.'))
+        self.assertEqual(len(checked), 8)
+        self.assertFalse(links['/ok/'].is_broken)
+        self.assertFalse(links['/redirect/'].is_broken)
+        self.assertEqual(links['/redirect/'].redirect_location,
+                         self.server.get_url('/ok/'))
+        self.assertEqual(links['/redirect/'].redirect_hops, 1)
+        self.assertTrue(links['/missing/'].is_broken)
+        self.assertEqual(links['/missing/'].validation_error,
+                         'URL not accessible.')
+        self.assertTrue(links['/bad-gateway/'].is_broken)
+        self.assertTrue(all(not link.is_broken for link in slow))
+
+    def test_limits(self):
+        from ..aio import check_long_urls_async
+        slow = [self.get_link('/slow/') for i in range(2)]
+        start = time.time()
+        check_long_urls_async(slow, per_host=1)
+        self.assertGreaterEqual(time.time() - start, 1, msg=(
+            'Should check one URL per host at a time.'))
+        check_long_urls_async(slow, timeout=0.1)
+        self.assertEqual(slow[0].validation_error, 'Timed out.')
+        loop = self.get_link('/loop/')
+        check_long_urls_async([loop])
+        self.assertEqual(loop.validation_error, 'Redirect loop.')
+
+    def test_deadline(self):
+        from ..aio import check_long_urls_async
+        link = self.get_link('/ok/')
+        self.assertEqual(check_long_urls_async(
+            [link], deadline=time.time() + 60), [link])
+        self.assertEqual(check_long_urls_async(
+            [link], deadline=time.time()), [])
+        link = self.get_link('/bad-gateway/')
+        with override_settings(TINYLINK_CHECK_RETRY_BACKOFF=60):
+            self.assertEqual(check_long_urls_async(
+                [link], timeout=1, deadline=time.time() + 30), [])
+        self.assertEqual(self.server.requests.count(('GET', '/bad-gateway/')),
+                         1, msg='Should not retry after the deadline.')
+        slow = [self.get_link('/slow/') for i in range(2)]
+        self.assertEqual(check_long_urls_async(
+            slow, per_host=1, timeout=1, deadline=time.time() + 1.3),
+            slow[:1], msg=(
+                'Should not start requests after waiting for the host.'))
+
+    def test_command(self):
+        link = mixer.blend('tinylinks.TinyLink',
+                           long_url=self.server.get_url('/ok/'))
+        TargetURL.objects.update(is_broken=True)
+        management.call_command('check_tinylink_targets', backend='asyncio',
+                                stdout=StringIO())
+        self.assertFalse(Tinylink.objects.get(pk=link.pk).target.is_broken)
@@ -0,0 +1,148 @@
+"""Tests for the resolution cache of the ``django-tinylinks`` app."""
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.timezone import now, timedelta
+
+from mixer.backend.django import mixer
+from mock import patch
+
+from ..cache import (
+    BloomFilter,
+    LRUCache,
+    ResolutionCache,
+    get_resolution_cache,
+)
+from ..models import Tinylink
+
+
+class BloomFilterTestCase(TestCase):
+    """Tests for the ``BloomFilter`` class."""
+    def test_filter(self):
+        bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+        for index in range(1000):
+            bloom_filter.add('code{0}'.format(index))
+        self.assertTrue(all('code{0}'.format(index) in bloom_filter
+                            for index in range(1000)),
+                        msg='Should not report false negatives.')
+        false_positives = sum(1 for index in range(1000)
+                              if 'other{0}'.format(index) in bloom_filter)
+        self.assertLess(false_positives, 30)
+
+
+class LRUCacheTestCase(TestCase):
+    """Tests for the ``LRUCache`` class."""
+    @patch('tinylinks.cache.time.time')
+    def test_cache(self, time_mock):
+        time_mock.return_value = 100
+        lru = LRUCache(size=2, ttl=10)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        self.assertEqual(lru.get('a'), 1)
+        lru.set('c', 3)
+        self.assertIsNone(lru.get('b'), msg=(
+            'Should evict the least recently used entry.'))
+        self.assertEqual(len(lru), 2)
+        time_mock.return_value = 111
+        self.assertIsNone(lru.get('a'), msg='Should expire old entries.')
+        lru.set('a', 1)
+        lru.delete('a')
+        self.assertIsNone(lru.get('a'))
+
+
+@override_settings(TINYLINK_RESOLUTION_CACHE=True)
+class ResolutionCacheTestCase(TestCase):
+    """Tests for the ``ResolutionCache`` class."""
+    def setUp(self):
+        self.link = mixer.blend(
+            'tinylinks.TinyLink', short_url='vB7f5b',
+            long_url='http://www.example.com/')
+        # Saving the link puts it into the cache.
+        cache.clear()
+        get_resolution_cache().local.clear()
+
+    def test_resolve(self):
+        resolution_cache = ResolutionCache()
+        with self.assertNumQueries(1):
+            self.assertEqual(resolution_cache.resolve('vB7f5b'),
+                             self.link.get_redirect_values())
+        with self.assertNumQueries(0):
+            resolution_cache.resolve('vB7f5b')
+        resolution_cache.local.clear()
+        with self.assertNumQueries(0):
+            resolution_cache.resolve('vB7f5b')
+        self.assertIsNone(resolution_cache.resolve('foobar'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(resolution_cache.resolve('foobar'), msg=(
+                'Should cache short URLs that do not exist.'))
+        stats = resolution_cache.get_stats()
+        self.assertEqual(stats['local_hits'], 1)
+        self.assertEqual(stats['shared_hits'], 1)
+        self.assertEqual(stats['negative_hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+
+    def test_versioned_keys(self):
+        cache.set('tinylinks:resolve:vB7f5b', (self.link.pk, 'http://a.b/'))
+        self.assertEqual(ResolutionCache().resolve('vB7f5b'),
+                         self.link.get_redirect_values(), msg=(
+                             'Should ignore values of older releases.'))
+
+    @override_settings(TINYLINK_BLOOM_FILTER=True)
+    def test_bloom_filter(self):
+        resolution_cache = get_resolution_cache()
+        resolution_cache.build_bloom_filter()
+        with self.assertNumQueries(1):
+            self.assertIsNone(resolution_cache.resolve('foobar'))
+        self.assertEqual(resolution_cache.get_stats()['rejected'], 1)
+        Tinylink.objects.filter(pk=self.link.pk).update(
+            short_url='foobaz', modified=now() - timedelta(days=1))
+        cache.clear()
+        self.assertIsNone(resolution_cache.resolve('foobaz'), msg=(
+            'Should only look up short URLs that are not in the filter among'
+            ' the recently modified tinylinks.'))
+        mixer.blend('tinylinks.TinyLink', short_url='foobar')
+        cache.clear()
+        self.assertIn('foobar', resolution_cache.bloom_filter, msg=(
+            'Should add new short URLs to the filter.'))
+
+    @override_settings(TINYLINK_BLOOM_FILTER=True)
+    def test_bloom_filter_of_other_process(self):
+        resolution_cache = get_resolution_cache()
+        other_process = ResolutionCache()
+        resolution_cache.build_bloom_filter()
+        other_process.build_bloom_filter()
+        mixer.blend('tinylinks.TinyLink', short_url='foobar')
+        cache.clear()
+        self.assertIsNotNone(other_process.resolve('foobar'), msg=(
+            'Should find short URLs that other processes created after the'
+            ' filter was built.'))
+
+    def test_invalidation(self):
+        resolution_cache = get_resolution_cache()
+        resolution_cache.resolve('vB7f5b')
+        self.link.long_url = 'http://www.example.com/foo/'
+        self.link.short_url = 'foobar'
+        self.link.save()
+        with self.assertNumQueries(1):
+            self.assertIsNone(resolution_cache.resolve('vB7f5b'), msg=(
+                'Should forget the old short URL.'))
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                resolution_cache.resolve('foobar')[1], self.link.long_url,
+                msg='Should refresh the cached long URL on save.')
+        other_process = ResolutionCache()
+        other_process.local.set('foobar', (self.link.pk, 'http://old/'))
+        generation = cache.get(resolution_cache.get_key('generation'))
+        self.link.amount_of_views += 1
+        self.link.save()
+        self.assertEqual(
+            cache.get(resolution_cache.get_key('generation')), generation,
+            msg='Should not clear the local tiers if nothing changed.')
+        self.link.delete()
+        self.assertIsNone(other_process.resolve('foobar'), msg=(
+            'Should clear the local tier of other processes.'))
+
+    def test_get_resolution_cache(self):
+        self.assertIsInstance(get_resolution_cache(), ResolutionCache)
+        with override_settings(TINYLINK_RESOLUTION_CACHE=False):
+            self.assertIsNone(get_resolution_cache())
@@ -1,13 +1,16 @@
 """Tests for the ``check_tinylink_targets`` admin command."""
 from django.core import management
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.test import TestCase, LiveServerTestCase
+from django.test.utils import override_settings
+from django.utils.timezone import now, timedelta
 
 from mixer.backend.django import mixer
 from mock import patch
-from requests import Response
 
-from ..models import Tinylink
+from ..models import TargetURL, Tinylink
+from ..utils import CHECK_LOCK_KEY
 
 
 class CommandTestCase(TestCase, LiveServerTestCase):
@@ -26,20 +29,84 @@ class CommandTestCase(TestCase, LiveServerTestCase):
             short_url="cf7GDS",
         )
 
-    @patch('requests.get')
+    @patch('tinylinks.utils.get_session')
     def test_command(self, mock):
-        resp = Response()
-        resp.status_code = 200
-        mock.return_value = resp
+        mock.return_value.head.return_value.status_code = 200
 
-        management.call_command('check_tinylink_targets')
+        management.call_command('check_tinylink_targets', workers=2)
         # Run twice, because just one link is checked per interval
         management.call_command('check_tinylink_targets')
         self.assertFalse(
-            Tinylink.objects.get(pk=self.tinylink1.id).is_broken,
+            Tinylink.objects.get(pk=self.tinylink1.id).target.is_broken,
             msg=('Should not be broken.'),
         )
         self.assertFalse(
-            Tinylink.objects.get(pk=self.tinylink2.id).is_broken,
+            Tinylink.objects.get(pk=self.tinylink2.id).target.is_broken,
             msg=('Should not be broken.'),
         )
+
+    @patch('tinylinks.utils.get_session')
+    def test_target_urls(self, mock):
+        mock.return_value.head.return_value.status_code = 200
+        mixer.blend('tinylinks.TinyLink', long_url='http://foobar.foobar/')
+        TargetURL.objects.filter(tinylinks__isnull=False).update(
+            is_broken=True)
+        management.call_command('check_tinylink_targets')
+        management.call_command('check_tinylink_targets')
+        self.assertFalse(Tinylink.objects.filter(
+            target__is_broken=True).exists())
+        self.assertEqual(mock.return_value.head.call_count, 2,
+                         msg='Should check each target URL once.')
+
+    @override_settings(TINYLINK_CHECK_PERIOD=10)
+    @patch('tinylinks.utils.get_session')
+    def test_duplicates(self, mock):
+        mock.return_value.head.return_value.status_code = 200
+        mixer.blend('tinylinks.TinyLink', long_url='HTTP://foobar.foobar:80')
+        TargetURL.objects.filter(tinylinks__isnull=False).update(
+            is_broken=True)
+        management.call_command('check_tinylink_targets')
+        self.assertFalse(Tinylink.objects.filter(
+            target__is_broken=True).exists())
+        self.assertEqual(mock.return_value.head.call_count, 2,
+                         msg='Should check each long URL once per run.')
+
+    @override_settings(TINYLINK_CHECK_PERIOD=10)
+    @patch('tinylinks.utils.get_session')
+    def test_budget(self, mock):
+        mock.return_value.head.return_value.status_code = 200
+        TargetURL.objects.filter(tinylinks__isnull=False).update(
+            is_broken=True)
+        cache.set(CHECK_LOCK_KEY, True)
+        management.call_command('check_tinylink_targets')
+        self.assertFalse(mock.return_value.head.called, msg=(
+            'Should not check URLs while another run holds the lock.'))
+        cache.delete(CHECK_LOCK_KEY)
+        management.call_command('check_tinylink_targets', budget=1)
+        self.assertFalse(mock.return_value.head.called, msg=(
+            'Should carry over checks that could exceed the budget.'))
+        management.call_command('check_tinylink_targets', budget=60)
+        self.assertFalse(Tinylink.objects.filter(
+            target__is_broken=True).exists())
+
+    @override_settings(TINYLINK_CHECK_PERIOD=10)
+    @patch('tinylinks.utils.get_session')
+    def test_schedule(self, mock):
+        mock.return_value.head.return_value.status_code = 404
+        TargetURL.objects.filter(tinylinks=self.tinylink2).update(
+            next_check_at=now() + timedelta(days=1))
+        management.call_command('check_tinylink_targets')
+        self.assertEqual(mock.return_value.head.call_count, 1, msg=(
+            'Should only check the links that are due.'))
+        link = Tinylink.objects.get(pk=self.tinylink1.pk).target
+        self.assertTrue(link.is_broken)
+        self.assertEqual(link.check_failures, 1)
+        self.assertGreater(link.next_check_at, now())
+
+    @override_settings(TINYLINK_CHECK_BATCH_SIZE=1)
+    @patch('tinylinks.utils.get_session')
+    def test_batch_size(self, mock):
+        mock.return_value.head.return_value.status_code = 200
+        management.call_command('check_tinylink_targets')
+        self.assertEqual(mock.return_value.head.call_count, 1, msg=(
+            'Should not check more URLs per run than the batch size.'))
@@ -0,0 +1,108 @@
+"""Tests for the click events of the ``django-tinylinks`` app."""
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import override_settings
+
+from mixer.backend.django import mixer
+from mock import patch
+
+from ..clicks import (
+    BackgroundClickQueue,
+    CacheClickQueue,
+    create_click_events,
+    get_click_event,
+    get_click_queue,
+    get_user_agent_class,
+)
+from ..models import ClickEvent
+from ..utils import follow_tinylink
+
+
+class GetUserAgentClassTestCase(TestCase):
+    """Tests for the ``get_user_agent_class`` function."""
+    def test_function(self):
+        self.assertEqual(get_user_agent_class(
+            'Mozilla/5.0 (compatible; Googlebot/2.1)'), 'bot')
+        self.assertEqual(get_user_agent_class(
+            'Mozilla/5.0 (iPhone; CPU iPhone OS 9_1 like Mac OS X)'),
+            'mobile')
+        self.assertEqual(get_user_agent_class(
+            'Mozilla/5.0 (X11; Linux x86_64; rv:45.0) Firefox/45.0'),
+            'browser')
+        self.assertEqual(get_user_agent_class(''), 'other')
+
+
+class GetClickEventTestCase(TestCase):
+    """Tests for the ``get_click_event`` function."""
+    def test_function(self):
+        request = RequestFactory().get(
+            '/', HTTP_REFERER='https://Example.com/page?q=1',
+            HTTP_USER_AGENT='Googlebot')
+        event = get_click_event(1, request)
+        self.assertEqual(event[0], 1)
+        self.assertEqual(event[2:], ('example.com', 'bot', ''))
+        event = get_click_event(1, RequestFactory().get('/'))
+        self.assertEqual(event[2:], ('', 'other', ''))
+
+
+class CreateClickEventsTestCase(TestCase):
+    """Tests for the ``create_click_events`` function."""
+    def test_function(self):
+        link = mixer.blend('tinylinks.TinyLink')
+        request = RequestFactory().get('/')
+        events = [get_click_event(link.pk, request),
+                  get_click_event(link.pk, request),
+                  get_click_event(link.pk + 1, request)]
+        with override_settings(TINYLINK_CLICK_EVENTS_BATCH_SIZE=1):
+            self.assertEqual(create_click_events(events), 2, msg=(
+                'Should drop the events of deleted tinylinks.'))
+        self.assertEqual(link.click_events.count(), 2)
+
+
+class BackgroundClickQueueTestCase(TransactionTestCase):
+    """Tests for the ``BackgroundClickQueue`` class."""
+    def test_queue(self):
+        link = mixer.blend('tinylinks.TinyLink')
+        click_queue = BackgroundClickQueue()
+        for index in range(20):
+            click_queue.add(get_click_event(link.pk, RequestFactory().get(
+                '/')))
+        click_queue.flush()
+        self.assertEqual(ClickEvent.objects.count(), 20, msg=(
+            'Should save all events in the background.'))
+
+
+class CacheClickQueueTestCase(TestCase):
+    """Tests for the ``CacheClickQueue`` class."""
+    def setUp(self):
+        cache.clear()
+
+    @patch('tinylinks.buffers.time.time')
+    def test_queue(self, time_mock):
+        link = mixer.blend('tinylinks.TinyLink')
+        click_queue = CacheClickQueue()
+        time_mock.return_value = 6000
+        click_queue.add(get_click_event(link.pk, RequestFactory().get('/')))
+        click_queue.add(get_click_event(link.pk, RequestFactory().get('/')))
+        self.assertEqual(click_queue.flush(), 0, msg=(
+            'Should not flush the buckets that are still written to.'))
+        time_mock.return_value = 6120
+        self.assertEqual(click_queue.flush(), 2)
+        self.assertEqual(ClickEvent.objects.count(), 2)
+        self.assertEqual(click_queue.flush(), 0, msg=(
+            'Should not save the same events twice.'))
+
+
+class RecordClickTestCase(TransactionTestCase):
+    """Tests for recording click events in ``follow_tinylink``."""
+    def test_record_click(self):
+        link = mixer.blend('tinylinks.TinyLink')
+        request = RequestFactory().get('/')
+        follow_tinylink(link.short_url, request)
+        self.assertEqual(ClickEvent.objects.count(), 0, msg=(
+            'Should not record click events by default.'))
+        with override_settings(TINYLINK_CLICK_EVENTS='background'):
+            follow_tinylink(link.short_url, request)
+            follow_tinylink('missing', request)
+            get_click_queue().flush()
+        self.assertEqual(ClickEvent.objects.count(), 1)
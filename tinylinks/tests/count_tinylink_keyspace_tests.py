@@ -0,0 +1,23 @@
+"""Tests for the ``count_tinylink_keyspace`` admin command."""
+from django.core import management
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from mixer.backend.django import mixer
+
+from ..generators import get_keyspace_usage
+
+
+class CommandTestCase(TestCase):
+    """Test class for the ``count_tinylink_keyspace`` admin command."""
+    def setUp(self):
+        cache.clear()
+
+    def test_command(self):
+        for short_url in ('ab', 'cd', 'efg'):
+            mixer.blend('tinylinks.TinyLink', short_url=short_url)
+        out = StringIO()
+        management.call_command('count_tinylink_keyspace', stdout=out)
+        self.assertIn('Counted 3 short URLs', out.getvalue())
+        self.assertEqual(get_keyspace_usage(), {2: 2, 3: 1})
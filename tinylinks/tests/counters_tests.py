@@ -0,0 +1,148 @@
+"""Tests for the view counters of the ``django-tinylinks`` app."""
+from django.core.cache import cache
+from django.db.models import F, When
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+
+from mixer.backend.django import mixer
+from mock import patch
+
+from ..counters import (
+    BackgroundViewBuffer,
+    CacheViewBuffer,
+    MemoryViewBuffer,
+    apply_view_deltas,
+    get_view_buffer,
+)
+from ..models import Tinylink
+
+
+class ApplyViewDeltasTestCase(TestCase):
+    """Tests for the ``apply_view_deltas`` function."""
+    def test_function(self):
+        links = mixer.cycle(3).blend('tinylinks.TinyLink', amount_of_views=1)
+        with override_settings(TINYLINK_VIEW_FLUSH_BATCH_SIZE=2):
+            total = apply_view_deltas({links[0].pk: 2, links[1].pk: 5})
+        self.assertEqual(total, 7)
+        self.assertEqual(
+            list(Tinylink.objects.order_by('pk').values_list(
+                'amount_of_views', flat=True)),
+            [3, 6, 1],
+            msg='Should only add the deltas of the given links.')
+
+
+class MemoryViewBufferTestCase(TransactionTestCase):
+    """Tests for the ``MemoryViewBuffer`` class."""
+    def test_buffer(self):
+        link = mixer.blend('tinylinks.TinyLink')
+        view_buffer = MemoryViewBuffer()
+        with override_settings(TINYLINK_VIEW_FLUSH_THRESHOLD=3):
+            view_buffer.add(link.pk)
+            view_buffer.add(link.pk)
+            self.assertIsNone(view_buffer.thread, msg=(
+                'Should not write views below the threshold.'))
+            view_buffer.add(link.pk)
+        view_buffer.thread.join()
+        self.assertEqual(
+            Tinylink.objects.get(pk=link.pk).amount_of_views, 3,
+            msg='Should flush the views once the threshold is reached.')
+
+    def test_failure(self):
+        links = mixer.cycle(2).blend('tinylinks.TinyLink')
+        view_buffer = MemoryViewBuffer()
+        view_buffer.deltas.update([links[0].pk, links[1].pk])
+        when = When(pk=links[0].pk, then=F('amount_of_views') + 1)
+        with override_settings(TINYLINK_VIEW_FLUSH_BATCH_SIZE=1), \
+                patch('tinylinks.counters.When',
+                      side_effect=[when, ValueError]):
+            self.assertRaises(ValueError, view_buffer.flush)
+        self.assertFalse(Tinylink.objects.filter(
+            amount_of_views__gt=0).exists(), msg=(
+                'Should not write any batch if one of them fails.'))
+        view_buffer.flush()
+        self.assertEqual(
+            list(Tinylink.objects.values_list('amount_of_views', flat=True)),
+            [1, 1], msg='Should count the views once on the next flush.')
+
+
+class BackgroundViewBufferTestCase(TransactionTestCase):
+    """Tests for the ``BackgroundViewBuffer`` class."""
+    def test_buffer(self):
+        link = mixer.blend('tinylinks.TinyLink')
+        view_buffer = BackgroundViewBuffer()
+        self.assertEqual(view_buffer.flush(), 0)
+        for index in range(50):
+            view_buffer.add(link.pk)
+        view_buffer.flush()
+        self.assertEqual(
+            Tinylink.objects.get(pk=link.pk).amount_of_views, 50,
+            msg='Should write all views in the background.')
+
+    @override_settings(TINYLINK_VIEW_QUEUE_SIZE=1)
+    def test_full_queue(self):
+        link = mixer.blend('tinylinks.TinyLink')
+        view_buffer = BackgroundViewBuffer()
+        view_buffer.queue.put(link.pk)
+        with patch('tinylinks.buffers.logger') as logger:
+            view_buffer.add(link.pk)
+        self.assertIsNone(view_buffer.thread)
+        self.assertEqual(view_buffer.dropped, 1)
+        self.assertTrue(logger.warning.called)
+        self.assertEqual(
+            Tinylink.objects.get(pk=link.pk).amount_of_views, 0,
+            msg='Should drop the view if the queue is full.')
+
+
+class CacheViewBufferTestCase(TestCase):
+    """Tests for the ``CacheViewBuffer`` class."""
+    def setUp(self):
+        cache.clear()
+
+    @patch('tinylinks.counters.time.time')
+    def test_buffer(self, time_mock):
+        links = mixer.cycle(2).blend('tinylinks.TinyLink')
+        view_buffer = CacheViewBuffer()
+        time_mock.return_value = 6000
+        view_buffer.add(links[0].pk)
+        view_buffer.add(links[0].pk)
+        view_buffer.add(links[1].pk)
+        self.assertEqual(view_buffer.flush(), 0, msg=(
+            'Should not flush the buckets that are still written to.'))
+        time_mock.return_value = 6120
+        view_buffer.add(links[1].pk)
+        self.assertEqual(view_buffer.flush(), 3)
+        self.assertEqual(
+            Tinylink.objects.get(pk=links[0].pk).amount_of_views, 2)
+        self.assertEqual(
+            Tinylink.objects.get(pk=links[1].pk).amount_of_views, 1)
+        time_mock.return_value = 6240
+        self.assertEqual(view_buffer.flush(), 1, msg=(
+            'Should only flush the buckets that were not flushed yet.'))
+
+    def test_expired_index(self):
+        link = mixer.blend('tinylinks.TinyLink')
+        view_buffer = CacheViewBuffer()
+        incr = cache.incr
+        calls = []
+
+        def expire_once(key, *args):
+            calls.append(key)
+            if len(calls) == 1:
+                # The index expires between ``add`` and ``incr``.
+                cache.delete(key)
+            return incr(key, *args)
+
+        with patch.object(cache, 'incr', side_effect=expire_once):
+            view_buffer.append(view_buffer.get_bucket(), link.pk)
+        self.assertEqual(len(calls), 2, msg=(
+            'Should create the index again if it expired.'))
+        self.assertEqual(
+            len(view_buffer.get_index_keys(view_buffer.get_bucket())), 1)
+
+
+class GetViewBufferTestCase(TestCase):
+    """Tests for the ``get_view_buffer`` function."""
+    def test_function(self):
+        self.assertIsNone(get_view_buffer())
+        with override_settings(TINYLINK_VIEW_BUFFER='cache'):
+            self.assertIsInstance(get_view_buffer(), CacheViewBuffer)
@@ -0,0 +1,42 @@
+"""Tests for the ``export_tinylink_statistics`` admin command."""
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.core import management
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from mixer.backend.django import mixer
+
+
+class CommandTestCase(TestCase):
+    """Test class for the ``export_tinylink_statistics`` admin command."""
+    def setUp(self):
+        self.link = mixer.blend('tinylinks.TinyLink', short_url='foo')
+        self.broken_link = mixer.blend('tinylinks.TinyLink', short_url='bar')
+        self.broken_link.target.is_broken = True
+        self.broken_link.target.save()
+
+    def test_command(self):
+        out = StringIO()
+        management.call_command('export_tinylink_statistics', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+        directory = tempfile.mkdtemp()
+        output = os.path.join(directory, 'statistics.ndjson')
+        try:
+            management.call_command(
+                'export_tinylink_statistics', format='ndjson', output=output,
+                broken='false')
+            with io.open(output, encoding='utf-8') as fileobj:
+                lines = fileobj.read().splitlines()
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['short_url'], 'foo')
+        self.assertRaises(
+            CommandError, management.call_command,
+            'export_tinylink_statistics', checked_after='foo')
@@ -0,0 +1,51 @@
+"""Tests for the ``export_tinylinks`` admin command."""
+import json
+import os
+import shutil
+import tempfile
+
+from django.core import management
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from mixer.backend.django import mixer
+
+
+class CommandTestCase(TestCase):
+    """Test class for the ``export_tinylinks`` admin command."""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output = os.path.join(self.directory, 'tinylinks.json')
+        self.link = mixer.blend('tinylinks.TinyLink', short_url='foo',
+                                long_url='http://www.example.com/foo/')
+        self.other_link = mixer.blend('tinylinks.TinyLink', short_url='bar',
+                                      long_url='http://www.example.com/bar/')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        with open(self.output) as fileobj:
+            return json.load(fileobj)
+
+    def test_command(self):
+        out = StringIO()
+        management.call_command('export_tinylinks', self.output, stdout=out)
+        self.assertEqual(self.read(), {
+            'foo': 'http://www.example.com/foo/',
+            'bar': 'http://www.example.com/bar/',
+        })
+        self.assertTrue(os.path.exists('{0}.state'.format(self.output)))
+        self.link.long_url = 'http://www.example.com/changed/'
+        self.link.save()
+        self.other_link.delete()
+        management.call_command('export_tinylinks', self.output,
+                                incremental=True, stdout=out)
+        self.assertIn('1 changed and 1 removed', out.getvalue())
+        self.assertEqual(self.read(),
+                         {'foo': 'http://www.example.com/changed/'})
+        management.call_command('export_tinylinks', self.output,
+                                format='nginx', stdout=out)
+        with open(self.output) as fileobj:
+            self.assertEqual(fileobj.read(),
+                             'foo "http://www.example.com/changed/";\n')
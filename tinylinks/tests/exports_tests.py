@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Tests for the exports of the ``django-tinylinks`` app."""
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.timezone import now, timedelta
+
+from mixer.backend.django import mixer
+
+from ..exports import (
+    BinaryIndexFormat,
+    CSVStatisticsFormat,
+    JSONFormat,
+    NDJSONStatisticsFormat,
+    NginxMapFormat,
+    filter_statistics,
+    iter_short_links,
+    iter_statistics,
+    remove_deleted_short_links,
+)
+from ..models import TargetURL, Tinylink
+
+
+SHORT_LINKS = [
+    ('b', u'http://www.example.com/ü"quote"\\'),
+    ('A', 'http://www.example.com/'),
+    ('c1', 'http://www.example.com/?a=1&b=2'),
+]
+
+
+class IterShortLinksTestCase(TestCase):
+    """Tests for the ``iter_short_links`` function."""
+    def test_function(self):
+        for short_url, long_url in SHORT_LINKS:
+            mixer.blend('tinylinks.TinyLink', short_url=short_url,
+                        long_url=long_url)
+        with override_settings(TINYLINK_EXPORT_CHUNK_SIZE=2):
+            self.assertEqual(dict(iter_short_links()), dict(SHORT_LINKS))
+        Tinylink.objects.filter(short_url='A').update(
+            modified=now() - timedelta(days=1))
+        self.assertEqual(
+            sorted(dict(iter_short_links(since=now() - timedelta(hours=1)))),
+            ['b', 'c1'], msg='Should only return changed tinylinks.')
+
+    def test_remove_deleted_short_links(self):
+        mixer.blend('tinylinks.TinyLink', short_url='A')
+        short_links = dict(SHORT_LINKS)
+        self.assertEqual(remove_deleted_short_links(short_links), 2)
+        self.assertEqual(list(short_links), ['A'])
+
+
+class ExportFormatsTestCase(TestCase):
+    """Tests for the export formats."""
+    def test_round_trip(self):
+        for export_format in (BinaryIndexFormat(), JSONFormat(),
+                              NginxMapFormat()):
+            fileobj = io.BytesIO()
+            self.assertEqual(export_format.write(fileobj, SHORT_LINKS), 3)
+            fileobj.seek(0)
+            self.assertEqual(export_format.read(fileobj), dict(SHORT_LINKS),
+                             msg='Should read {0} exports.'.format(
+                                 export_format.__class__.__name__))
+
+    def test_nginx_skips_variables(self):
+        fileobj = io.BytesIO()
+        NginxMapFormat().write(fileobj, [('a', 'http://example.com/$uri')])
+        self.assertEqual(fileobj.getvalue(), b'')
+
+    def test_binary_lookup(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'tinylinks.idx')
+        short_links = [('code{0}'.format(index), 'http://{0}/'.format(index))
+                       for index in range(50)]
+        try:
+            with open(path, 'wb') as fileobj:
+                with override_settings(TINYLINK_EXPORT_CHUNK_SIZE=7):
+                    BinaryIndexFormat().write(fileobj, reversed(short_links))
+            for short_url, long_url in short_links:
+                self.assertEqual(
+                    BinaryIndexFormat().lookup(path, short_url), long_url)
+            self.assertIsNone(BinaryIndexFormat().lookup(path, 'code'))
+            self.assertIsNone(BinaryIndexFormat().lookup(path, 'zzz'))
+        finally:
+            shutil.rmtree(directory)
+
+
+class StatisticsTestCase(TestCase):
+    """Tests for the statistics exports."""
+    def setUp(self):
+        self.user = mixer.blend('auth.User', username='alice')
+        self.link = mixer.blend(
+            'tinylinks.TinyLink', user=self.user, short_url='a',
+            long_url=u'http://www.example.com/ü,"x"', amount_of_views=3)
+        self.broken_link = mixer.blend('tinylinks.TinyLink', short_url='b')
+        self.broken_link.target.is_broken = True
+        self.broken_link.target.save()
+
+    def test_filter_statistics(self):
+        self.assertEqual(list(filter_statistics(user=self.user.pk)),
+                         [self.link])
+        self.assertEqual(list(filter_statistics(is_broken=True)),
+                         [self.broken_link])
+        TargetURL.objects.filter(tinylinks=self.link).update(
+            last_checked=now() - timedelta(days=2))
+        self.assertEqual(list(filter_statistics(
+            checked_after=now() - timedelta(days=1))), [self.broken_link])
+        self.assertEqual(list(filter_statistics(
+            checked_before=now() - timedelta(days=1))), [self.link])
+
+    def test_iter_statistics(self):
+        with override_settings(TINYLINK_EXPORT_CHUNK_SIZE=1):
+            rows = list(iter_statistics(Tinylink.objects.all()))
+        self.assertEqual([row[:4] for row in rows], [
+            (self.link.pk, 'a', self.link.long_url, 'alice'),
+            (self.broken_link.pk, 'b', self.broken_link.long_url,
+             self.broken_link.user.username),
+        ])
+
+    def test_formats(self):
+        rows = list(iter_statistics(filter_statistics(user=self.user.pk)))
+        lines = list(CSVStatisticsFormat().iter_lines(rows))
+        self.assertEqual(lines[0], (
+            'id,short_url,long_url,user,is_broken,validation_error,'
+            'last_checked,amount_of_views\r\n'))
+        self.assertIn(u',a,"http://www.example.com/ü,""x""",alice,False,,',
+                      lines[1])
+        lines = list(NDJSONStatisticsFormat().iter_lines(rows))
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['amount_of_views'], 3)
@@ -0,0 +1,17 @@
+"""Tests for the ``fill_tinylink_code_pool`` admin command."""
+from django.core import management
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.six import StringIO
+
+from ..models import ShortCodePool
+
+
+class CommandTestCase(TestCase):
+    """Test class for the ``fill_tinylink_code_pool`` admin command."""
+    @override_settings(TINYLINK_CODE_POOL_SIZE=20)
+    def test_command(self):
+        out = StringIO()
+        management.call_command('fill_tinylink_code_pool', stdout=out)
+        self.assertIn('Added 20 short URLs', out.getvalue())
+        self.assertEqual(ShortCodePool.objects.count(), 20)
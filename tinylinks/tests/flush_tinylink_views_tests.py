@@ -0,0 +1,31 @@
+"""Tests for the ``flush_tinylink_views`` admin command."""
+from django.core import management
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.six import StringIO
+
+from mixer.backend.django import mixer
+from mock import patch
+
+from ..counters import get_view_buffer
+from ..models import Tinylink
+
+
+class CommandTestCase(TestCase):
+    """Test class for the ``flush_tinylink_views`` admin command."""
+    def setUp(self):
+        cache.clear()
+
+    @patch('tinylinks.counters.time.time')
+    def test_command(self, time_mock):
+        link = mixer.blend('tinylinks.TinyLink')
+        out = StringIO()
+        management.call_command('flush_tinylink_views', stdout=out)
+        self.assertIn('not buffered', out.getvalue())
+        with override_settings(TINYLINK_VIEW_BUFFER='cache'):
+            time_mock.return_value = 6000
+            get_view_buffer().add(link.pk)
+            time_mock.return_value = 6120
+            management.call_command('flush_tinylink_views', stdout=out)
+        self.assertEqual(Tinylink.objects.get(pk=link.pk).amount_of_views, 1)
@@ -30,6 +30,12 @@ class TinylinkFormTestCase(TestCase):
         self.assertFalse(form.is_valid(), msg=(
             'If the short url is already used, the form should be invalid.'))
 
+        data.update({'short_url': 'create'})
+        form = TinylinkForm(data=data, user=user)
+        self.assertFalse(form.is_valid(), msg=(
+            'If the short url is the address of a page, the form should be'
+            ' invalid.'))
+
         # Testing an input with a new short URL. Now, there are two tinylinks
         # with the same long_url.
         data.update({'short_url': 'FooBar01'})
@@ -105,6 +111,12 @@ class TinylinkAdminFormTestCase(TestCase):
         self.assertFalse(form.is_valid(), msg=(
             'If the short url is already used, the form should be invalid.'))
 
+        data.update({'short_url': 'statistics'})
+        form = TinylinkAdminForm(data=data, instance=tinylink)
+        self.assertFalse(form.is_valid(), msg=(
+            'If the short url is the address of a page, the form should be'
+            ' invalid.'))
+
         # Testing a fake 'Twin' submit, if the old inputs matches the new ones
         # and the object is equal the instance.
         data.update({'short_url': tinylink.short_url})
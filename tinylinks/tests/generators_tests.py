@@ -0,0 +1,207 @@
+"""Tests for the short URL generators of the ``django-tinylinks`` app."""
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from mixer.backend.django import mixer
+from mock import MagicMock, patch
+
+from ..forms import TinylinkForm
+from ..generators import (
+    ALPHABET,
+    PoolCodeGenerator,
+    RandomCodeGenerator,
+    SequenceCodeGenerator,
+    code_generated,
+    get_code_generator,
+    get_code_length,
+    get_expected_retries,
+    get_generation_stats,
+    get_inverse,
+    get_keyspace_usage,
+    get_occupancy,
+    has_room,
+    is_placeholder,
+)
+from ..models import ShortCodePool, Tinylink
+from ..utils import follow_tinylink
+
+
+class GetInverseTestCase(TestCase):
+    """Tests for the ``get_inverse`` function."""
+    def test_function(self):
+        for number in (1, 2, 5, 1234):
+            self.assertEqual(number * get_inverse(number, 33 ** 3) % 33 ** 3,
+                             1)
+
+
+class KeyspaceTestCase(TestCase):
+    """Tests for the keyspace functions."""
+    def setUp(self):
+        cache.clear()
+        for short_url in ('ab', 'cd', 'efg'):
+            mixer.blend('tinylinks.TinyLink', short_url=short_url)
+        ShortCodePool.objects.create(short_url='hi')
+
+    def test_usage(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(get_keyspace_usage(), {}, msg=(
+                'Should only count the usage if asked to.'))
+        self.assertEqual(get_keyspace_usage(refresh=True), {2: 3, 3: 1})
+        mixer.blend('tinylinks.TinyLink', short_url='jk')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_keyspace_usage()[2], 3, msg=(
+                'Should cache the usage.'))
+        self.assertEqual(get_keyspace_usage(refresh=True)[2], 4)
+        self.assertEqual(get_occupancy(2), 4.0 / 33 ** 2)
+        self.assertEqual(get_expected_retries(0.5), 1)
+        self.assertEqual(get_expected_retries(1), float('inf'))
+
+    @override_settings(TINYLINK_LENGTH=1, TINYLINK_MAX_EXPECTED_RETRIES=0.5)
+    def test_has_room(self):
+        get_keyspace_usage(refresh=True)
+        self.assertTrue(has_room(11))
+        self.assertFalse(has_room(12))
+        self.assertFalse(has_room(361, length=2))
+        self.assertEqual(get_code_length(), 1)
+        self.assertEqual(get_code_length(12), 2)
+        self.assertEqual(get_code_length(400), 3)
+
+
+class RandomCodeGeneratorTestCase(TestCase):
+    """Tests for the ``RandomCodeGenerator`` class."""
+    def setUp(self):
+        cache.clear()
+
+    def test_generate(self):
+        handler = MagicMock()
+        code_generated.connect(handler)
+        try:
+            with override_settings(TINYLINK_LENGTH=4):
+                short_url = RandomCodeGenerator().generate()
+        finally:
+            code_generated.disconnect(handler)
+        self.assertEqual(len(short_url), 4)
+        self.assertTrue(all(char in ALPHABET for char in short_url))
+        self.assertIsNone(RandomCodeGenerator().decode(short_url))
+        self.assertEqual(handler.call_args[1]['length'], 4)
+        self.assertEqual(get_generation_stats(), (1, 0))
+
+    @override_settings(TINYLINK_LENGTH=2, TINYLINK_MAX_RETRIES=3)
+    @patch.object(RandomCodeGenerator, 'get_random_code')
+    def test_collisions(self, get_random_code_mock):
+        mixer.blend('tinylinks.TinyLink', short_url='aa')
+        get_random_code_mock.side_effect = ['aa', 'aa', 'aa', 'bbb']
+        self.assertEqual(RandomCodeGenerator().generate(), 'bbb')
+        self.assertEqual(get_random_code_mock.call_args[0][0], 3, msg=(
+            'Should use longer short URLs after too many collisions.'))
+        self.assertEqual(get_generation_stats(), (1, 3))
+
+
+class SequenceCodeGeneratorTestCase(TestCase):
+    """Tests for the ``SequenceCodeGenerator`` class."""
+    def test_encode_decode(self):
+        generator = SequenceCodeGenerator()
+        with override_settings(TINYLINK_SEQUENCE_MIN_LENGTH=1):
+            self.assertEqual(generator.encode(1), '0a')
+            self.assertEqual(generator.encode(34), '0aa')
+            for key in (None, 'secret'):
+                with override_settings(TINYLINK_SEQUENCE_KEY=key):
+                    codes = [generator.encode(pk) for pk in range(1, 1200)]
+                    self.assertEqual(len(set(codes)), len(codes))
+                    self.assertEqual(
+                        [generator.decode(code) for code in codes],
+                        list(range(1, 1200)))
+            self.assertIsNone(generator.decode('0ab0'), msg=(
+                'Should not decode characters outside of the alphabet.'))
+            self.assertIsNone(generator.decode('abc'), msg=(
+                'Should not decode codes without the prefix.'))
+        self.assertIsNone(generator.decode('0abc'), msg=(
+            'Should not decode codes below the minimum length.'))
+        self.assertEqual(generator.decode(generator.encode(2 ** 31 - 1)),
+                         2 ** 31 - 1)
+        self.assertIsNone(generator.decode(generator.encode(2 ** 31)), msg=(
+            'Should not decode primary keys beyond the integer column.'))
+
+    @override_settings(TINYLINK_CODE_GENERATOR='sequence')
+    def test_decode_max_length(self):
+        short_url = '0' + 'z' * 31
+        self.assertIsNone(follow_tinylink(short_url))
+        resp = self.client.get('/{0}/'.format(short_url))
+        self.assertEqual(resp.status_code, 302)
+        self.assertTrue(resp['Location'].endswith(reverse(
+            'tinylink_notfound')), msg=(
+                'Should answer codes beyond the primary keys as not found.'))
+
+    @override_settings(TINYLINK_CODE_GENERATOR='sequence')
+    def test_assign(self):
+        user = mixer.blend('auth.User')
+        form = TinylinkForm(data={'long_url': 'http://www.example.com/'},
+                            user=user)
+        self.assertTrue(form.is_valid())
+        self.assertFalse(form.cleaned_data['short_url'])
+        link = form.save()
+        generator = get_code_generator()
+        self.assertEqual(link.short_url, generator.encode(link.pk))
+        self.assertEqual(Tinylink.objects.get(pk=link.pk).short_url,
+                         link.short_url)
+        self.assertEqual(follow_tinylink(link.short_url)[0], link.pk)
+
+        taken = generator.encode(link.pk + 1)
+        mixer.blend('tinylinks.TinyLink', short_url=taken, pk=link.pk + 5)
+        link = mixer.blend('tinylinks.TinyLink', pk=link.pk + 1,
+                           short_url=generator.generate())
+        self.assertNotEqual(link.short_url, taken, msg=(
+            'Should fall back to a random short URL if the code is taken.'))
+        self.assertFalse(is_placeholder(link.short_url))
+        self.assertEqual(follow_tinylink(taken)[0], link.pk + 4, msg=(
+            'Should find custom short URLs that look like codes.'))
+        self.assertIsNone(generator.decode(link.short_url), msg=(
+            'Should not decode random short URLs.'))
+        with self.assertNumQueries(1):
+            Tinylink.objects.resolve(link.short_url,
+                                     generator.decode(link.short_url))
+
+
+class PoolCodeGeneratorTestCase(TestCase):
+    """Tests for the ``PoolCodeGenerator`` class."""
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(TINYLINK_CODE_POOL_SIZE=30,
+                       TINYLINK_CODE_POOL_LOW_WATER_MARK=10,
+                       TINYLINK_LENGTH=2)
+    def test_fill(self):
+        mixer.blend('tinylinks.TinyLink', short_url='aa')
+        generator = PoolCodeGenerator()
+        self.assertEqual(generator.fill(), 30)
+        self.assertFalse(ShortCodePool.objects.filter(
+            short_url='aa').exists(), msg=(
+                'Should not add short URLs that are taken.'))
+        self.assertEqual(generator.fill(), 0, msg=(
+            'Should not fill the pool above the low-water mark.'))
+        ShortCodePool.objects.filter(
+            pk__in=ShortCodePool.objects.values_list('pk', flat=True)[:25]
+        ).delete()
+        self.assertEqual(generator.fill(), 25)
+        self.assertEqual(generator.fill(force=True), 0)
+
+    @override_settings(TINYLINK_CODE_GENERATOR='pool')
+    def test_generate(self):
+        ShortCodePool.objects.create(short_url='pooled')
+        ShortCodePool.objects.create(short_url='custom')
+        user = mixer.blend('auth.User')
+        form = TinylinkForm(data={'long_url': 'http://www.example.com/'},
+                            user=user)
+        self.assertTrue(form.is_valid())
+        self.assertEqual(ShortCodePool.objects.count(), 2, msg=(
+            'Should not claim a short URL before the tinylink is saved.'))
+        self.assertEqual(form.save().short_url, 'pooled')
+        form = TinylinkForm(data={'long_url': 'http://www.example.com/',
+                                  'short_url': 'custom'}, user=user)
+        self.assertTrue(form.is_valid())
+        self.assertFalse(ShortCodePool.objects.exists(), msg=(
+            'Should remove custom short URLs from the pool.'))
+        self.assertTrue(PoolCodeGenerator().generate(), msg=(
+            'Should generate a random short URL if the pool is empty.'))
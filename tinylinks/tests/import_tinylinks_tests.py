@@ -0,0 +1,46 @@
+"""Tests for the ``import_tinylinks`` admin command."""
+import io
+import os
+import shutil
+import tempfile
+
+from django.core import management
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from mixer.backend.django import mixer
+
+from ..models import Tinylink
+
+
+class CommandTestCase(TestCase):
+    """Test class for the ``import_tinylinks`` admin command."""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'links.txt')
+        self.user = mixer.blend('auth.User', username='alice')
+        mixer.blend('tinylinks.TinyLink', user=self.user, short_url='taken',
+                    long_url='http://www.example.com/old/')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_command(self):
+        with io.open(self.path, 'w', encoding='utf-8') as fileobj:
+            fileobj.write(u'\n'.join([
+                u'http://www.example.com/new/',
+                u'HTTP://WWW.EXAMPLE.COM:80/new/',
+                u'http://www.example.com/old/',
+                u'http://www.example.com/custom/ custom',
+                u'http://www.example.com/taken/ taken',
+                u'not a url',
+            ]))
+        out = StringIO()
+        management.call_command('import_tinylinks', self.path, 'alice',
+                                chunk_size=2, stdout=out, stderr=StringIO())
+        self.assertIn('Created 2 tinylinks, skipped 4.', out.getvalue())
+        self.assertEqual(Tinylink.objects.get(
+            long_url='http://www.example.com/custom/').short_url, 'custom')
+        self.assertRaises(CommandError, management.call_command,
+                          'import_tinylinks', self.path, 'bob')
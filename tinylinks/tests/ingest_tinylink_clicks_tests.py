@@ -0,0 +1,32 @@
+"""Tests for the ``ingest_tinylink_clicks`` admin command."""
+from django.core import management
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+from django.utils.six import StringIO
+
+from mixer.backend.django import mixer
+from mock import patch
+
+from ..clicks import record_click
+from ..models import ClickEvent
+
+
+class CommandTestCase(TestCase):
+    """Test class for the ``ingest_tinylink_clicks`` admin command."""
+    def setUp(self):
+        cache.clear()
+
+    @patch('tinylinks.buffers.time.time')
+    def test_command(self, time_mock):
+        link = mixer.blend('tinylinks.TinyLink')
+        out = StringIO()
+        management.call_command('ingest_tinylink_clicks', stdout=out)
+        self.assertIn('not recorded', out.getvalue())
+        with override_settings(TINYLINK_CLICK_EVENTS='cache'):
+            time_mock.return_value = 6000
+            record_click(link.pk, RequestFactory().get('/'))
+            time_mock.return_value = 6120
+            management.call_command('ingest_tinylink_clicks', stdout=out)
+        self.assertIn('Saved 1 click events', out.getvalue())
+        self.assertEqual(ClickEvent.objects.count(), 1)
@@ -0,0 +1,77 @@
+"""Tests for the middlewares of the ``django-tinylinks`` app."""
+from django.conf.urls import include, url
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+
+from mixer.backend.django import mixer
+
+from ..middleware import TinylinkRedirectMiddleware
+from ..models import Tinylink
+
+
+# The app's views share the prefix of the short URLs, like in the README.
+urlpatterns = [
+    url(r'^s/', include('tinylinks.urls')),
+]
+
+
+@override_settings(TINYLINK_REDIRECT_PREFIX='/s/')
+class TinylinkRedirectMiddlewareTestCase(TestCase):
+    """Tests for the ``TinylinkRedirectMiddleware`` middleware class."""
+    def setUp(self):
+        self.link = mixer.blend(
+            'tinylinks.TinyLink', short_url='vB7f5b',
+            long_url='http://www.example.com/thisisalongURL')
+        self.middleware = TinylinkRedirectMiddleware()
+        self.factory = RequestFactory()
+
+    def process(self, path, urlconf=None, **extra):
+        request = self.factory.get(path, **extra)
+        if urlconf is not None:
+            request.urlconf = urlconf
+        return self.middleware.process_request(request)
+
+    def test_middleware(self):
+        resp = self.process('/s/vB7f5b/')
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(resp['Location'], self.link.long_url)
+        self.assertEqual(self.process('/s/vB7f5b')['Location'],
+                         self.link.long_url)
+        self.assertEqual(
+            Tinylink.objects.get(pk=self.link.pk).amount_of_views, 2)
+        self.assertIsNone(self.process('/s/create/'), msg=(
+            'Should pass unknown short URLs on to the views.'))
+        self.assertIsNone(self.process('/vB7f5b/'), msg=(
+            'Should ignore requests outside of the prefix.'))
+        with override_settings(TINYLINK_REDIRECT_HOST='sho.rt'):
+            self.assertIsNone(self.process('/s/vB7f5b/'))
+            self.assertEqual(
+                self.process('/s/vB7f5b/', HTTP_HOST='sho.rt:80').status_code,
+                302)
+        with override_settings(TINYLINK_REDIRECT_PREFIX=None):
+            self.assertIsNone(self.process('/s/vB7f5b/'))
+
+    def test_app_prefix(self):
+        mixer.blend('tinylinks.TinyLink', short_url='create',
+                    long_url='http://www.example.com/create')
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.process('/s/create/', urlconf=__name__),
+                              msg='Should leave the views of the app alone.')
+        self.assertEqual(
+            self.process('/s/vB7f5b/', urlconf=__name__)['Location'],
+            self.link.long_url)
+
+    @override_settings(TINYLINK_REDIRECT_PREFIX='/')
+    def test_root_prefix(self):
+        mixer.blend('tinylinks.TinyLink', short_url='test',
+                    long_url='http://www.example.com/test')
+        self.assertIsNone(self.process('/test/'), msg=(
+            'Should leave URLs of other views to the URL resolver.'))
+        self.assertEqual(
+            Tinylink.objects.get(short_url='test').amount_of_views, 0)
+        self.assertEqual(self.process('/vB7f5b/')['Location'],
+                         self.link.long_url)
+        with override_settings(TINYLINK_REDIRECT_HOST='sho.rt'):
+            self.assertEqual(self.process(
+                '/test/', urlconf='tinylinks.urls',
+                HTTP_HOST='sho.rt').status_code, 302)
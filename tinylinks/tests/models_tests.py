@@ -4,6 +4,34 @@ from django.utils.timezone import now, timedelta
 
 from mixer.backend.django import mixer
 
+from ..models import (
+    TargetURL,
+    Tinylink,
+    get_long_url_hash,
+    normalize_long_url,
+)
+
+
+class TinylinkManagerTestCase(TestCase):
+    """Tests for the ``TinylinkManager`` model manager."""
+    def setUp(self):
+        self.link = mixer.blend(
+            'tinylinks.TinyLink', short_url="vB7f5b",
+            long_url="http://www.example.com/thisisalongURL")
+
+    def test_count_view(self):
+        self.assertEqual(
+            Tinylink.objects.count_view('vB7f5b'),
+            self.link.get_redirect_values(),
+            msg='Should return the redirect fields of the link.')
+        Tinylink.objects.count_view('vB7f5b')
+        self.assertEqual(
+            Tinylink.objects.get(pk=self.link.pk).amount_of_views, 2,
+            msg='Should increment the view counter on each call.')
+        self.assertIsNone(
+            Tinylink.objects.count_view('foobar'),
+            msg='Should return None if the short URL does not exist.')
+
 
 class TinylinkTestCase(TestCase, LiveServerTestCase):
     """Tests for the ``Tinylink`` model class."""
@@ -17,5 +45,76 @@ class TinylinkTestCase(TestCase, LiveServerTestCase):
 
     def test_can_be_validated(self):
         self.assertFalse(self.link.can_be_validated())
-        self.link.last_checked = now() - timedelta(minutes=61)
+        self.link.target.last_checked = now() - timedelta(minutes=61)
         self.assertTrue(self.link.can_be_validated())
+
+    def test_long_url_hash(self):
+        link = mixer.blend('tinylinks.TinyLink', long_url='http://a.com/')
+        self.assertEqual(link.long_url_hash, get_long_url_hash(link.long_url))
+        link.long_url = 'http://b.com/'
+        link.save(update_fields=['long_url'])
+        self.assertEqual(
+            Tinylink.objects.get(pk=link.pk).long_url_hash,
+            get_long_url_hash('http://b.com/'))
+        self.assertEqual(
+            Tinylink.objects.get_brother(link.user, 'HTTP://B.COM'), link)
+        Tinylink.objects.update(long_url_hash='')
+        self.assertEqual(
+            Tinylink.objects.backfill_long_url_hashes(chunk_size=1), 2)
+        self.assertEqual(
+            Tinylink.objects.get(pk=link.pk).long_url_hash,
+            get_long_url_hash('http://b.com/'))
+
+    def test_target(self):
+        link = mixer.blend('tinylinks.TinyLink',
+                           long_url='HTTP://Example.com:80')
+        other = mixer.blend('tinylinks.TinyLink',
+                            long_url='http://example.com/')
+        self.assertEqual(link.target, other.target)
+        self.assertEqual(link.target.long_url, 'http://example.com/')
+        link.long_url = 'http://b.com/'
+        link.save(update_fields=['long_url'])
+        self.assertEqual(
+            Tinylink.objects.get(pk=link.pk).target.long_url,
+            'http://b.com/')
+        self.assertEqual(
+            TargetURL.objects.get(tinylinks=self.link).url_hash,
+            self.link.long_url_hash)
+
+    def test_schedule(self):
+        mixer.blend('tinylinks.TinyLink',
+                    long_url='http://www.example.com/other')
+        TargetURL.objects.update(
+            is_broken=True, check_failures=3,
+            next_check_at=now() + timedelta(days=7))
+        self.link.long_url = 'http://www.example.com/other'
+        self.link.save()
+        target = TargetURL.objects.get(pk=self.link.target.pk)
+        self.assertEqual(target.check_failures, 3, msg=(
+            'Should keep the schedule of an existing target.'))
+        self.link.long_url = 'http://www.example.com/new'
+        self.link.save()
+        target = TargetURL.objects.get(pk=self.link.target.pk)
+        self.assertEqual(target.check_failures, 0)
+        self.assertLessEqual(target.next_check_at, now(), msg=(
+            'Should check a new long URL right away.'))
+        self.assertEqual(target.changed, target.next_check_at)
+        self.link.short_url = 'other'
+        self.link.save()
+        self.assertEqual(
+            TargetURL.objects.get(pk=self.link.target.pk).changed,
+            target.changed, msg='Should only reset the schedule if the'
+            ' long URL changed.')
+
+
+class NormalizeLongUrlTestCase(TestCase):
+    """Tests for the ``normalize_long_url`` function."""
+    def test_function(self):
+        self.assertEqual(normalize_long_url(' HTTP://User@Example.COM:80'),
+                         'http://User@example.com/')
+        self.assertEqual(
+            normalize_long_url('https://example.com:8443/A?b=C#d'),
+            'https://example.com:8443/A?b=C#d')
+        self.assertEqual(get_long_url_hash('http://example.com'),
+                         get_long_url_hash('http://EXAMPLE.com:80/'))
+
@@ -0,0 +1,21 @@
+"""Tests for the ``rollup_tinylink_clicks`` admin command."""
+from django.core import management
+from django.test import TestCase
+from django.utils.six import StringIO
+from django.utils.timezone import now, timedelta
+
+from mixer.backend.django import mixer
+
+from ..models import ClickEvent, TinylinkClickRollup
+
+
+class CommandTestCase(TestCase):
+    """Test class for the ``rollup_tinylink_clicks`` admin command."""
+    def test_command(self):
+        link = mixer.blend('tinylinks.TinyLink')
+        ClickEvent.objects.create(tinylink=link, timestamp=now(),
+                                  created=now() - timedelta(minutes=5))
+        out = StringIO()
+        management.call_command('rollup_tinylink_clicks', stdout=out)
+        self.assertIn('Rolled up 1 click events', out.getvalue())
+        self.assertEqual(TinylinkClickRollup.objects.count(), 2)
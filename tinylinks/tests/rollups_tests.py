@@ -0,0 +1,111 @@
+"""Tests for the click rollups of the ``django-tinylinks`` app."""
+from datetime import datetime
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.timezone import now, timedelta, utc
+
+from mixer.backend.django import mixer
+
+from ..models import ClickEvent, TinylinkClickRollup
+from ..rollups import (
+    get_bucket_start,
+    get_daily_clicks,
+    prune_click_events,
+    rollup_click_events,
+)
+
+
+class GetBucketStartTestCase(TestCase):
+    """Tests for the ``get_bucket_start`` function."""
+    def test_function(self):
+        timestamp = datetime(2016, 3, 4, 5, 6, 7, 8, tzinfo=utc)
+        self.assertEqual(get_bucket_start(timestamp, 'hour'),
+                         datetime(2016, 3, 4, 5, tzinfo=utc))
+        self.assertEqual(get_bucket_start(timestamp, 'day'),
+                         datetime(2016, 3, 4, tzinfo=utc))
+
+
+@override_settings(TINYLINK_CLICK_ROLLUP_LAG=0)
+class RollupClickEventsTestCase(TestCase):
+    """Tests for the ``rollup_click_events`` function."""
+    def setUp(self):
+        self.links = mixer.cycle(2).blend('tinylinks.TinyLink')
+
+    def add_events(self, link, *hours):
+        for hour in hours:
+            ClickEvent.objects.create(tinylink=link, timestamp=datetime(
+                2016, 3, 4, hour, 30, tzinfo=utc))
+
+    def get_rollups(self, period):
+        return list(TinylinkClickRollup.objects.filter(
+            period=period).order_by('tinylink_id', 'start').values_list(
+                'tinylink', 'start', 'clicks'))
+
+    def test_function(self):
+        self.add_events(self.links[0], 1, 1, 2)
+        self.add_events(self.links[1], 2)
+        with override_settings(TINYLINK_CLICK_ROLLUP_CHUNK_SIZE=3):
+            self.assertEqual(rollup_click_events(), 4)
+        self.assertEqual(self.get_rollups('hour'), [
+            (self.links[0].pk, datetime(2016, 3, 4, 1, tzinfo=utc), 2),
+            (self.links[0].pk, datetime(2016, 3, 4, 2, tzinfo=utc), 1),
+            (self.links[1].pk, datetime(2016, 3, 4, 2, tzinfo=utc), 1),
+        ])
+        self.assertEqual(rollup_click_events(), 0, msg=(
+            'Should not roll up the same events twice.'))
+        self.add_events(self.links[0], 2)
+        self.assertEqual(rollup_click_events(), 1)
+        self.assertEqual(self.get_rollups('day'), [
+            (self.links[0].pk, datetime(2016, 3, 4, tzinfo=utc), 4),
+            (self.links[1].pk, datetime(2016, 3, 4, tzinfo=utc), 1),
+        ])
+
+    @override_settings(TINYLINK_CLICK_ROLLUP_LAG=60)
+    def test_lag(self):
+        self.add_events(self.links[0], 1, 2, 3)
+        self.add_events(self.links[1], 1)
+        pks = list(ClickEvent.objects.order_by('pk').values_list(
+            'pk', flat=True))
+        ClickEvent.objects.filter(pk__in=[pks[0], pks[1], pks[3]]).update(
+            created=now() - timedelta(minutes=5))
+        self.assertEqual(rollup_click_events(), 2, msg=(
+            'Should stop at the first event that was saved recently.'))
+        ClickEvent.objects.update(created=now() - timedelta(minutes=5))
+        self.assertEqual(rollup_click_events(), 2)
+
+
+@override_settings(TINYLINK_CLICK_ROLLUP_LAG=0)
+class PruneClickEventsTestCase(TestCase):
+    """Tests for the ``prune_click_events`` function."""
+    def test_function(self):
+        link = mixer.blend('tinylinks.TinyLink')
+        ClickEvent.objects.create(
+            tinylink=link, timestamp=now() - timedelta(days=40))
+        self.assertEqual(prune_click_events(), 0, msg=(
+            'Should not delete events that were not rolled up.'))
+        rollup_click_events()
+        ClickEvent.objects.create(
+            tinylink=link, timestamp=now() - timedelta(days=40))
+        ClickEvent.objects.create(tinylink=link, timestamp=now())
+        rollup_click_events()
+        with override_settings(TINYLINK_CLICK_EVENTS_RETENTION=None):
+            self.assertEqual(prune_click_events(), 0)
+        self.assertEqual(prune_click_events(), 2)
+        self.assertEqual(ClickEvent.objects.count(), 1)
+
+
+class GetDailyClicksTestCase(TestCase):
+    """Tests for the ``get_daily_clicks`` function."""
+    def test_function(self):
+        links = mixer.cycle(2).blend('tinylinks.TinyLink')
+        today = get_bucket_start(now(), 'day')
+        for link in links:
+            TinylinkClickRollup.objects.create(
+                tinylink=link, period='day', start=today, clicks=2)
+        TinylinkClickRollup.objects.create(
+            tinylink=links[0], period='day',
+            start=today - timedelta(days=10), clicks=1)
+        self.assertEqual(get_daily_clicks(7), [(today, 4)])
+        self.assertEqual(get_daily_clicks(30, links[0]), [
+            (today - timedelta(days=10), 1), (today, 2)])
@@ -0,0 +1,56 @@
+"""Tests for the schedules of the ``django-tinylinks`` app."""
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.timezone import now, timedelta
+
+from mixer.backend.django import mixer
+
+from ..schedules import get_check_delay, schedule_check
+
+
+class GetCheckDelayTestCase(TestCase):
+    """Tests for the ``get_check_delay`` function."""
+    def test_function(self):
+        self.assertEqual(get_check_delay(False), timedelta(minutes=300))
+        self.assertEqual(get_check_delay(False, views=150),
+                         timedelta(minutes=100))
+        self.assertEqual(get_check_delay(False, views=150,
+                                         recently_changed=True),
+                         timedelta(minutes=50))
+        self.assertEqual(get_check_delay(False, views=10 ** 9),
+                         timedelta(minutes=30))
+        self.assertEqual(get_check_delay(False, views=10 ** 19,
+                                         recently_changed=True),
+                         timedelta(minutes=10), msg=(
+                             'Should not check more often than the interval.'))
+        self.assertEqual(get_check_delay(True, 1, views=150),
+                         timedelta(minutes=300))
+        self.assertEqual(get_check_delay(True, 3), timedelta(minutes=1200))
+        with override_settings(TINYLINK_CHECK_MAX_DELAY=1000):
+            self.assertEqual(get_check_delay(True, 1000),
+                             timedelta(minutes=1000))
+        with override_settings(TINYLINK_CHECK_MAX_DELAY=100):
+            self.assertEqual(get_check_delay(True, 1),
+                             timedelta(minutes=300), msg=(
+                                 'Should not check broken URLs more often'
+                                 ' than healthy ones.'))
+
+
+class ScheduleCheckTestCase(TestCase):
+    """Tests for the ``schedule_check`` function."""
+    def test_function(self):
+        link = mixer.blend('tinylinks.TargetURL', is_broken=True,
+                           check_failures=1)
+        link.amount_of_views = 0
+        link.changed = now()
+        link.last_checked = now()
+        schedule_check(link)
+        self.assertEqual(link.check_failures, 2)
+        self.assertEqual(link.next_check_at,
+                         link.last_checked + timedelta(minutes=600))
+        link.is_broken = False
+        schedule_check(link)
+        self.assertEqual(link.check_failures, 0)
+        self.assertEqual(link.next_check_at,
+                         link.last_checked + timedelta(minutes=150),
+                         msg='Should check recently changed links sooner.')
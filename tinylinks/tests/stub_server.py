@@ -0,0 +1,86 @@
+"""Stub HTTP server to test the URL checks of the ``django-tinylinks`` app."""
+import threading
+import time
+
+from django.utils.six.moves import BaseHTTPServer, socketserver
+
+
+class StubRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Answers requests depending on their path.
+
+    ``/ok/`` returns 200, ``/redirect/`` redirects to ``/ok/`` with a 302,
+    ``/bad-gateway/`` returns 502, ``/slow/`` returns 200 after ``delay``
+    seconds, ``/no-head/`` returns 405 for ``HEAD`` requests and 200 for
+    ``GET`` requests, ``/chain/`` redirects to ``/redirect/`` with a 301,
+    ``/loop/`` redirects to itself, ``/flaky/`` returns 503 for the first two
+    requests and 200 afterwards and all other paths return 404.
+
+    The requests are counted in ``requests`` of the server.
+
+    """
+    delay = 0.5
+
+    def do_GET(self):
+        self.server.requests.append((self.command, self.path))
+        if self.path in ('/ok/', '/no-head/'):
+            self.respond(200)
+        elif self.path == '/redirect/':
+            self.respond(302, Location='/ok/')
+        elif self.path == '/chain/':
+            self.respond(301, Location='/redirect/')
+        elif self.path == '/loop/':
+            self.respond(302, Location='/loop/')
+        elif self.path == '/flaky/':
+            if len([request for request in self.server.requests
+                    if request[1] == '/flaky/']) > 2:
+                self.respond(200)
+            else:
+                self.respond(503)
+        elif self.path == '/bad-gateway/':
+            self.respond(502)
+        elif self.path == '/slow/':
+            time.sleep(self.delay)
+            self.respond(200)
+        else:
+            self.respond(404)
+
+    def do_HEAD(self):
+        if self.path == '/no-head/':
+            self.server.requests.append((self.command, self.path))
+            self.respond(405)
+        else:
+            self.do_GET()
+
+    def respond(self, status, **headers):
+        self.send_response(status)
+        headers.setdefault('Content-Length', '0')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """Threaded ``StubRequestHandler`` server on a free local port."""
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(
+            self, ('127.0.0.1', 0), StubRequestHandler)
+        self.requests = []
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+    def get_url(self, path):
+        return 'http://127.0.0.1:{0}{1}'.format(self.server_address[1], path)
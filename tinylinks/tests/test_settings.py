@@ -11,6 +11,7 @@ SECRET_KEY = "foobar"
 TINYLINK_LENGTH = 5
 TINYLINK_CHECK_INTERVAL = 10
 TINYLINK_CHECK_PERIOD = 300
+TINYLINK_CHECK_RETRY_BACKOFF = 0
 
 PASSWORD_HASHERS = (
     'django.contrib.auth.hashers.MD5PasswordHasher',
@@ -0,0 +1,26 @@
+"""Tests for the ``tinylink_cache_stats`` admin command."""
+from django.core import management
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from mock import patch
+
+from ..cache import ResolutionCache
+
+
+class CommandTestCase(TestCase):
+    """Test class for the ``tinylink_cache_stats`` admin command."""
+    @patch('tinylinks.management.commands.tinylink_cache_stats'
+           '.get_resolution_cache')
+    def test_command(self, get_mock):
+        get_mock.return_value = None
+        out = StringIO()
+        management.call_command('tinylink_cache_stats', stdout=out)
+        self.assertIn('disabled', out.getvalue())
+        cache.clear()
+        get_mock.return_value = ResolutionCache()
+        get_mock.return_value.resolve('foobar')
+        management.call_command('tinylink_cache_stats', stdout=out)
+        self.assertIn('misses: 1', out.getvalue())
+        self.assertIn('hit rate: 0.0%', out.getvalue())
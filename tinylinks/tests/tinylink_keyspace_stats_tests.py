@@ -0,0 +1,23 @@
+"""Tests for the ``tinylink_keyspace_stats`` admin command."""
+from django.core import management
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.six import StringIO
+
+from mixer.backend.django import mixer
+
+
+class CommandTestCase(TestCase):
+    """Test class for the ``tinylink_keyspace_stats`` admin command."""
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(TINYLINK_LENGTH=1)
+    def test_command(self):
+        for short_url in 'abcdefghijklmnop':
+            mixer.blend('tinylinks.TinyLink', short_url=short_url)
+        out = StringIO()
+        management.call_command('tinylink_keyspace_stats', stdout=out)
+        self.assertIn('length 1: 16 of 33 taken (48.48%)', out.getvalue())
+        self.assertIn('current length: 2', out.getvalue())
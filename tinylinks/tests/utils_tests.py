@@ -1,11 +1,92 @@
 """Tests for the models of the ``django-tinylinks`` app."""
+import time
+
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.test import TestCase, LiveServerTestCase
+from django.test.utils import override_settings
 
 from mixer.backend.django import mixer
+from mock import patch
+
+from ..cache import get_resolution_cache
+from ..models import TargetURL, Tinylink
+from ..utils import (
+    CHECK_LOCK_KEY,
+    DeadlineExceeded,
+    check_lock,
+    check_long_url,
+    check_long_urls,
+    follow_tinylink,
+    get_redirect_response,
+    is_valid_short_url,
+    request_url,
+    save_checks,
+    validate_long_url,
+)
+from .stub_server import StubServer
+
+
+class GetRedirectResponseTestCase(TestCase):
+    """Tests for the ``get_redirect_response`` function."""
+    def test_function(self):
+        resp = get_redirect_response((1, 'http://www.example.com/', None,
+                                      None))
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(resp['Location'], 'http://www.example.com/')
+        self.assertFalse(resp.has_header('Cache-Control'), msg=(
+            'Should not add caching headers by default.'))
+        resp = get_redirect_response((1, 'http://www.example.com/', 308,
+                                      3600))
+        self.assertEqual(resp.status_code, 308)
+        self.assertEqual(resp.reason_phrase, 'Permanent Redirect')
+        self.assertIn('max-age=3600', resp['Cache-Control'])
+        self.assertIn('public', resp['Cache-Control'])
+        self.assertTrue(resp.has_header('Expires'))
+        with override_settings(TINYLINK_REDIRECT_STATUS=301,
+                               TINYLINK_REDIRECT_MAX_AGE=0,
+                               TINYLINK_REDIRECT_VARY=['Accept-Language']):
+            resp = get_redirect_response((1, 'http://www.example.com/', None,
+                                          None))
+        self.assertEqual(resp.status_code, 301)
+        self.assertIn('max-age=0', resp['Cache-Control'])
+        self.assertEqual(resp['Vary'], 'Accept-Language')
+
+
+class IsValidShortUrlTestCase(TestCase):
+    """Tests for the ``is_valid_short_url`` function."""
+    def test_function(self):
+        self.assertTrue(is_valid_short_url('vB7f5b'))
+        self.assertFalse(is_valid_short_url(''))
+        self.assertFalse(is_valid_short_url('a' * 33))
+        self.assertFalse(is_valid_short_url('foo.bar'))
+        with override_settings(TINYLINK_SHORT_URL_PATTERN=r'^[a-z0-9]+$'):
+            self.assertFalse(is_valid_short_url('vB7f5b'))
+
+
+class FollowTinylinkTestCase(TestCase):
+    """Tests for the ``follow_tinylink`` function."""
+    def setUp(self):
+        self.link = mixer.blend(
+            'tinylinks.TinyLink', short_url="vB7f5b",
+            long_url="http://www.example.com/thisisalongURL")
 
-from ..models import Tinylink
-from ..utils import validate_long_url
+    def test_function(self):
+        self.assertEqual(follow_tinylink('vB7f5b'),
+                         self.link.get_redirect_values())
+        self.assertIsNone(follow_tinylink('foobar'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(follow_tinylink('a' * 33))
+        cache.clear()
+        with override_settings(TINYLINK_RESOLUTION_CACHE=True):
+            get_resolution_cache().local.clear()
+            follow_tinylink('vB7f5b')
+            with self.assertNumQueries(1):
+                # Only the view is written to the database.
+                self.assertEqual(follow_tinylink('vB7f5b')[1],
+                                 self.link.long_url)
+        self.assertEqual(
+            Tinylink.objects.get(pk=self.link.pk).amount_of_views, 3)
 
 
 class ValidateLongUrlTestCase(TestCase, LiveServerTestCase):
@@ -18,20 +99,208 @@ class ValidateLongUrlTestCase(TestCase, LiveServerTestCase):
     def test_method(self):
         validate_long_url(self.link)
         self.assertEqual(
-            Tinylink.objects.get(pk=self.link.pk).validation_error, "")
+            Tinylink.objects.get(pk=self.link.pk).target.validation_error, "")
         self.link.long_url = 'http://{}'.format(self.server_thread.host)
         self.link.save()
         validate_long_url(self.link)
         self.assertEqual(
-            Tinylink.objects.get(pk=self.link.pk).validation_error,
+            Tinylink.objects.get(pk=self.link.pk).target.validation_error,
             "URL not accessible.")
         self.link.long_url = '{}{}'.format(self.live_server_url,
                                            reverse('test_redirect_fail'))
         self.link.save()
         validate_long_url(self.link)
-        self.assertTrue(Tinylink.objects.get(pk=self.link.pk).is_broken)
+        self.assertTrue(
+            Tinylink.objects.get(pk=self.link.pk).target.is_broken)
+
+    def test_target(self):
+        other = mixer.blend('tinylinks.TinyLink', long_url=self.link.long_url)
+        TargetURL.objects.update(is_broken=True)
+        validate_long_url(self.link)
+        self.assertFalse(self.link.target.is_broken)
+        self.assertFalse(Tinylink.objects.get(pk=other.pk).target.is_broken,
+                         msg='Should update all tinylinks of the target.')
         self.link.long_url = '{}{}'.format(self.live_server_url,
                                            reverse('test_redirect'))
         self.link.save()
         validate_long_url(self.link)
-        self.assertTrue(Tinylink.objects.get(pk=self.link.pk).is_broken)
+        self.assertTrue(
+            Tinylink.objects.get(pk=self.link.pk).target.is_broken)
+
+
+class CheckLongUrlTestCase(TestCase):
+    """Tests for the ``check_long_url`` function."""
+    def setUp(self):
+        self.server = StubServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+
+    def check(self, path):
+        return check_long_url(mixer.blend(
+            'tinylinks.TargetURL', long_url=self.server.get_url(path)))
+
+    def test_function(self):
+        link = self.check('/chain/')
+        self.assertFalse(link.is_broken)
+        self.assertEqual(link.redirect_location, self.server.get_url('/ok/'))
+        self.assertEqual(link.redirect_hops, 2)
+        self.assertEqual(self.server.requests, [
+            ('HEAD', '/chain/'), ('HEAD', '/redirect/'), ('HEAD', '/ok/')],
+            msg='Should request each hop once.')
+        link = self.check('/loop/')
+        self.assertTrue(link.is_broken)
+        self.assertEqual(link.validation_error, 'Redirect loop.')
+        with override_settings(TINYLINK_CHECK_MAX_REDIRECTS=1):
+            link = self.check('/chain/')
+        self.assertEqual(link.validation_error, 'Too many redirects.')
+        self.assertFalse(self.check('/flaky/').is_broken, msg=(
+            'Should retry temporary failures.'))
+        with override_settings(TINYLINK_CHECK_RETRIES=0):
+            self.assertTrue(self.check('/bad-gateway/').is_broken)
+        self.assertEqual(self.server.requests.count(('GET', '/bad-gateway/')),
+                         1)
+
+    def test_deadline(self):
+        link = mixer.blend('tinylinks.TargetURL',
+                           long_url=self.server.get_url('/bad-gateway/'))
+        with override_settings(TINYLINK_CHECK_CONNECT_TIMEOUT=1,
+                               TINYLINK_CHECK_TIMEOUT=1,
+                               TINYLINK_CHECK_RETRY_BACKOFF=60):
+            with self.assertRaises(DeadlineExceeded):
+                check_long_url(link, deadline=time.time() + 30)
+        self.assertEqual(self.server.requests.count(('GET', '/bad-gateway/')),
+                         1, msg='Should not retry after the deadline.')
+        link.long_url = self.server.get_url('/chain/')
+        with patch('tinylinks.utils.time') as mock_time:
+            mock_time.time.side_effect = [0, 20]
+            with self.assertRaises(DeadlineExceeded):
+                check_long_url(link, deadline=40)
+        self.assertEqual(self.server.requests[-1], ('HEAD', '/chain/'),
+                         msg='Should not follow redirects after the deadline.')
+
+
+class RequestUrlTestCase(TestCase):
+    """Tests for the ``request_url`` function."""
+    def setUp(self):
+        self.server = StubServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+
+    def test_function(self):
+        self.assertEqual(request_url(self.server.get_url('/ok/')).status_code,
+                         200)
+        self.assertEqual(self.server.requests, [('HEAD', '/ok/')])
+        self.assertEqual(
+            request_url(self.server.get_url('/no-head/')).status_code, 200)
+        self.assertEqual(self.server.requests[1:], [
+            ('HEAD', '/no-head/'), ('GET', '/no-head/')], msg=(
+                'Should fall back to GET if HEAD is not supported.'))
+        self.assertEqual(
+            request_url(self.server.get_url('/missing/')).status_code, 404)
+        link = mixer.blend('tinylinks.TargetURL',
+                           long_url=self.server.get_url('/slow/'))
+        start = time.time()
+        with override_settings(TINYLINK_CHECK_TIMEOUT=0.1,
+                               TINYLINK_CHECK_RETRIES=0):
+            check_long_url(link)
+        self.assertLess(time.time() - start, 0.4)
+        self.assertTrue(link.is_broken)
+
+
+class CheckLongUrlsTestCase(TestCase):
+    """Tests for the ``check_long_urls`` function."""
+    def setUp(self):
+        self.server = StubServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+
+    def get_link(self, path):
+        return mixer.blend('tinylinks.TargetURL', is_broken=True,
+                           long_url=self.server.get_url(path))
+
+    def test_function(self):
+        links = dict((path, self.get_link(path)) for path in (
+            '/ok/', '/redirect/', '/missing/', '/bad-gateway/'))
+        slow = [self.get_link('/slow/') for i in range(4)]
+        start = time.time()
+        with self.assertNumQueries(0):
+            checked = list(check_long_urls(list(links.values()) + slow,
+                                           workers=4))
+        self.assertLess(time.time() - start, 1.5, msg=(
+            'Should check the slow URLs at the same time.'))
+        self.assertEqual(len(checked), 8)
+        self.assertFalse(links['/ok/'].is_broken)
+        self.assertFalse(links['/redirect/'].is_broken)
+        self.assertTrue(links['/missing/'].is_broken)
+        self.assertEqual(links['/missing/'].validation_error,
+                         'URL not accessible.')
+        self.assertTrue(all(not link.is_broken for link in slow))
+
+    def test_deadline(self):
+        link = self.get_link('/ok/')
+        self.assertEqual(
+            list(check_long_urls([link], deadline=time.time() + 60)), [link])
+        self.assertEqual(
+            list(check_long_urls([link], deadline=time.time() + 1)), [],
+            msg='Should not start checks that could exceed the deadline.')
+
+    def test_failure(self):
+        links = [self.get_link('/ok/'), self.get_link('/ok/')]
+
+        def check(link, deadline=None):
+            if link == links[0]:
+                raise ValueError
+            return check_long_url(link, deadline)
+
+        with patch('tinylinks.utils.check_long_url', side_effect=check), \
+                patch('tinylinks.utils.logger') as logger:
+            self.assertEqual(len(list(check_long_urls(links, workers=2))),
+                             2)
+        self.assertTrue(logger.exception.called)
+        self.assertTrue(links[0].is_broken)
+        self.assertEqual(links[0].validation_error, 'Check failed.')
+        self.assertFalse(links[1].is_broken, msg=(
+            'Should check the other links after a failure.'))
+
+
+class SaveChecksTestCase(TestCase):
+    """Tests for the ``save_checks`` function."""
+    def test_function(self):
+        links = mixer.cycle(3).blend('tinylinks.TargetURL', is_broken=False)
+        for link in links[:2]:
+            link.is_broken = True
+            link.validation_error = 'URL not accessible.'
+        links[2].long_url = 'http://changed.example.com/'
+        # One update per result and the savepoint of the transaction.
+        with self.assertNumQueries(4):
+            save_checks(links)
+        self.assertEqual(
+            list(TargetURL.objects.filter(is_broken=True).order_by('pk')),
+            links[:2])
+        self.assertNotEqual(
+            TargetURL.objects.get(pk=links[2].pk).long_url,
+            links[2].long_url, msg='Should only save the validation fields.')
+        with override_settings(TINYLINK_CHECK_CHUNK_SIZE=1):
+            with self.assertNumQueries(5):
+                save_checks(links)
+        link = mixer.blend('tinylinks.TinyLink', long_url='http://a.com/')
+        mixer.blend('tinylinks.TinyLink', long_url='http://a.com/')
+        self.assertEqual(link.target.tinylinks.count(), 2)
+        link.target.is_broken = True
+        save_checks([link.target])
+        self.assertEqual(
+            Tinylink.objects.filter(target__is_broken=True).count(), 2,
+            msg='Should change the state of all tinylinks of the target.')
+
+
+class CheckLockTestCase(TestCase):
+    """Tests for the ``check_lock`` context manager."""
+    def test_function(self):
+        cache.clear()
+        with check_lock(60) as acquired:
+            self.assertTrue(acquired)
+            with check_lock(60) as acquired:
+                self.assertFalse(acquired)
+        with check_lock(60) as acquired:
+            self.assertTrue(acquired, msg='Should release the lock.')
+            # The lock expired and was acquired by another run.
+            cache.set(CHECK_LOCK_KEY, 'other')
+        self.assertEqual(cache.get(CHECK_LOCK_KEY), 'other', msg=(
+            'Should only release the lock of the same run.'))
@@ -1,12 +1,14 @@
 """Tests for the views of the ``django-tinylinks`` app."""
 from django.contrib.auth.models import Permission
+from django.core.cache import cache
 from django.test import TestCase
+from django.test.utils import override_settings
 from django.core.urlresolvers import reverse
+from django.http import QueryDict
 
 from django_libs.tests.mixins import ViewRequestFactoryTestMixin
 from mixer.backend.django import mixer
 from mock import patch
-from requests import Response
 
 from .. import views
 from ..models import Tinylink
@@ -36,11 +38,9 @@ class TinylinkListViewTestCase(ViewRequestFactoryTestMixin,
     """Tests for the ``TinylinkListView`` generic view class."""
     view_class = views.TinylinkListView
 
-    @patch('requests.get')
+    @patch('tinylinks.utils.get_session')
     def test_view(self, mock):
-        resp = Response()
-        resp.status_code = 200
-        mock.return_value = resp
+        mock.return_value.head.return_value.status_code = 200
 
         self.is_callable(user=self.staff)
         self.is_callable(user=self.user)
@@ -49,12 +49,39 @@ class TinylinkListViewTestCase(ViewRequestFactoryTestMixin,
         self.is_not_callable(user=self.user, data={'validate999': True},
                              post=True)
         self.tinylink.long_url = "http://www.google.com"
-        self.tinylink.is_broken = True
         self.tinylink.save()
+        self.tinylink.target.is_broken = True
+        self.tinylink.target.save()
         self.is_postable(user=self.user, data={
             'validate{0}'.format(self.tinylink.id): True}, ajax=True)
-        self.assertFalse(Tinylink.objects.get(pk=self.tinylink.pk).is_broken,
-                         msg="Link should be valid.")
+        self.assertFalse(
+            Tinylink.objects.get(pk=self.tinylink.pk).target.is_broken,
+            msg="Link should be valid.")
+
+    @override_settings(TINYLINK_LIST_PAGE_SIZE=2)
+    def test_pagination(self):
+        links = mixer.cycle(2).blend('tinylinks.TinyLink', user=self.user)
+        resp = self.is_callable(user=self.user, data={'redirects': '1'})
+        self.assertEqual(list(resp.context_data['object_list']),
+                         list(reversed(links)))
+        self.assertEqual(
+            resp.context_data['object_list'][0].target.get_deferred_fields(),
+            set())
+        data = QueryDict(resp.context_data['next_page'])
+        self.assertEqual(data['redirects'], '1', msg=(
+            'Should keep the other parameters on the next page.'))
+        resp = self.is_callable(user=self.user, data=data)
+        self.assertEqual(list(resp.context_data['object_list']),
+                         [self.tinylink])
+        self.assertIsNone(resp.context_data['next_page'])
+
+    def test_deferred_redirect_location(self):
+        resp = self.is_callable(user=self.user)
+        self.assertEqual(
+            resp.context_data['object_list'][0].target.get_deferred_fields(),
+            set(['redirect_location']))
+        with self.assertNumQueries(0):
+            resp.render()
 
 
 class TinylinkCreateViewTestCase(ViewRequestFactoryTestMixin,
@@ -137,6 +164,23 @@ class TinylinkRedirectViewTestCase(ViewRequestFactoryTestMixin,
             msg=('Should redirect to "Not found" page if short_url is'
                  ' inexistent. Response was {0}'.format(resp.get('Location'))))
 
+    def test_redirect_status_and_caching(self):
+        self.tinylink.redirect_status = 301
+        self.tinylink.cache_max_age = 60
+        self.tinylink.save()
+        resp = self.client.get('/{0}/'.format(self.tinylink.short_url))
+        self.assertEqual(resp.status_code, 301)
+        self.assertIn('max-age=60', resp['Cache-Control'])
+
+    @override_settings(TINYLINK_VIEW_BUFFER='cache')
+    def test_buffered_views(self):
+        cache.clear()
+        resp = self.redirects(user=self.user)
+        self.assertEqual(resp.get('Location'), self.tinylink.long_url)
+        self.assertEqual(
+            Tinylink.objects.get(pk=self.tinylink.pk).amount_of_views, 0,
+            msg='Should not write buffered views to the database.')
+
     def test_can_handle_urls_with_percent_characters(self):
         """Regression test due to reported internal server errors."""
         tinylink = mixer.blend(
@@ -160,3 +204,57 @@ class StatisticsViewTestCase(ViewRequestFactoryTestMixin,
         self.user.is_staff = True
         self.user.save()
         self.is_callable(user=self.user)
+        self.is_not_callable(user=self.user, data={'sort': 'foo'})
+        self.is_not_callable(user=self.user, data={
+            'sort': 'checked', 'after': 'foo', 'after_pk': 1})
+        self.is_not_callable(user=self.user, data={
+            'sort': 'views', 'after_pk': 1}, msg=(
+                'Should raise 404 if the sort value of a page is missing.'))
+        self.is_not_callable(user=self.user, data={
+            'sort': 'views', 'after': '', 'after_pk': 1})
+
+    def test_queries(self):
+        mixer.cycle(5).blend('tinylinks.TinyLink', user=mixer.SELECT)
+        with self.assertNumQueries(4):
+            self.is_callable(user=self.staff).render()
+
+    def get_pages(self, sort, field):
+        pages = []
+        data = {'sort': sort}
+        while data is not None:
+            resp = self.is_callable(user=self.staff, data=data)
+            pages.append([getattr(link, field)
+                          for link in resp.context_data['object_list']])
+            data = resp.context_data['next_page']
+            if data is not None:
+                data = QueryDict(data)
+        return pages, resp
+
+    @override_settings(TINYLINK_STATISTICS_PAGE_SIZE=2)
+    def test_pagination(self):
+        for amount_of_views in (3, 1, 3, 2):
+            mixer.blend('tinylinks.TinyLink', amount_of_views=amount_of_views)
+        pages, resp = self.get_pages('checked', 'pk')
+        self.assertEqual(len(set(sum(pages, []))), 5)
+        pages, resp = self.get_pages('views', 'amount_of_views')
+        self.assertEqual(pages, [[3, 3], [2, 1], [0]])
+        self.assertEqual(resp.context_data['summary'], {
+            'links': 5, 'views': 9, 'broken': 0})
+
+
+class StatisticsExportViewTestCase(ViewRequestFactoryTestMixin,
+                                   TinylinkViewTestsMixin, TestCase):
+    """Tests for the ``StatisticsExportView`` view class."""
+    view_class = views.StatisticsExportView
+
+    def test_view(self):
+        self.is_not_callable(user=self.user)
+        resp = self.is_callable(user=self.staff)
+        self.assertEqual(resp['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(len(b''.join(resp.streaming_content).splitlines()),
+                         2)
+        resp = self.is_callable(user=self.staff, data={
+            'format': 'ndjson', 'broken': 'true'})
+        self.assertEqual(b''.join(resp.streaming_content), b'')
+        resp = self.get(user=self.staff, data={'checked_after': 'foo'})
+        self.assertEqual(resp.status_code, 400)
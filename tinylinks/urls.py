@@ -3,6 +3,7 @@ from django.conf.urls import url
 from django.views.generic import TemplateView
 
 from .views import (
+    StatisticsExportView,
     StatisticsView,
     TinylinkCreateView,
     TinylinkDeleteView,
@@ -49,6 +50,12 @@ urlpatterns = [
         name='tinylink_statistics',
     ),
 
+    url(
+        r'^statistics/export/$',
+        StatisticsExportView.as_view(),
+        name='tinylink_statistics_export',
+    ),
+
     url(
         r'^(?P<short_url>[a-zA-Z0-9-]+)/?$',
         TinylinkRedirectView.as_view(),
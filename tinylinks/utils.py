@@ -1,67 +1,511 @@
 """Utils for the ``tinylinks`` app."""
-from socket import gaierror
+import logging
+import re
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import partial
+from multiprocessing.pool import ThreadPool
 
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.http import (
+    HttpResponsePermanentRedirect,
+    HttpResponseRedirect,
+)
+from django.http.response import HttpResponseRedirectBase
+from django.utils.cache import (
+    add_never_cache_headers,
+    patch_cache_control,
+    patch_response_headers,
+    patch_vary_headers,
+)
+from django.utils import six
+from django.utils.encoding import iri_to_uri
+from django.utils.six.moves.urllib.parse import urljoin
 from django.utils.timezone import now
 from django.utils.translation import ugettext_lazy as _
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from .cache import get_resolution_cache
+from .clicks import record_click
+from .counters import get_view_buffer, record_view
+from .generators import get_code_generator
+from .models import TargetURL, Tinylink
+from .schedules import schedule_check
 
-def get_url_response(link, url):
+try:
+    from django.urls import (
+        NoReverseMatch,
+        Resolver404,
+        get_script_prefix,
+        resolve,
+        reverse,
+    )
+except ImportError:  # Django < 1.10
+    from django.core.urlresolvers import (
+        NoReverseMatch,
+        Resolver404,
+        get_script_prefix,
+        resolve,
+        reverse,
+    )
+
+logger = logging.getLogger(__name__)
+
+CHECK_LOCK_KEY = 'tinylinks:check'
+
+# Key of the PostgreSQL advisory lock of the URL checks.
+CHECK_LOCK_ID = 0x74696e796c696e6b
+
+
+class HttpResponseTemporaryRedirect(HttpResponseRedirectBase):
+    status_code = 307
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('reason', 'Temporary Redirect')
+        super(HttpResponseTemporaryRedirect, self).__init__(*args, **kwargs)
+
+
+class HttpResponsePermanentRedirect308(HttpResponseRedirectBase):
+    status_code = 308
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('reason', 'Permanent Redirect')
+        super(HttpResponsePermanentRedirect308, self).__init__(
+            *args, **kwargs)
+
+
+REDIRECT_RESPONSES = {
+    301: HttpResponsePermanentRedirect,
+    302: HttpResponseRedirect,
+    307: HttpResponseTemporaryRedirect,
+    308: HttpResponsePermanentRedirect308,
+}
+
+
+def get_redirect_response(link):
     """
-    Function to open and check an URL. In case of failure it sets the relevant
-    validation error.
+    Returns the redirect response for the ``redirect_fields`` of a tinylink.
+
+    Status code and caching headers are taken from the tinylink or, if it
+    doesn't define them, from ``TINYLINK_REDIRECT_STATUS`` and
+    ``TINYLINK_REDIRECT_MAX_AGE``.
+
+    """
+    long_url, status, max_age = link[1:4]
+    if not status:
+        status = getattr(settings, 'TINYLINK_REDIRECT_STATUS', 302)
+    response = REDIRECT_RESPONSES[status](long_url)
+    if max_age is None:
+        max_age = getattr(settings, 'TINYLINK_REDIRECT_MAX_AGE', None)
+    if max_age:
+        patch_response_headers(response, max_age)
+        patch_cache_control(response, public=True)
+    elif max_age is not None:
+        add_never_cache_headers(response)
+    vary = getattr(settings, 'TINYLINK_REDIRECT_VARY', ())
+    if vary:
+        patch_vary_headers(response, vary)
+    return response
+
+
+def is_valid_short_url(short_url):
+    """
+    Checks if a short URL can exist at all, without querying the database.
+
+    Short URLs have to match ``TINYLINK_SHORT_URL_PATTERN``.
+
+    """
+    return bool(short_url) and re.match(getattr(
+        settings, 'TINYLINK_SHORT_URL_PATTERN', r'^[a-zA-Z0-9-]{1,32}$'),
+        short_url) is not None
+
+
+def is_reserved_short_url(short_url):
+    """
+    Checks if the URL of a short URL belongs to another view, e.g. ``create``
+    if the app's views share the path of the short URLs.
 
     """
-    response = False
-    link.is_broken = True
-    link.redirect_location = ''
-    # Try to encode e.g. chinese letters
     try:
-        url = url.encode('utf-8')
-    except UnicodeEncodeError:
-        link.validation_error = _('Unicode error. Check URL characters.')
+        path = reverse('tinylink_redirect', kwargs={'short_url': short_url})
+    except NoReverseMatch:
         return False
-    try:
-        response = requests.get(url)
-    except requests.ConnectionError:
-        link.validation_error = _('Failed after retrying.')
-    except (requests.HTTPError, gaierror):
-        link.validation_error = _('Not found.')
-    return response, link
+    path = path[len(get_script_prefix()) - 1:]
+    # The pattern of the redirects matches with and without a trailing slash.
+    for path in (path, path.rstrip('/') + '/'):
+        try:
+            if resolve(path).url_name != 'tinylink_redirect':
+                return True
+        except Resolver404:
+            pass
+    return False
 
 
-def validate_long_url(link):
-    """Function to validate a URL."""
-    response, link = get_url_response(link, link.long_url)
-    if response and response.status_code == 200:
-        link.is_broken = False
-    elif response and response.status_code == 302:
-        # If link is redirected, validate the redirect location.
-        if link.long_url.endswith('.pdf'):
-            # Non-save pdf exception, to avoid relative path redirects
-            link.is_broken = False
+def follow_tinylink(short_url, request=None):
+    """
+    Resolves a short URL and counts the view.
+
+    If a request is given, a click event is recorded as well.
+
+    Returns the ``redirect_fields`` of the tinylink or ``None`` if the short
+    URL does not exist.
+
+    """
+    if not is_valid_short_url(short_url):
+        return None
+    resolution_cache = get_resolution_cache()
+    if not resolution_cache and not get_view_buffer():
+        link = Tinylink.objects.count_view(
+            short_url, get_code_generator().decode(short_url))
+    else:
+        if resolution_cache:
+            link = resolution_cache.resolve(short_url)
         else:
-            redirect_location = response.get_redirect_location()
-            redirect, link = get_url_response(link, redirect_location)
-            link.redirect_location = redirect_location
-            if redirect.status_code == 200:
-                link.is_broken = False
-            elif redirect.status_code == 302:
-                # Seems like an infinite loop. Maybe the server is looking for
-                # a cookie?
-                response = requests.get(response.get_redirect_location())
-                if response.status_code == 200:
-                    link.is_broken = False
-    elif response and response.status_code == 502:
+            link = Tinylink.objects.resolve(
+                short_url, get_code_generator().decode(short_url))
+        if link:
+            record_view(link[0])
+    if link and request is not None:
+        record_click(link[0], request)
+    return link
+
+
+_sessions = {}
+
+
+def get_session():
+    """
+    Returns the ``requests`` session that is shared by all URL checks.
+
+    The session keeps up to ``TINYLINK_CHECK_POOL_SIZE`` connections per host
+    alive, which defaults to ``TINYLINK_CHECK_WORKERS``.
+
+    """
+    pool_size = getattr(settings, 'TINYLINK_CHECK_POOL_SIZE', getattr(
+        settings, 'TINYLINK_CHECK_WORKERS', 10))
+    if pool_size not in _sessions:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _sessions[pool_size] = session
+    return _sessions[pool_size]
+
+
+def get_check_timeout():
+    """Returns the connect and the read timeout of URL checks."""
+    return (getattr(settings, 'TINYLINK_CHECK_CONNECT_TIMEOUT', 5),
+            getattr(settings, 'TINYLINK_CHECK_TIMEOUT', 10))
+
+
+def get_max_request_duration():
+    """
+    Returns the number of seconds that one ``request_url`` call can take at
+    most, which is the ``HEAD`` request and the ``GET`` fallback timing out.
+
+    """
+    return 2 * sum(get_check_timeout())
+
+
+def get_max_check_duration():
+    """
+    Returns the number of seconds that one URL check can take at most.
+
+    That is every hop of the longest redirect chain timing out on each
+    attempt, including the waits between the retries.
+
+    """
+    retries = getattr(settings, 'TINYLINK_CHECK_RETRIES', 2)
+    backoff = getattr(settings, 'TINYLINK_CHECK_RETRY_BACKOFF', 0.5)
+    hops = getattr(settings, 'TINYLINK_CHECK_MAX_REDIRECTS', 10) + 1
+    return hops * ((retries + 1) * get_max_request_duration() +
+                   backoff * (2 ** retries - 1))
+
+
+def request_url(url):
+    """
+    Requests a URL with the shared session and returns the response.
+
+    A ``HEAD`` request is tried first. If it fails, the URL is requested
+    with a streamed ``GET`` that is closed after the headers, so no body is
+    downloaded. Redirects are not followed. The timeouts are
+    ``TINYLINK_CHECK_CONNECT_TIMEOUT`` and ``TINYLINK_CHECK_TIMEOUT``.
+
+    """
+    session = get_session()
+    timeout = get_check_timeout()
+    response = session.head(url, timeout=timeout, allow_redirects=False)
+    response.close()
+    if response.status_code < 400:
+        return response
+    # Some servers don't support HEAD requests.
+    response = session.get(url, timeout=timeout, allow_redirects=False,
+                           stream=True)
+    response.close()
+    return response
+
+
+RETRY_STATUS_CODES = (502, 503, 504)
+
+
+class DeadlineExceeded(Exception):
+    """Raised if a URL check could not complete before its deadline."""
+
+
+def request_url_with_retries(url, deadline=None):
+    """
+    Requests a URL like ``request_url`` and retries temporary failures.
+
+    Connection errors, timeouts and the ``RETRY_STATUS_CODES`` are retried up
+    to ``TINYLINK_CHECK_RETRIES`` times. The first retry waits
+    ``TINYLINK_CHECK_RETRY_BACKOFF`` seconds, each further retry twice as
+    long as the previous one.
+
+    Raises ``DeadlineExceeded`` instead of starting an attempt that could
+    not complete before the ``deadline`` timestamp.
+
+    """
+    retries = getattr(settings, 'TINYLINK_CHECK_RETRIES', 2)
+    backoff = getattr(settings, 'TINYLINK_CHECK_RETRY_BACKOFF', 0.5)
+    for attempt in range(retries + 1):
+        delay = backoff * 2 ** (attempt - 1) if attempt else 0
+        if deadline is not None and (
+                time.time() + delay + get_max_request_duration() > deadline):
+            raise DeadlineExceeded(url)
+        if delay:
+            time.sleep(delay)
         try:
-            requests.get(link.long_url)
-        except requests.HTTPError:
-            link.validation_error = _("URL not accessible.")
-        else:
-            link.is_broken = False
+            response = request_url(url)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+            continue
+        if response.status_code not in RETRY_STATUS_CODES:
+            break
+    return response
+
+
+REDIRECT_STATUS_CODES = (301, 302, 303, 307, 308)
+
+
+class RedirectLoop(requests.TooManyRedirects):
+    """Raised if a redirect chain leads back to a URL of the chain."""
+
+
+def resolve_redirects(url, deadline=None):
+    """
+    Follows the redirects of a URL.
+
+    Each URL of the chain is requested once with
+    ``request_url_with_retries``, which stops at the ``deadline``. Raises
+    ``RedirectLoop`` if the chain leads back to one of its URLs and
+    ``requests.TooManyRedirects`` if it has more than
+    ``TINYLINK_CHECK_MAX_REDIRECTS`` hops.
+
+    Returns the last response, its URL and the number of hops.
+
+    """
+    max_redirects = getattr(settings, 'TINYLINK_CHECK_MAX_REDIRECTS', 10)
+    seen = set([url])
+    hops = 0
+    while True:
+        response = request_url_with_retries(url, deadline)
+        location = response.headers.get('Location')
+        if response.status_code not in REDIRECT_STATUS_CODES or not location:
+            return response, url, hops
+        url = urljoin(url, location)
+        hops += 1
+        if url in seen:
+            raise RedirectLoop(url)
+        if hops > max_redirects:
+            raise requests.TooManyRedirects(url)
+        seen.add(url)
+
+
+def check_long_url(link, deadline=None):
+    """
+    Checks the long URL of a ``TargetURL`` without saving it.
+
+    The long URL is valid if it or the end of its redirect chain returns
+    200. The end of the chain and the number of hops are set as
+    ``redirect_location`` and ``redirect_hops``. Raises ``DeadlineExceeded``
+    if the check could not complete before the ``deadline`` timestamp.
+
+    Only the network is used, so this can run outside of the main thread.
+
+    """
+    link.is_broken = True
+    link.validation_error = ''
+    link.redirect_location = ''
+    link.redirect_hops = 0
+    try:
+        response, url, hops = resolve_redirects(
+            iri_to_uri(link.long_url), deadline)
+    except UnicodeError:
+        link.validation_error = _('Unicode error. Check URL characters.')
+    except RedirectLoop:
+        link.validation_error = _('Redirect loop.')
+    except requests.TooManyRedirects:
+        link.validation_error = _('Too many redirects.')
+    except requests.RequestException:
+        link.validation_error = _('URL not accessible.')
     else:
-        link.validation_error = _("URL not accessible.")
+        if hops:
+            link.redirect_location = url
+            link.redirect_hops = hops
+        if response.status_code == 200:
+            link.is_broken = False
+        else:
+            link.validation_error = _('URL not accessible.')
     link.last_checked = now()
+    return link
+
+
+CHECK_FIELDS = ('is_broken', 'validation_error', 'redirect_location',
+                'redirect_hops')
+
+SCHEDULE_FIELDS = ('check_failures', 'next_check_at')
+
+
+def save_check(link):
+    """Saves the result of ``check_long_url`` and schedules the next check."""
+    schedule_check(link)
     link.save()
     return link
+
+
+def save_checks(links):
+    """
+    Saves the results of many checks in one transaction.
+
+    All targets are saved as checked at the same time and their next checks
+    are scheduled with ``schedule_check``. Only the validation fields are
+    written, with one ``UPDATE`` per distinct result and schedule and chunk
+    of ``TINYLINK_CHECK_CHUNK_SIZE`` targets.
+
+    """
+    chunk_size = getattr(settings, 'TINYLINK_CHECK_CHUNK_SIZE', 500)
+    last_checked = now()
+    results = OrderedDict()
+    for link in links:
+        link.last_checked = last_checked
+        schedule_check(link)
+        key = tuple(
+            six.text_type(getattr(link, name)) if name == 'validation_error'
+            else getattr(link, name)
+            for name in CHECK_FIELDS + SCHEDULE_FIELDS)
+        results.setdefault(key, []).append(link.pk)
+    with transaction.atomic():
+        for key, pks in results.items():
+            values = dict(zip(CHECK_FIELDS + SCHEDULE_FIELDS, key))
+            for index in range(0, len(pks), chunk_size):
+                TargetURL.objects.filter(
+                    pk__in=pks[index:index + chunk_size]).update(
+                        last_checked=last_checked, **values)
+
+
+def _check_long_url(link, deadline=None):
+    try:
+        return check_long_url(link, deadline)
+    except DeadlineExceeded:
+        return None
+    except Exception:
+        logger.exception('Could not check %s.', link.long_url)
+        link.is_broken = True
+        link.validation_error = _('Check failed.')
+        link.last_checked = now()
+        return link
+
+
+def check_long_urls(links, workers=None, deadline=None):
+    """
+    Checks the long URLs of the given targets concurrently.
+
+    The checks run in a pool of ``workers`` threads, which defaults to
+    ``TINYLINK_CHECK_WORKERS``. The checked links are yielded in the calling
+    thread as they complete, so they can be saved with ``save_check`` there.
+    A link whose check raises an unexpected error is marked as broken
+    without affecting the other links.
+
+    If a ``deadline`` timestamp is given, no requests are started that could
+    not complete before it. Links whose checks were stopped this way are not
+    yielded.
+
+    """
+    if workers is None:
+        workers = getattr(settings, 'TINYLINK_CHECK_WORKERS', 10)
+    # The pool consumes its iterable in another thread, so querysets are
+    # evaluated here.
+    links = list(links)
+    pool = ThreadPool(workers)
+    try:
+        for link in pool.imap_unordered(
+                partial(_check_long_url, deadline=deadline), links):
+            if link is not None:
+                yield link
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+@contextmanager
+def check_lock(timeout):
+    """
+    Prevents that URLs are checked by more than one process at a time.
+
+    Yields ``True`` if the lock was acquired and ``False`` if another process
+    holds it. PostgreSQL advisory locks are used, which are released if the
+    process dies. On other databases, the lock is a key in the default cache
+    that expires after ``timeout`` seconds, so ``timeout`` has to be longer
+    than a run can take. The key holds a token of the run that set it, so a
+    run whose key expired does not release the lock of the next run.
+
+    The cache key only locks out other processes if they share the cache,
+    e.g. with Memcached or Redis. With ``LocMemCache`` each process has a
+    cache of its own and the lock has no effect.
+
+    """
+    connection = connections[router.db_for_write(Tinylink)]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [CHECK_LOCK_ID])
+            acquired = cursor.fetchone()[0]
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_unlock(%s)',
+                                   [CHECK_LOCK_ID])
+        return
+    token = uuid.uuid4().hex
+    acquired = cache.add(CHECK_LOCK_KEY, token, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(CHECK_LOCK_KEY) == token:
+            cache.delete(CHECK_LOCK_KEY)
+
+
+def validate_target_url(target):
+    """Validates a ``TargetURL`` and returns it."""
+    return save_check(check_long_url(target))
+
+
+def validate_long_url(link):
+    """
+    Function to validate a URL.
+
+    The target of the tinylink is validated, which covers all tinylinks of
+    the same long URL.
+
+    """
+    validate_target_url(link.target)
+    return link
@@ -1,7 +1,15 @@
 """Views for the ``django-tinylinks`` application."""
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import permission_required
+from django.core.exceptions import ValidationError
 from django.core.urlresolvers import reverse
-from django.http import Http404
+from django.db.models import Case, Count, IntegerField, Q, Sum, When
+from django.http import (
+    Http404,
+    HttpResponseBadRequest,
+    StreamingHttpResponse,
+)
 from django.utils.decorators import method_decorator
 from django.views.generic import (
     CreateView,
@@ -9,11 +17,18 @@ from django.views.generic import (
     ListView,
     RedirectView,
     UpdateView,
+    View,
 )
 
-from .forms import TinylinkForm
+from .exports import iter_statistics
+from .forms import StatisticsExportForm, TinylinkForm
 from .models import Tinylink
-from .utils import validate_long_url
+from .rollups import get_daily_clicks
+from .utils import (
+    follow_tinylink,
+    get_redirect_response,
+    validate_long_url,
+)
 
 
 class TinylinkViewMixin(object):
@@ -55,7 +70,96 @@ class TinylinkViewMixin(object):
         return reverse('tinylink_list')
 
 
-class TinylinkListView(TinylinkViewMixin, ListView):
+class KeysetPaginationMixin(object):
+    """
+    Paginates a list view over an index instead of with ``OFFSET``.
+
+    ``sort_fields`` maps the values of the ``sort`` GET parameter to fields,
+    which can also be fields of related models, e.g. ``target__last_checked``.
+    Pages are ordered by the field and the primary key, both descending, so
+    the fields should be indexed together with the primary key. The ``after``
+    and ``after_pk`` GET parameters hold the values of the last row of the
+    previous page, so every page costs the same, however deep it is.
+
+    """
+    sort_fields = {'newest': 'pk'}
+    default_sort = 'newest'
+    page_size = 100
+
+    def get_page_size(self):
+        return self.page_size
+
+    def get_sort(self):
+        sort = self.request.GET.get('sort', self.default_sort)
+        if sort not in self.sort_fields:
+            raise Http404
+        return sort
+
+    def get_sort_field(self, name):
+        """Returns the model field of a name in ``sort_fields``."""
+        model = self.model
+        parts = name.split('__')
+        for part in parts[:-1]:
+            model = model._meta.get_field(part).related_model
+        return model._meta.get_field(parts[-1])
+
+    def get_sort_value(self, obj, name):
+        """Returns the value of a name in ``sort_fields`` for an object."""
+        for part in name.split('__'):
+            obj = getattr(obj, part)
+        return obj
+
+    def paginate_keyset(self, queryset):
+        """Returns the current page of the queryset as a list."""
+        self.sort = self.get_sort()
+        name = self.sort_fields[self.sort]
+        queryset = queryset.order_by('-{0}'.format(name), '-pk')
+        after_pk = self.request.GET.get('after_pk')
+        if after_pk:
+            field = self.model._meta.pk
+            try:
+                after_pk = field.to_python(after_pk)
+                if name != 'pk':
+                    field = self.get_sort_field(name)
+                    after = field.to_python(self.request.GET.get('after'))
+            except ValidationError:
+                raise Http404
+            if name != 'pk' and after is None:
+                raise Http404
+            if name == 'pk':
+                queryset = queryset.filter(pk__lt=after_pk)
+            else:
+                queryset = queryset.filter(
+                    Q(**{'{0}__lt'.format(name): after}) |
+                    Q(**{name: after, 'pk__lt': after_pk}))
+        page_size = self.get_page_size()
+        page = list(queryset[:page_size + 1])
+        self.next_page = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            last = page[-1]
+            self.next_page = self.request.GET.copy()
+            self.next_page['sort'] = self.sort
+            self.next_page['after_pk'] = last.pk
+            if name != 'pk':
+                value = self.get_sort_value(last, name)
+                if hasattr(value, 'isoformat'):
+                    value = value.isoformat()
+                self.next_page['after'] = value
+        return page
+
+    def get_context_data(self, **kwargs):
+        kwargs['object_list'] = self.paginate_keyset(self.object_list)
+        context = super(KeysetPaginationMixin, self).get_context_data(
+            **kwargs)
+        context.update({
+            'sort': self.sort,
+            'next_page': self.next_page and self.next_page.urlencode(),
+        })
+        return context
+
+
+class TinylinkListView(KeysetPaginationMixin, TinylinkViewMixin, ListView):
     """
     View to list all tinylinks of a user.
 
@@ -74,10 +178,29 @@ class TinylinkListView(TinylinkViewMixin, ListView):
                 validate_long_url(link)
         return super(TinylinkListView, self).get(request, *args, **kwargs)
 
+    def get_page_size(self):
+        return getattr(settings, 'TINYLINK_LIST_PAGE_SIZE', 100)
+
+    def show_redirects(self):
+        return bool(self.request.GET.get('redirects'))
+
     def get_queryset(self):
         if self.request.user.is_staff:
-            return Tinylink.objects.all()
-        return self.request.user.tinylinks.all()
+            links = Tinylink.objects.all()
+        else:
+            links = self.request.user.tinylinks.all()
+        links = links.select_related('user', 'target')
+        if not self.show_redirects():
+            links = links.defer('target__redirect_location')
+        return links
+
+    def get_context_data(self, **kwargs):
+        context = super(TinylinkListView, self).get_context_data(**kwargs)
+        context.update({
+            'show_redirects': self.show_redirects(),
+            'validation_cutoff': Tinylink.get_validation_cutoff(),
+        })
+        return context
 
 
 class TinylinkCreateView(TinylinkViewMixin, CreateView):
@@ -111,33 +234,90 @@ class TinylinkRedirectView(RedirectView):
     View to validate a short URL and redirect to its location.
 
     """
-    def dispatch(self, *args, **kwargs):
-        try:
-            tinylink = Tinylink.objects.get(short_url=kwargs.get(
-                'short_url'))
-        except Tinylink.DoesNotExist:
-            tinylink = None
-            self.url = reverse('tinylink_notfound')
-        if tinylink:
-            # set the redirect long URL
-            self.url = tinylink.long_url
-            tinylink.amount_of_views += 1
-            tinylink.save()
-        return super(TinylinkRedirectView, self).dispatch(*args, **kwargs)
+    def dispatch(self, request, *args, **kwargs):
+        link = follow_tinylink(kwargs.get('short_url'), request)
+        if link:
+            # redirect to the long URL
+            return get_redirect_response(link)
+        self.url = reverse('tinylink_notfound')
+        return super(TinylinkRedirectView, self).dispatch(
+            request, *args, **kwargs)
 
     def get_redirect_url(self, **kwargs):
         return self.url
 
 
-class StatisticsView(ListView):
+class StatisticsView(KeysetPaginationMixin, ListView):
     """
     View to list all tinylinks including their statistics.
 
     """
     model = Tinylink
     template_name = "tinylinks/statistics.html"
+    sort_fields = {
+        'newest': 'pk',
+        'views': 'amount_of_views',
+        'checked': 'target__last_checked',
+    }
+
+    def get_page_size(self):
+        return getattr(settings, 'TINYLINK_STATISTICS_PAGE_SIZE', 100)
+
+    def get_queryset(self):
+        return Tinylink.objects.select_related('user', 'target').only(
+            'long_url', 'short_url', 'amount_of_views', 'target__is_broken',
+            'target__last_checked',
+            'user__{0}'.format(get_user_model().USERNAME_FIELD))
 
     def dispatch(self, request, *args, **kwargs):
         if not request.user.is_staff:
             raise Http404
         return super(StatisticsView, self).dispatch(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super(StatisticsView, self).get_context_data(**kwargs)
+        summary = Tinylink.objects.aggregate(
+            links=Count('pk'),
+            views=Sum('amount_of_views'),
+            broken=Sum(Case(When(target__is_broken=True, then=1), default=0,
+                            output_field=IntegerField())),
+        )
+        top_links = Tinylink.objects.order_by(
+            '-amount_of_views', '-pk').only(
+                'short_url', 'amount_of_views')[:getattr(
+                    settings, 'TINYLINK_STATISTICS_TOP_LINKS', 10)]
+        context.update({
+            'summary': summary,
+            'top_links': list(top_links),
+            'daily_clicks': get_daily_clicks(getattr(
+                settings, 'TINYLINK_STATISTICS_DAYS', 30)),
+        })
+        return context
+
+
+class StatisticsExportView(View):
+    """
+    View to stream the statistics of all tinylinks as CSV or NDJSON.
+
+    The filters of the ``StatisticsExportForm`` are passed as GET parameters.
+
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_staff:
+            raise Http404
+        return super(StatisticsExportView, self).dispatch(
+            request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        form = StatisticsExportForm(request.GET)
+        if not form.is_valid():
+            return HttpResponseBadRequest(form.errors.as_text())
+        export_format = form.get_format()
+        response = StreamingHttpResponse(
+            export_format.iter_lines(iter_statistics(form.get_links())),
+            content_type='{0}; charset=utf-8'.format(
+                export_format.content_type))
+        response['Content-Disposition'] = (
+            'attachment; filename="tinylinks.{0}"'.format(
+                form.cleaned_data['format'] or 'csv'))
+        return response